@@ -4,128 +4,201 @@
 Обработчик Excel файлов
 """
 
-import openpyxl
-from pathlib import Path
-from datetime import datetime
 import sqlite3
 
+from data_processing.logger_series import describe_conflicts
+from data_processing.out_of_core import DEFAULT_MEMORY_LIMIT, chunked_stats, estimated_memory
+from data_processing.parallel_parse import parse_files
+from data_processing.parse_cache import ParseCache
+from data_processing.sample_store import SampleStore
+from data_processing.window_stats import window_stats
+from data_processing.workbook_layout import expand_paths
+from utils.memory_usage import format_bytes, peak_rss
+
 
 class ExcelProcessor:
     """Класс для обработки Excel файлов"""
     
-    def __init__(self, session_manager):
+    def __init__(self, session_manager, max_workers=None, memory_limit=None):
+        """
+        max_workers - число процессов разбора (None - по числу ядер, 1 - последовательно)
+        memory_limit - потолок памяти обработки по блокам в байтах
+        (None - настройка проекта memory_limit_mb или DEFAULT_MEMORY_LIMIT)
+        """
         self.session_manager = session_manager
+        self.max_workers = max_workers
+        self.parse_cache = ParseCache(session_manager.get_parse_cache_dir())
+        self.memory_limit = memory_limit or self._memory_limit_setting() or DEFAULT_MEMORY_LIMIT
     
-    def process_excel_files(self, file_paths):
+    def _memory_limit_setting(self):
+        """Потолок памяти из настроек проекта (ключ memory_limit_mb) в байтах или None"""
+        try:
+            conn = sqlite3.connect(self.session_manager.get_settings_db_path())
+            try:
+                row = conn.execute("SELECT value FROM settings WHERE key = 'memory_limit_mb'").fetchone()
+            finally:
+                conn.close()
+            return int(float(row[0]) * 2 ** 20) if row and row[0] else None
+        except (sqlite3.Error, ValueError):
+            return None
+    
+    def parse_missing(self, file_paths, parsed_loggers=None):
+        """
+        Разобранные файлы {путь: ParsedLogger} в порядке file_paths
+        
+        Уже прочитанные файлы из parsed_loggers берутся как есть, остальные
+        (в том числе отложенные ParsedLogger.probe) разбираются параллельно
+        (parse_files); ошибки разбора выводятся в консоль.
         """
-        Обработка Excel файлов
+        parsed_loggers = {
+            path: parsed for path, parsed in (parsed_loggers or {}).items() if parsed.loaded
+        }
+        missing = [str(p) for p in file_paths if str(p) not in parsed_loggers]
+        loggers, errors = parse_files(missing, cache=self.parse_cache, max_workers=self.max_workers)
+        for file_path, error in errors.items():
+            print(f"Ошибка обработки файла {file_path}: {error}")
+        
+        result = {}
+        for file_path in file_paths:
+            parsed = parsed_loggers.get(str(file_path)) or loggers.get(str(file_path))
+            if parsed is not None:
+                result[str(file_path)] = parsed
+        return result
+    
+    def load_logger_data(self, file_paths, parsed_loggers=None, start=None, end=None):
+        """
+        Данные логгеров из хранилища показаний (samples.db) за диапазон [start, end]
         
         Структура Excel:
         - Столбец A: общая информация (строка 5 - имя устройства)
         - Столбец B: временные промежутки (начиная со строки 2)
         - Столбец C: температурные значения (начиная со строки 2)
         - Столбец D: значения влажности (начиная со строки 2)
+        
+        Файлы, которых еще нет в хранилище, разбираются (или берутся из parsed_loggers;
+        остальные - параллельно в max_workers процессах) и добавляются в него. Сводные
+        книги раскрываются в источники логгеров (workbook_layout). В результат попадают
+        только показания file_paths (другие файлы хранилища не учитываются).
+        
+        Возвращает (logger_data, conflicts): logger_data - {имя устройства: LoggerSeries},
+        times - array('q') секунд от эпохи по возрастанию без повторов,
+        temperatures/humidities - array('d') с NaN для пустых ячеек; файлы одного
+        устройства сливаются (при совпадении времени - значения более позднего файла).
+        conflicts - {имя: отметки времени, в которых файлы расходятся}, каждый
+        конфликт также выводится в консоль.
         """
-        logger_data = {}
+        store = SampleStore(self.session_manager.get_samples_db_path())
+        stored = store.sources()
         
-        for file_path in file_paths:
-            try:
-                workbook = openpyxl.load_workbook(file_path, data_only=True)
-                worksheet = workbook.active
-                
-                # Получаем имя устройства из строки 5, столбец A
-                device_name = worksheet.cell(row=5, column=1).value
-                if not device_name:
-                    device_name = Path(file_path).stem
-                
-                # Извлекаем данные начиная со строки 2
-                times = []
-                temperatures = []
-                humidities = []
-                
-                row = 2
-                while True:
-                    time_val = worksheet.cell(row=row, column=2).value
-                    temp_val = worksheet.cell(row=row, column=3).value
-                    humidity_val = worksheet.cell(row=row, column=4).value
-                    
-                    # Прекращаем, если нет данных
-                    if not time_val and not temp_val and not humidity_val:
-                        break
-                    
-                    if time_val:
-                        times.append(time_val)
-                    
-                    if temp_val is not None:
-                        try:
-                            temperatures.append(float(temp_val))
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    if humidity_val is not None:
-                        try:
-                            humidities.append(float(humidity_val))
-                        except (ValueError, TypeError):
-                            pass
-                    
-                    row += 1
-                
-                # Сохраняем данные логгера
-                if device_name not in logger_data:
-                    logger_data[device_name] = {
-                        'times': [],
-                        'temperatures': [],
-                        'humidities': []
-                    }
-                
-                logger_data[device_name]['times'].extend(times)
-                logger_data[device_name]['temperatures'].extend(temperatures)
-                logger_data[device_name]['humidities'].extend(humidities)
-                
-                workbook.close()
-                
-            except Exception as e:
-                print(f"Ошибка обработки файла {file_path}: {e}")
-                continue
+        sources = expand_paths(file_paths)
+        missing = [source for source in sources if source not in stored]
+        for parsed in self.parse_missing(missing, parsed_loggers).values():
+            store.add_logger(parsed)
         
-        return logger_data
+        logger_data, conflicts = store.load(start, end, sources)
+        for name, device_conflicts in conflicts.items():
+            print(describe_conflicts(name, device_conflicts))
+        return logger_data, conflicts
     
-    def save_logger_stats(self, logger_data, period_id):
-        """Сохранение статистики логгеров в БД"""
+    def compute_period_stats(self, logger_data, periods, limits=None):
+        """
+        Статистика логгеров по периодам
+        
+        periods - список (period_id, начало, конец) в секундах от эпохи.
+        limits - допустимые диапазоны {'temperature': (min, max), 'humidity': (min, max)}
+        для подсчета выходов за пределы (необязательно).
+        Ряд каждого логгера готовится один раз, затем для всех периодов
+        считаются min/max/avg/std/argmin/argmax только по данным внутри периода.
+        
+        Возвращает {period_id: {имя логгера: {'temperature': stats, 'humidity': stats}}},
+        где stats - словарь series_stats или None, если в периоде нет данных.
+        """
+        limits = limits or {}
+        windows = [(start, end) for _, start, end in periods]
+        period_stats = {period_id: {} for period_id, _, _ in periods}
+        
+        for logger_name, series in logger_data.items():
+            for data_type, value_key in (('temperature', 'temperatures'), ('humidity', 'humidities')):
+                low, high = limits.get(data_type) or (None, None)
+                times, values = series.valid(value_key)
+                for (period_id, _, _), stats in zip(periods, window_stats(times, values, windows, low, high)):
+                    period_stats[period_id].setdefault(logger_name, {})[data_type] = stats
+        
+        return period_stats
+    
+    def needs_chunked(self, file_paths, parsed_loggers=None):
+        """
+        Не помещается ли обработка файлов целиком в потолок памяти
+        
+        Оценка по числу строк: из хранилища показаний и уже разобранных файлов
+        parsed_loggers; для остальных файлов - по размеру книги (estimated_memory).
+        """
+        sources = expand_paths(file_paths)
+        try:
+            row_counts = SampleStore(self.session_manager.get_samples_db_path()).row_counts()
+        except sqlite3.Error as e:
+            print(f"Ошибка чтения хранилища показаний: {e}")
+            row_counts = {}
+        for path, parsed in (parsed_loggers or {}).items():
+            if parsed.loaded:
+                row_counts[str(path)] = len(parsed.times)
+        return estimated_memory(sources, row_counts) > self.memory_limit
+    
+    def process_chunked(self, file_paths, periods, limits=None, check_cancelled=None):
+        """
+        Статистика по периодам и однородность в режиме обработки по блокам
+        
+        Файлы читаются блоками во временное хранилище на диске (out_of_core.chunked_stats)
+        с потолком памяти memory_limit; в конце выводится пиковое потребление памяти процессом.
+        
+        Возвращает (period_stats, homogeneity, conflicts): period_stats - как compute_period_stats,
+        homogeneity - {'temperatures': (max_diff, max_times), 'humidities': ...},
+        conflicts - как у load_logger_data.
+        """
+        period_stats, homogeneity, conflicts = chunked_stats(
+            [str(file_path) for file_path in file_paths], periods, limits,
+            memory_limit=self.memory_limit,
+            spill_dir=self.session_manager.get_spill_dir(),
+            check_cancelled=check_cancelled
+        )
+        for name, device_conflicts in conflicts.items():
+            print(describe_conflicts(name, device_conflicts))
+        print(f"Обработка по блокам: потолок {format_bytes(self.memory_limit)}, "
+              f"пиковое потребление памяти {format_bytes(peak_rss())}")
+        return period_stats, homogeneity, conflicts
+    
+    def save_period_stats(self, period_stats):
+        """
+        Сохранение статистики логгеров за все периоды в БД одной транзакцией
+        
+        period_stats - результат compute_period_stats. Прежние строки этих периодов
+        заменяются; логгеры без данных в периоде не сохраняются.
+        """
+        rows = []
+        for period_id, logger_stats in period_stats.items():
+            for logger_name, stats_by_type in logger_stats.items():
+                # Извлекаем номер логгера из имени устройства
+                logger_number = self.extract_logger_number(logger_name)
+                
+                for data_type in ('temperature', 'humidity'):
+                    stats = stats_by_type.get(data_type)
+                    if stats:
+                        rows.append((period_id, logger_number, data_type,
+                                     stats['min'], stats['max'], stats['avg'], 'internal'))
+        
         logger_stats_db_path = self.session_manager.get_logger_stats_db_path()
         conn = sqlite3.connect(logger_stats_db_path)
-        cursor = conn.cursor()
-        
-        for logger_name, data in logger_data.items():
-            # Извлекаем номер логгера из имени устройства
-            logger_number = self.extract_logger_number(logger_name)
-            
-            # Температура
-            if data['temperatures']:
-                min_temp = min(data['temperatures'])
-                max_temp = max(data['temperatures'])
-                avg_temp = sum(data['temperatures']) / len(data['temperatures'])
-                
-                cursor.execute("""
-                    INSERT INTO logger_stats 
-                    (period_id, logger_number, data_type, min_value, max_value, avg_value, logger_type)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (period_id, logger_number, 'temperature', min_temp, max_temp, avg_temp, 'internal'))
-            
-            # Влажность
-            if data['humidities']:
-                min_hum = min(data['humidities'])
-                max_hum = max(data['humidities'])
-                avg_hum = sum(data['humidities']) / len(data['humidities'])
-                
-                cursor.execute("""
+        try:
+            with conn:
+                conn.executemany("DELETE FROM logger_stats WHERE period_id = ?",
+                                 [(period_id,) for period_id in period_stats])
+                conn.executemany("""
                     INSERT INTO logger_stats 
                     (period_id, logger_number, data_type, min_value, max_value, avg_value, logger_type)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (period_id, logger_number, 'humidity', min_hum, max_hum, avg_hum, 'internal'))
-        
-        conn.commit()
-        conn.close()
+                """, rows)
+        finally:
+            conn.close()
     
     @staticmethod
     def extract_logger_number(device_name):
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Потоковое чтение Excel файлов логгеров
+"""
+
+from array import array
+
+import openpyxl
+
+from data_processing.timestamps import TimestampNormalizer, from_epoch, to_epoch
+from data_processing.xlsx_stream import ExcelDate, iter_sheet_rows, probe_sheet
+
+
+# Версия разбора: увеличивается при изменении логики чтения (сбрасывает кэш разобранных файлов)
+# 2 - прямое чтение XLSX; 3 - листы и группы столбцов сводных книг; 4 - серийные даты Excel в столбце времени
+PARSER_VERSION = 4
+
+# Строка с именем устройства (столбец A)
+NAME_ROW = 5
+# Первая строка с данными (столбцы B, C, D)
+FIRST_DATA_ROW = 2
+# Сколько первых строк листа разбирается при быстром определении диапазона
+PROBE_HEAD_ROWS = 64
+
+NAN = float('nan')
+
+
+def to_float(value):
+    """Преобразование значения ячейки в число (NaN, если значение отсутствует или не число)"""
+    if value is None:
+        return NAN
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return NAN
+
+
+def read_logger_columns(file_path, sheet=None):
+    """
+    Потоковое чтение файла логгера в колоночном виде
+
+    Сначала лист читается напрямую из архива (xlsx_stream): строки разбираются
+    iterparse, даты переводятся из серийных номеров Excel без создания datetime.
+    Если книга устроена непредусмотренным образом, файл читается через openpyxl
+    в режиме read-only (iter_rows(values_only=True)). Результат в обоих случаях одинаков.
+
+    Возвращает (device_name, times, temperatures, humidities):
+    - times: array('q') - секунды от эпохи
+    - temperatures, humidities: array('d') - значения, NaN для пустых ячеек
+    Строки без распознаваемого времени пропускаются, поэтому столбцы всегда выровнены.
+    sheet - номер листа в workbook.worksheets, None - активный лист.
+    """
+    try:
+        device_name, times, temperatures, humidities = _collect_columns(iter_sheet_rows(file_path, sheet=sheet))
+        if not isinstance(device_name, ExcelDate):
+            return device_name, times, temperatures, humidities
+    except Exception:
+        # Любая неожиданность быстрого чтения - читаем книгу полностью через openpyxl
+        pass
+    return read_logger_columns_openpyxl(file_path, sheet)
+
+
+def read_logger_columns_openpyxl(file_path, sheet=None):
+    """Чтение файла логгера через openpyxl (read-only), формат результата - как у read_logger_columns"""
+    return _collect_columns(iter_sheet_rows_openpyxl(file_path, sheet=sheet))
+
+
+def iter_sheet_rows_openpyxl(file_path, max_col=4, sheet=None):
+    """
+    Строки листа (столбцы A..max_col) через openpyxl в режиме read-only
+
+    sheet - номер листа в workbook.worksheets, None - активный лист.
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook.active if sheet is None else workbook.worksheets[sheet]
+        # Размеры листа в выгрузках бывают записаны неверно - читаем до конца
+        worksheet.reset_dimensions()
+        yield from worksheet.iter_rows(min_row=1, max_col=max_col, values_only=True)
+    finally:
+        workbook.close()
+
+
+def probe_time_range(file_path, sheet=None):
+    """
+    Быстрое определение имени устройства и диапазона времени без полного разбора
+
+    sheet - номер листа в workbook.worksheets, None - активный лист.
+
+    Разбираются только первые PROBE_HEAD_ROWS строк и конец листа (xlsx_stream.probe_sheet):
+    начало - по первым строкам данных, конец - по последней строке листа с временем.
+    Если данные заканчиваются в первых строках, диапазон точный.
+
+    Возвращает (device_name, start, end) в секундах от эпохи или None,
+    если так определить диапазон нельзя и файл нужно разбирать полностью.
+    """
+    try:
+        head, tail, complete = probe_sheet(file_path, PROBE_HEAD_ROWS, sheet=sheet)
+    except Exception:
+        return None
+
+    device_name, times, _, _ = _collect_columns(head)
+    if isinstance(device_name, ExcelDate):
+        return None
+
+    data_ended = any(not row[1] and not row[2] and not row[3] for row in head[FIRST_DATA_ROW - 1:])
+    if complete or data_ended:
+        if not times:
+            return device_name, None, None
+        return device_name, min(times), max(times)
+
+    if not times:
+        return None
+    for _, row in reversed(tail):
+        end = to_epoch(row[1])
+        if end is not None:
+            return device_name, min(min(times), end), max(max(times), end)
+    return None
+
+
+def iter_samples(rows, header):
+    """
+    Показания из строк листа (кортежи значений столбцов A-D, начиная со строки 1)
+
+    Выдает (ts, temperature, humidity) по одной строке; время переводится
+    TimestampNormalizer (формат столбца определяется по первым значениям),
+    строки без распознаваемого времени пропускаются, чтение прекращается
+    на первой пустой строке данных.
+    Имя устройства (A5) записывается в header['device_name'], как только строка прочитана.
+    """
+    header.setdefault('device_name', None)
+    normalize = TimestampNormalizer()
+    data_ended = False
+    for row_idx, row in enumerate(rows, start=1):
+        if len(row) < 4:
+            row = tuple(row) + (None,) * (4 - len(row))
+
+        if row_idx == NAME_ROW:
+            header['device_name'] = row[0]
+
+        if row_idx < FIRST_DATA_ROW or data_ended:
+            if data_ended and row_idx >= NAME_ROW:
+                break
+            continue
+
+        time_val, temp_val, humidity_val = row[1], row[2], row[3]
+
+        # Прекращаем, если нет данных
+        if not time_val and not temp_val and not humidity_val:
+            data_ended = True
+            if row_idx >= NAME_ROW:
+                break
+            continue
+
+        ts = normalize(time_val)
+        if ts is None:
+            continue
+
+        yield ts, to_float(temp_val), to_float(humidity_val)
+
+
+def _collect_columns(rows):
+    """Сбор столбцов из строк листа: (device_name, times, temperatures, humidities)"""
+    times = array('q')
+    temperatures = array('d')
+    humidities = array('d')
+    header = {}
+
+    for ts, temperature, humidity in iter_samples(rows, header):
+        times.append(ts)
+        temperatures.append(temperature)
+        humidities.append(humidity)
+
+    return header['device_name'], times, temperatures, humidities
+
+
+def iter_sample_blocks(rows, header, block_rows):
+    """
+    Показания из строк листа блоками по block_rows строк
+
+    Выдает (times, temperatures, humidities) - array('q') / array('d') длиной
+    не больше block_rows; последний блок может быть короче. header - как в iter_samples.
+    """
+    times = array('q')
+    temperatures = array('d')
+    humidities = array('d')
+
+    for ts, temperature, humidity in iter_samples(rows, header):
+        times.append(ts)
+        temperatures.append(temperature)
+        humidities.append(humidity)
+        if len(times) >= block_rows:
+            yield times, temperatures, humidities
+            times = array('q')
+            temperatures = array('d')
+            humidities = array('d')
+
+    if times:
+        yield times, temperatures, humidities
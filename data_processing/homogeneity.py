@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Расчет однородности (разброса показаний логгеров во времени)
+
+Ряды всех логгеров приводятся к общей временной сетке: узлу сетки
+сопоставляется ближайшее показание логгера, если оно отстоит не более
+чем на допуск. Разброс в узле - max - min по логгерам, у которых есть
+показание (не менее двух логгеров).
+"""
+
+from array import array
+from bisect import bisect_left
+from statistics import median
+
+from data_processing.stats_kernel import np
+
+# Сколько узлов сетки обрабатывается за раз (ограничивает память матрицы логгеры x время)
+GRID_BLOCK = 100000
+
+
+def dominant_step(series):
+    """Основной интервал записи - наименьшая из медиан шагов логгеров (секунды)"""
+    steps = []
+    for times, _ in series:
+        if len(times) < 2:
+            continue
+        if np is not None:
+            diffs = np.diff(times)
+            diffs = diffs[diffs > 0]
+            if len(diffs):
+                steps.append(float(np.median(diffs)))
+        else:
+            diffs = [b - a for a, b in zip(times, times[1:]) if b > a]
+            if diffs:
+                steps.append(median(diffs))
+    return max(1, int(min(steps))) if steps else None
+
+
+def compute_homogeneity(logger_data, value_key, step=None, tolerance=None):
+    """
+    Максимальный разброс показаний логгеров и моменты, когда он достигается
+
+    logger_data - {имя: LoggerSeries} (ExcelProcessor.load_logger_data)
+    value_key - 'temperatures' или 'humidities'
+    step - шаг сетки в секундах (по умолчанию основной интервал записи)
+    tolerance - допустимое расхождение часов логгеров с узлом сетки
+                в секундах (по умолчанию половина шага)
+
+    Возвращает (max_diff, max_times): разброс и список узлов сетки
+    (секунды от эпохи), либо (None, []), если сравнивать нечего.
+    """
+    series = []
+    for data in logger_data.values():
+        times, values = data.valid(value_key)
+        if len(times):
+            series.append((times, values))
+    if len(series) < 2:
+        return None, []
+
+    if step is None:
+        step = dominant_step(series)
+    if step is None:
+        return None, []
+    if tolerance is None:
+        tolerance = step // 2
+
+    grid_start = min(int(times[0]) for times, _ in series)
+    grid_end = max(int(times[-1]) for times, _ in series)
+    return scan_grid(lambda block_start, block_end: series, grid_start, grid_end, step, tolerance)
+
+
+def scan_grid(block_series, grid_start, grid_end, step, tolerance, block_nodes=GRID_BLOCK):
+    """
+    Поиск максимального разброса на сетке [grid_start, grid_end] с шагом step по блокам
+
+    block_series(block_start, block_end) - ряды (times, values) без пропусков по
+    возрастанию времени, содержащие как минимум все показания в пределах
+    [block_start - tolerance, block_end + tolerance]: показания дальше от узлов
+    блока на результат не влияют, поэтому ряды можно читать частями.
+    block_nodes - число узлов сетки в блоке.
+
+    Возвращает (max_diff, max_times), как compute_homogeneity.
+    """
+    max_diff = None
+    max_times = []
+    for block_start in range(grid_start, grid_end + 1, step * block_nodes):
+        block_end = min(grid_end, block_start + step * (block_nodes - 1))
+        series = [(times, values) for times, values in block_series(block_start, block_end) if len(times)]
+        if len(series) < 2:
+            continue
+        if np is not None:
+            grid, spread = _block_spread_numpy(series, block_start, block_end, step, tolerance)
+        else:
+            grid, spread = _block_spread_python(series, block_start, block_end, step, tolerance)
+
+        for t, diff in zip(grid, spread):
+            if diff != diff:
+                continue
+            if max_diff is None or diff > max_diff + 1e-9:
+                max_diff = diff
+                max_times = [t]
+            elif abs(diff - max_diff) <= 1e-9:
+                max_times.append(t)
+
+    return max_diff, max_times
+
+
+def _block_spread_numpy(series, block_start, block_end, step, tolerance):
+    """Разброс по узлам блока сетки: матрица логгеры x узлы и max - min по столбцам"""
+    grid = np.arange(block_start, block_end + 1, step, dtype=np.int64)
+    matrix = np.full((len(series), len(grid)), np.nan)
+
+    for row, (times, values) in enumerate(series):
+        right = np.searchsorted(times, grid)
+        left = np.clip(right - 1, 0, len(times) - 1)
+        right = np.clip(right, 0, len(times) - 1)
+        # Ближайшее показание слева или справа от узла
+        use_right = np.abs(times[right] - grid) < np.abs(grid - times[left])
+        nearest = np.where(use_right, right, left)
+        matched = np.abs(times[nearest] - grid) <= tolerance
+        matrix[row, matched] = values[nearest[matched]]
+
+    counts = (~np.isnan(matrix)).sum(axis=0)
+    spread = np.full(len(grid), np.nan)
+    comparable = counts >= 2
+    if comparable.any():
+        columns = matrix[:, comparable]
+        spread[comparable] = np.nanmax(columns, axis=0) - np.nanmin(columns, axis=0)
+    return grid.tolist(), spread.tolist()
+
+
+def _block_spread_python(series, block_start, block_end, step, tolerance):
+    """То же без NumPy: накопление min/max/количества по узлам блока"""
+    size = (block_end - block_start) // step + 1
+    inf = float('inf')
+    lows = array('d', [inf]) * size
+    highs = array('d', [-inf]) * size
+    counts = array('l', [0]) * size
+
+    for times, values in series:
+        n = len(times)
+        pos = min(bisect_left(times, block_start - tolerance), n - 1)
+        for i in range(size):
+            node = block_start + i * step
+            while pos + 1 < n and times[pos + 1] <= node:
+                pos += 1
+            # Ближайшее показание слева или справа от узла
+            best = pos
+            if pos + 1 < n and abs(times[pos + 1] - node) < abs(node - times[pos]):
+                best = pos + 1
+            if abs(times[best] - node) <= tolerance:
+                value = values[best]
+                if value < lows[i]:
+                    lows[i] = value
+                if value > highs[i]:
+                    highs[i] = value
+                counts[i] += 1
+
+    grid = [block_start + i * step for i in range(size)]
+    spread = [highs[i] - lows[i] if counts[i] >= 2 else float('nan') for i in range(size)]
+    return grid, spread
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ряд показаний логгера
+"""
+
+from array import array
+import heapq
+from itertools import repeat
+
+from data_processing.stats_kernel import np, as_numpy
+from data_processing.timestamps import from_epoch
+from data_processing.window_stats import valid_sorted
+
+
+class LoggerSeries:
+    """
+    Показания одного логгера в виде выровненных столбцов
+
+    times - array('q') секунд от эпохи, temperatures и humidities - array('d')
+    той же длины; отсутствующее значение хранится как NaN, поэтому строка
+    занимает 24 байта, а i-й элемент каждого столбца относится к одной отметке времени.
+    """
+
+    __slots__ = ('name', 'times', 'temperatures', 'humidities')
+
+    # Столбцы значений (ключи value_key)
+    VALUE_COLUMNS = ('temperatures', 'humidities')
+
+    def __init__(self, name, times=None, temperatures=None, humidities=None):
+        self.name = name
+        self.times = times if times is not None else array('q')
+        self.temperatures = temperatures if temperatures is not None else array('d')
+        self.humidities = humidities if humidities is not None else array('d')
+        if not len(self.times) == len(self.temperatures) == len(self.humidities):
+            raise ValueError(f"Столбцы логгера {name} разной длины")
+
+    def __len__(self):
+        return len(self.times)
+
+    def __repr__(self):
+        return f"LoggerSeries({self.name!r}, {len(self)} строк)"
+
+    def extend(self, times, temperatures, humidities):
+        """Добавление строк в конец ряда (столбцы одинаковой длины)"""
+        if not len(times) == len(temperatures) == len(humidities):
+            raise ValueError(f"Столбцы логгера {self.name} разной длины")
+        self.times.extend(times)
+        self.temperatures.extend(temperatures)
+        self.humidities.extend(humidities)
+
+    def column(self, value_key):
+        """Столбец значений: 'temperatures' или 'humidities'"""
+        if value_key not in self.VALUE_COLUMNS:
+            raise KeyError(value_key)
+        return getattr(self, value_key)
+
+    def valid(self, value_key):
+        """Отметки времени и значения столбца без пропусков, по возрастанию времени (valid_sorted)"""
+        return valid_sorted(self.times, self.column(value_key))
+
+    @property
+    def nbytes(self):
+        """Объем данных столбцов в байтах"""
+        return sum(col.itemsize * len(col) for col in (self.times, self.temperatures, self.humidities))
+
+
+def _same(a, b):
+    return a == b or (a != a and b != b)
+
+
+def _merge_python(parts):
+    runs = []
+    for index, part in enumerate(parts):
+        rows = zip(part.times, repeat(index), part.temperatures, part.humidities)
+        if any(b < a for a, b in zip(part.times, part.times[1:])):
+            rows = sorted(rows, key=lambda row: row[0])
+        runs.append(rows)
+
+    times = array('q')
+    temperatures = array('d')
+    humidities = array('d')
+    conflicts = []
+    # Строки с одинаковым временем идут подряд в порядке файлов
+    for ts, _, temperature, humidity in heapq.merge(*runs):
+        if times and times[-1] == ts:
+            if not (_same(temperatures[-1], temperature) and _same(humidities[-1], humidity)):
+                if not conflicts or conflicts[-1] != ts:
+                    conflicts.append(ts)
+                temperatures[-1] = temperature
+                humidities[-1] = humidity
+            continue
+        times.append(ts)
+        temperatures.append(temperature)
+        humidities.append(humidity)
+    return times, temperatures, humidities, conflicts
+
+
+def _merge_numpy(parts):
+    times = np.concatenate([as_numpy(part.times) for part in parts])
+    temperatures = np.concatenate([as_numpy(part.temperatures) for part in parts])
+    humidities = np.concatenate([as_numpy(part.humidities) for part in parts])
+
+    # Устойчивая сортировка сливает уже упорядоченные участки файлов, сохраняя порядок файлов
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    temperatures = temperatures[order]
+    humidities = humidities[order]
+
+    conflicts = []
+    if len(times) > 1:
+        same_ts = times[1:] == times[:-1]
+        if same_ts.any():
+            equal = ((temperatures[1:] == temperatures[:-1]) |
+                     (np.isnan(temperatures[1:]) & np.isnan(temperatures[:-1])))
+            equal &= ((humidities[1:] == humidities[:-1]) |
+                      (np.isnan(humidities[1:]) & np.isnan(humidities[:-1])))
+            conflicts = np.unique(times[1:][same_ts & ~equal]).tolist()
+            # Из строк с одинаковым временем остается последняя
+            keep = np.append(~same_ts, True)
+            times = times[keep]
+            temperatures = temperatures[keep]
+            humidities = humidities[keep]
+
+    return (array('q', times.tobytes()), array('d', temperatures.tobytes()),
+            array('d', humidities.tobytes()), conflicts)
+
+
+def describe_conflicts(name, conflicts):
+    """Сообщение о конфликтах слияния устройства: conflicts - отсортированный список отметок времени"""
+    return (f"Логгер {name}: {len(conflicts)} отметок времени с разными значениями в файлах "
+            f"(с {from_epoch(conflicts[0])} по {from_epoch(conflicts[-1])}), "
+            f"взяты значения последнего файла")
+
+
+def merge_series(name, parts):
+    """
+    Слияние рядов одного устройства (например, логгер выгружен дважды) в один ряд по времени
+
+    parts - ряды в порядке файлов (LoggerSeries или ParsedLogger). Упорядоченные
+    ряды сливаются за O(n log k) (heapq.merge по k рядам; с NumPy - устойчивой
+    сортировкой, которая сливает готовые участки). Из строк с одинаковым
+    временем остается одна: точные повторы отбрасываются, при разных значениях
+    берутся значения более позднего файла (как в хранилище показаний), а
+    время попадает в список конфликтов.
+
+    Возвращает (LoggerSeries, conflicts): ряд по возрастанию времени без
+    повторов и отсортированный список отметок времени с расходящимися значениями.
+    """
+    parts = [part for part in parts if len(part.times)]
+    if not parts:
+        return LoggerSeries(name), []
+    if np is not None:
+        times, temperatures, humidities, conflicts = _merge_numpy(parts)
+    else:
+        times, temperatures, humidities, conflicts = _merge_python(parts)
+    return LoggerSeries(name, times, temperatures, humidities), conflicts
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Потоковый расчет статистики ряда блоками (обработка по блокам, out_of_core)
+"""
+
+import math
+
+
+class RunningStats:
+    """
+    Накопитель статистики ряда за один проход (алгоритм Уэлфорда)
+
+    Хранит только счетчики: память не зависит от длины ряда. Результат
+    (result()) совпадает по составу с series_stats: count, min, max, avg,
+    std (по генеральной совокупности), argmin/argmax (время первого
+    минимума/максимума) и число значений ниже low / выше high.
+    """
+
+    __slots__ = ('low', 'high', 'count', 'mean', 'm2', 'min', 'max',
+                 'argmin', 'argmax', 'below', 'above')
+
+    def __init__(self, low=None, high=None):
+        self.low = low
+        self.high = high
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+        self.argmin = None
+        self.argmax = None
+        self.below = 0
+        self.above = 0
+
+    @classmethod
+    def from_stats(cls, stats, low=None, high=None):
+        """Накопитель участка ряда по готовой статистике series_stats (None - участок без значений)"""
+        running = cls(low, high)
+        if stats is None:
+            return running
+        running.count = stats['count']
+        running.mean = stats['avg']
+        running.m2 = stats['std'] ** 2 * stats['count']
+        running.min = stats['min']
+        running.max = stats['max']
+        running.argmin = stats['argmin']
+        running.argmax = stats['argmax']
+        running.below = stats['below']
+        running.above = stats['above']
+        return running
+
+    def add(self, ts, value):
+        """Учет одного показания (NaN пропускается)"""
+        if value != value:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        if self.min is None or value < self.min:
+            self.min = value
+            self.argmin = ts
+        if self.max is None or value > self.max:
+            self.max = value
+            self.argmax = ts
+        if self.low is not None and value < self.low:
+            self.below += 1
+        if self.high is not None and value > self.high:
+            self.above += 1
+
+    def merge(self, other):
+        """Добавление накопителя другого участка ряда (идущего позже по времени)"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            for name in self.__slots__[2:]:
+                setattr(self, name, getattr(other, name))
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+        if other.min < self.min:
+            self.min = other.min
+            self.argmin = other.argmin
+        if other.max > self.max:
+            self.max = other.max
+            self.argmax = other.argmax
+        self.below += other.below
+        self.above += other.above
+        return self
+
+    def result(self):
+        """Статистика в формате series_stats или None, если значений не было"""
+        if self.count == 0:
+            return None
+        return {
+            'count': self.count,
+            'min': self.min,
+            'max': self.max,
+            'avg': self.mean,
+            'std': math.sqrt(max(self.m2, 0.0) / self.count),
+            'argmin': self.argmin,
+            'argmax': self.argmax,
+            'below': self.below,
+            'above': self.above,
+        }
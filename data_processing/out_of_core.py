@@ -0,0 +1,566 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Обработка длинных исследований с ограниченной памятью
+
+Книги логгеров читаются блоками строк, показания сбрасываются во
+временное хранилище на диске (SpillStore), а статистика по периодам и
+однородность считаются по блокам, прочитанным оттуда. Одновременно в
+памяти находятся только буферы записи и текущие блоки; их размер
+определяется потолком memory_limit.
+"""
+
+from array import array
+from bisect import bisect_right
+from collections import Counter
+import os
+import shutil
+import tempfile
+
+from data_processing.excel_reader import iter_sample_blocks, iter_sheet_rows_openpyxl
+from data_processing.homogeneity import GRID_BLOCK, scan_grid
+from data_processing.logger_series import LoggerSeries, merge_series
+from data_processing.online_stats import RunningStats
+from data_processing.parsed_logger import ParsedLogger
+from data_processing.stats_kernel import np
+from data_processing.window_stats import window_stats
+from data_processing.workbook_layout import (
+    batch_sources, expand_paths, iter_source_rows, iter_source_rows_openpyxl,
+    source_path, split_source, wide_group_blocks,
+)
+from data_processing.xlsx_stream import ExcelDate, iter_sheet_rows
+
+# Потолок памяти по умолчанию (байт)
+DEFAULT_MEMORY_LIMIT = 256 * 2 ** 20
+# Байт на строку в столбцах (time int64 + два float64)
+ROW_BYTES = 24
+# Байт памяти на строку при обработке целиком: столбцы ряда и их копия при слиянии и расчете
+MEMORY_ROW_BYTES = 2 * ROW_BYTES
+# Байт файла .xlsx на строку показаний (сжатый XML, выгрузка на 43 200 строк - около 800 КБ);
+# по нему оценивается число строк файлов, которые еще не разбирались
+XLSX_BYTES_PER_ROW = 16
+# Доли потолка: буферы записи - 1/BUFFER_SHARE, блок расчета со временными массивами -
+# 1/BLOCK_SHARE (в пересчете на строки), узлы блока сетки однородности - 1/GRID_SHARE
+BUFFER_SHARE = 4
+BLOCK_SHARE = 16
+GRID_SHARE = 256
+MIN_BLOCK_ROWS = 1024
+
+COLUMNS = (('times', 'q'), ('temperatures', 'd'), ('humidities', 'd'))
+DATA_TYPES = (('temperature', 'temperatures'), ('humidity', 'humidities'))
+
+
+def estimated_memory(file_paths, row_counts=None):
+    """
+    Оценка памяти для обработки файлов целиком: число строк рядов на MEMORY_ROW_BYTES
+
+    row_counts - известное число строк источников {источник: строк} (хранилище
+    показаний, разобранные файлы). Для остальных источников число строк
+    оценивается по размеру книги (XLSX_BYTES_PER_ROW), книга учитывается один раз.
+    """
+    row_counts = row_counts or {}
+    rows = 0
+    unknown = set()
+    for file_path in file_paths:
+        if str(file_path) in row_counts:
+            rows += row_counts[str(file_path)]
+        else:
+            # Источники одной сводной книги - один файл
+            unknown.add(source_path(file_path))
+    for file_path in unknown:
+        try:
+            rows += os.path.getsize(file_path) // XLSX_BYTES_PER_ROW
+        except OSError:
+            continue
+    return rows * MEMORY_ROW_BYTES
+
+
+def block_rows_for(memory_limit):
+    """Число строк в блоке чтения для потолка памяти memory_limit"""
+    return max(MIN_BLOCK_ROWS, memory_limit // (ROW_BYTES * BLOCK_SHARE))
+
+
+def _strictly_increasing(times):
+    if np is not None and len(times) > 1:
+        return bool((np.diff(np.frombuffer(times, dtype=np.int64)) > 0).all())
+    return all(a < b for a, b in zip(times, times[1:]))
+
+
+class _SpillEntry:
+    __slots__ = ('index', 'rows', 'buffer', 'first', 'last', 'ordered')
+
+    def __init__(self, index):
+        self.index = index
+        self.rows = 0
+        self.buffer = LoggerSeries(index)
+        self.first = None
+        self.last = None
+        self.ordered = True
+
+
+class SpillStore:
+    """
+    Временное хранилище рядов на диске
+
+    Каждая запись (ключ) - три файла с сырыми array('q') / array('d')
+    в каталоге directory. Добавляемые блоки копятся в памяти и сбрасываются
+    на диск, когда буферы всех записей превышают buffer_limit байт.
+    Для записи отслеживается, идут ли отметки времени строго по возрастанию.
+    Каталог удаляется в close() (или при выходе из with).
+    """
+
+    def __init__(self, parent_dir=None, buffer_limit=DEFAULT_MEMORY_LIMIT // BUFFER_SHARE):
+        if parent_dir is not None:
+            os.makedirs(parent_dir, exist_ok=True)
+        self.directory = tempfile.mkdtemp(prefix='spill_', dir=parent_dir)
+        self.buffer_limit = buffer_limit
+        self._entries = {}
+        self._next_index = 0
+        self._buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Удаление временных файлов"""
+        self._entries.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _path(self, entry, column):
+        return os.path.join(self.directory, f"{entry.index}.{column}")
+
+    def append(self, key, times, temperatures, humidities):
+        """Добавление блока строк в конец записи key"""
+        if not len(times):
+            return
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _SpillEntry(self._next_index)
+            self._next_index += 1
+
+        if entry.last is not None and times[0] <= entry.last:
+            entry.ordered = False
+        elif entry.ordered and not _strictly_increasing(times):
+            entry.ordered = False
+        if entry.first is None:
+            entry.first = times[0]
+        entry.last = times[-1]
+
+        entry.buffer.extend(times, temperatures, humidities)
+        entry.rows += len(times)
+        self._buffered += len(times) * ROW_BYTES
+        if self._buffered > self.buffer_limit:
+            self.flush()
+
+    def flush(self):
+        """Запись буферов всех записей на диск"""
+        for entry in self._entries.values():
+            if not len(entry.buffer):
+                continue
+            for column, _ in COLUMNS:
+                with open(self._path(entry, column), 'ab') as f:
+                    getattr(entry.buffer, column).tofile(f)
+            entry.buffer = LoggerSeries(entry.index)
+        self._buffered = 0
+
+    def discard(self, key):
+        """Удаление записи"""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._buffered -= len(entry.buffer) * ROW_BYTES
+        for column, _ in COLUMNS:
+            try:
+                os.remove(self._path(entry, column))
+            except FileNotFoundError:
+                pass
+
+    def keys(self):
+        return list(self._entries)
+
+    def rows(self, key):
+        """Число строк записи (0 - в запись ничего не добавлялось)"""
+        entry = self._entries.get(key)
+        return entry.rows if entry is not None else 0
+
+    def ordered(self, key):
+        """Отметки времени записи строго возрастают (нет повторов и скачков назад)"""
+        return self._entries[key].ordered
+
+    def bounds(self, key):
+        """Первая и последняя добавленные отметки времени записи"""
+        entry = self._entries[key]
+        return entry.first, entry.last
+
+    def read_range(self, key, lo, hi):
+        """Строки [lo, hi) записи в виде LoggerSeries"""
+        entry = self._entries[key]
+        if len(entry.buffer):
+            self.flush()
+        lo = max(0, lo)
+        hi = min(entry.rows, hi)
+        columns = []
+        for column, typecode in COLUMNS:
+            values = array(typecode)
+            if hi > lo:
+                with open(self._path(entry, column), 'rb') as f:
+                    f.seek(lo * values.itemsize)
+                    values.fromfile(f, hi - lo)
+            columns.append(values)
+        return LoggerSeries(key, *columns)
+
+    def iter_blocks(self, key, block_rows):
+        """Последовательное чтение записи блоками по block_rows строк"""
+        for lo in range(0, self.rows(key), block_rows):
+            yield self.read_range(key, lo, lo + block_rows)
+
+    def bisect(self, key, ts, right=False):
+        """
+        Позиция ts в упорядоченной записи (как bisect_left / bisect_right)
+
+        Бинарный поиск читает с диска по одной отметке времени.
+        """
+        entry = self._entries[key]
+        if len(entry.buffer):
+            self.flush()
+        lo, hi = 0, entry.rows
+        with open(self._path(entry, 'times'), 'rb') as f:
+            while lo < hi:
+                mid = (lo + hi) // 2
+                f.seek(mid * 8)
+                value = array('q', f.read(8))
+                if value[0] < ts or (right and value[0] == ts):
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return lo
+
+
+def _spill_rows(store, key, rows, block_rows):
+    header = {}
+    for times, temperatures, humidities in iter_sample_blocks(rows, header, block_rows):
+        store.append(key, times, temperatures, humidities)
+    return header['device_name']
+
+
+def spill_workbook(store, key, file_path, block_rows):
+    """
+    Чтение файла логгера (или источника сводной книги) блоками в запись key хранилища
+
+    Как и read_logger_columns, лист сначала читается напрямую из архива,
+    при неожиданностях запись очищается и файл читается заново через openpyxl.
+    Возвращает имя устройства (A5, иначе имя файла).
+    """
+    try:
+        device_name = _spill_rows(store, key, iter_source_rows(file_path), block_rows)
+        if isinstance(device_name, ExcelDate):
+            raise ValueError("Имя устройства в ячейке с датой")
+    except Exception:
+        store.discard(key)
+        device_name = _spill_rows(store, key, iter_source_rows_openpyxl(file_path), block_rows)
+    return str(device_name or ParsedLogger.default_name(file_path))
+
+
+def _spill_groups(store, keys, sources, reader, block_rows):
+    file_path, sheet, _ = split_source(sources[0])
+    by_group = {split_source(source)[2]: source for source in sources}
+    names, blocks = wide_group_blocks(reader, file_path, sheet, list(by_group), block_rows)
+    for group, times, temperatures, humidities in blocks:
+        store.append(keys[by_group[group]], times, temperatures, humidities)
+    return {by_group[group]: str(name) for group, name in names.items()}
+
+
+def spill_sources(store, keys, sources, block_rows):
+    """
+    Чтение задания batch_sources блоками в записи keys[источник] хранилища
+
+    Группы столбцов широкого листа записываются за один проход по листу.
+    Возвращает {источник: имя устройства}.
+    """
+    if split_source(sources[0])[2] is None:
+        return {sources[0]: spill_workbook(store, keys[sources[0]], sources[0], block_rows)}
+    try:
+        return _spill_groups(store, keys, sources, iter_sheet_rows, block_rows)
+    except Exception:
+        for source in sources:
+            store.discard(keys[source])
+        return _spill_groups(store, keys, sources, iter_sheet_rows_openpyxl, block_rows)
+
+
+def _sorted_runs(store, name, keys, block_rows):
+    """
+    Записи устройства в виде упорядоченных участков (в порядке файлов)
+
+    Упорядоченная запись - один участок. Запись с повторами или скачками
+    назад делится на блоки по block_rows строк, каждый блок упорядочивается
+    merge_series и становится отдельным участком. Возвращает (участки, conflicts).
+    """
+    runs = []
+    conflicts = set()
+    for key in keys:
+        if store.ordered(key):
+            runs.append(key)
+            continue
+        for block in store.iter_blocks(key, block_rows):
+            series, block_conflicts = merge_series(name, [block])
+            run = ('run', name, len(runs))
+            store.append(run, series.times, series.temperatures, series.humidities)
+            runs.append(run)
+            conflicts.update(block_conflicts)
+        store.discard(key)
+    return runs, conflicts
+
+
+def _merge_runs(store, target, name, runs, block_rows):
+    """
+    Слияние упорядоченных участков в запись target по окнам времени
+
+    Из каждого участка читается блок; окно заканчивается на наименьшей
+    последней отметке времени недочитанных блоков, и в него входят все
+    строки участков до этой отметки включительно. Окно сливается
+    merge_series, поэтому одинаковые отметки времени (они всегда в одном
+    окне) обрабатываются так же, как при слиянии в памяти. В памяти -
+    около block_rows строк всех участков. Возвращает множество conflicts.
+    """
+    chunk = max(MIN_BLOCK_ROWS, block_rows // len(runs))
+    positions = [0] * len(runs)
+    conflicts = set()
+    while True:
+        active = [i for i, run in enumerate(runs) if positions[i] < store.rows(run)]
+        if not active:
+            break
+
+        blocks = {}
+        cutoff = None
+        for i in active:
+            blocks[i] = store.read_range(runs[i], positions[i], positions[i] + chunk)
+            if positions[i] + len(blocks[i]) < store.rows(runs[i]):
+                last = blocks[i].times[-1]
+                cutoff = last if cutoff is None else min(cutoff, last)
+
+        parts = []
+        for i in active:
+            block = blocks[i]
+            hi = len(block) if cutoff is None else bisect_right(block.times, cutoff)
+            if hi == len(block) and cutoff is not None and positions[i] + hi < store.rows(runs[i]):
+                # Строки с временем cutoff продолжаются за блоком
+                end = store.bisect(runs[i], cutoff, right=True)
+                block = store.read_range(runs[i], positions[i], end)
+                hi = len(block)
+            if hi:
+                parts.append(LoggerSeries(name, block.times[:hi], block.temperatures[:hi], block.humidities[:hi]))
+                positions[i] += hi
+        del blocks
+
+        series, window_conflicts = merge_series(name, parts)
+        store.append(target, series.times, series.temperatures, series.humidities)
+        conflicts.update(window_conflicts)
+
+    for run in runs:
+        store.discard(run)
+    return conflicts
+
+
+def _combine_parts(store, name, keys, block_rows):
+    """
+    Объединение записей файлов одного устройства в одну упорядоченную запись без повторов
+
+    Если файлы идут друг за другом по времени, записи копируются блоками.
+    Иначе (пересечения, повторы, скачки назад) записи сливаются блоками:
+    _sorted_runs упорядочивает их по участкам, _merge_runs сливает участки
+    по окнам времени; результат - как у merge_series по файлам целиком
+    (при совпадении времени - значения более позднего файла).
+    Возвращает (ключ записи, conflicts).
+    """
+    keys = [key for key in keys if store.rows(key)]
+    if not keys:
+        return None, []
+    if len(keys) == 1 and store.ordered(keys[0]):
+        return keys[0], []
+
+    consecutive = all(store.ordered(key) for key in keys) and all(
+        store.bounds(prev)[1] < store.bounds(key)[0] for prev, key in zip(keys, keys[1:])
+    )
+    target = ('device', name)
+    conflicts = set()
+    if consecutive:
+        for key in keys:
+            for block in store.iter_blocks(key, block_rows):
+                store.append(target, block.times, block.temperatures, block.humidities)
+            store.discard(key)
+    else:
+        runs, conflicts = _sorted_runs(store, name, keys, block_rows)
+        conflicts |= _merge_runs(store, target, name, runs, block_rows)
+    store.flush()
+    return target, sorted(conflicts)
+
+
+def _median_of_counts(counts):
+    """Медиана по частотам значений (как statistics.median / np.median)"""
+    n = sum(counts.values())
+    if not n:
+        return None
+    middle = ((n - 1) // 2, n // 2)
+    found = []
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        while len(found) < 2 and seen > middle[len(found)]:
+            found.append(value)
+        if len(found) == 2:
+            break
+    return (found[0] + found[1]) / 2
+
+
+def _count_steps(counts, previous, times):
+    """Учет положительных шагов времени блока (с переходом от предыдущего блока)"""
+    if np is not None:
+        diffs = np.diff(times, prepend=previous) if previous is not None else np.diff(times)
+        values, freq = np.unique(diffs[diffs > 0], return_counts=True)
+        counts.update(dict(zip(values.tolist(), freq.tolist())))
+        return
+    last = previous
+    for t in times:
+        if last is not None and t > last:
+            counts[t - last] += 1
+        last = t
+
+
+class _DeviceSummary:
+    """Итоги одного прохода по записи устройства: статистика периодов, шаги и границы рядов"""
+
+    def __init__(self, windows, limits):
+        self.stats = {}
+        self.steps = {}
+        self.bounds = {}
+        for data_type, value_key in DATA_TYPES:
+            low, high = limits.get(data_type) or (None, None)
+            self.stats[value_key] = [RunningStats(low, high) for _ in windows]
+            self.steps[value_key] = Counter()
+            self.bounds[value_key] = None
+
+    def add_block(self, block, windows, limits):
+        for data_type, value_key in DATA_TYPES:
+            low, high = limits.get(data_type) or (None, None)
+            times, values = block.valid(value_key)
+            if not len(times):
+                continue
+            for running, stats in zip(self.stats[value_key], window_stats(times, values, windows, low, high)):
+                running.merge(RunningStats.from_stats(stats, low, high))
+
+            bounds = self.bounds[value_key]
+            _count_steps(self.steps[value_key], bounds[1] if bounds else None, times)
+            first = bounds[0] if bounds else int(times[0])
+            self.bounds[value_key] = (first, int(times[-1]))
+
+
+def _chunked_homogeneity(store, targets, summaries, value_key, memory_limit):
+    """Однородность (как compute_homogeneity) по блокам сетки, ряды читаются с диска частями"""
+    present = [name for name in targets if summaries[name].bounds[value_key] is not None]
+    if len(present) < 2:
+        return None, []
+
+    medians = [m for m in (_median_of_counts(summaries[name].steps[value_key]) for name in present)
+               if m is not None]
+    if not medians:
+        return None, []
+    step = max(1, int(min(medians)))
+    tolerance = step // 2
+    grid_start = min(summaries[name].bounds[value_key][0] for name in present)
+    grid_end = max(summaries[name].bounds[value_key][1] for name in present)
+
+    def block_series(block_start, block_end):
+        series = []
+        for name in present:
+            key = targets[name]
+            lo = store.bisect(key, block_start - tolerance)
+            hi = store.bisect(key, block_end + tolerance, right=True)
+            series.append(store.read_range(key, lo, hi).valid(value_key))
+        return series
+
+    block_nodes = max(MIN_BLOCK_ROWS, min(GRID_BLOCK, memory_limit // (GRID_SHARE * len(present))))
+    return scan_grid(block_series, grid_start, grid_end, step, tolerance, block_nodes)
+
+
+def chunked_stats(file_paths, periods, limits=None, memory_limit=DEFAULT_MEMORY_LIMIT,
+                  spill_dir=None, check_cancelled=None):
+    """
+    Статистика по периодам и однородность без загрузки рядов в память целиком
+
+    Каждый файл (лист, группа столбцов сводной книги - workbook_layout)
+    читается блоками строк во временное хранилище (SpillStore в
+    каталоге spill_dir), файлы одного устройства объединяются с удалением
+    повторов (при совпадении времени - значения более позднего файла, как в
+    хранилище показаний). Затем по каждому устройству выполняется один проход
+    блоками: статистика периодов копится в RunningStats, заодно собираются
+    шаги записи и границы рядов для сетки однородности. Однородность
+    считается scan_grid по блокам сетки.
+
+    memory_limit - потолок памяти в байтах: из него выводятся объем буферов
+    записи, размер блока чтения и число узлов в блоке сетки.
+    check_cancelled - вызывается между файлами и устройствами (может прервать расчет исключением).
+
+    Возвращает (period_stats, homogeneity, conflicts):
+    - period_stats - как ExcelProcessor.compute_period_stats (среднее и СКО
+      объединяются по блокам и могут отличаться в последних знаках)
+    - homogeneity - {'temperatures': (max_diff, max_times), 'humidities': ...}, как compute_homogeneity
+    - conflicts - {имя: отметки времени с разными значениями в файлах}, как SampleStore.load
+    """
+    limits = limits or {}
+    windows = [(start, end) for _, start, end in periods]
+    block_rows = block_rows_for(memory_limit)
+    check_cancelled = check_cancelled or (lambda: None)
+
+    with SpillStore(spill_dir, memory_limit // BUFFER_SHARE) as store:
+        sources = expand_paths(file_paths)
+        keys = {source: ('file', index) for index, source in enumerate(sources)}
+        by_name = {}
+        for batch in batch_sources(list(keys)):
+            try:
+                names = spill_sources(store, keys, batch, block_rows)
+            except Exception as e:
+                for source in batch:
+                    store.discard(keys[source])
+                print(f"Ошибка обработки файла {source_path(batch[0])}: {e}")
+                continue
+            for source, device_name in names.items():
+                by_name.setdefault(device_name, []).append(keys[source])
+            check_cancelled()
+        # Файлы одного устройства - в порядке file_paths (при совпадении времени побеждает последний)
+        for parts in by_name.values():
+            parts.sort()
+
+        targets = {}
+        conflicts = {}
+        for name in sorted(by_name):
+            key, device_conflicts = _combine_parts(store, name, by_name[name], block_rows)
+            if key is not None:
+                targets[name] = key
+            if device_conflicts:
+                conflicts[name] = device_conflicts
+            check_cancelled()
+
+        summaries = {}
+        for name, key in targets.items():
+            summary = _DeviceSummary(windows, limits)
+            for block in store.iter_blocks(key, block_rows):
+                summary.add_block(block, windows, limits)
+            summaries[name] = summary
+            check_cancelled()
+
+        homogeneity = {}
+        for _, value_key in DATA_TYPES:
+            homogeneity[value_key] = _chunked_homogeneity(store, targets, summaries, value_key, memory_limit)
+            check_cancelled()
+
+    period_stats = {period_id: {} for period_id, _, _ in periods}
+    for name, summary in summaries.items():
+        for index, (period_id, _, _) in enumerate(periods):
+            period_stats[period_id][name] = {
+                data_type: summary.stats[value_key][index].result()
+                for data_type, value_key in DATA_TYPES
+            }
+    return period_stats, homogeneity, conflicts
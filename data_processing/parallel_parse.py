@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Параллельный разбор файлов логгеров
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import os
+
+from data_processing.parsed_logger import ParsedLogger
+from data_processing.quality import scan_quality
+from data_processing.workbook_layout import batch_sources, read_sources
+
+
+def default_workers(file_count):
+    """Число процессов по умолчанию: по ядру на файл, но не больше числа ядер"""
+    return max(1, min(os.cpu_count() or 1, file_count))
+
+
+def _parse_worker(sources):
+    """
+    Разбор задания batch_sources и проверка качества записи в дочернем процессе
+
+    Задание - один файл (лист) или группы столбцов одного широкого листа,
+    который разбирается один раз. Возвращаются компактные array('q')/array('d'):
+    при передаче в родительский процесс они сериализуются как сплошные байты.
+    """
+    result = {}
+    for source, (device_name, times, temperatures, humidities) in read_sources(sources).items():
+        result[source] = (device_name, times, temperatures, humidities,
+                          scan_quality(times, temperatures, humidities))
+    return result
+
+
+def _parse_serial(batches, parsed, errors):
+    for sources in batches:
+        try:
+            parsed.update(_parse_worker(sources))
+        except Exception as e:
+            errors.update(dict.fromkeys(sources, e))
+
+
+def _parse_pool(batches, max_workers, parsed, errors):
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(sources, executor.submit(_parse_worker, sources)) for sources in batches]
+        for sources, future in futures:
+            try:
+                parsed.update(future.result())
+            except BrokenProcessPool:
+                raise
+            except Exception as e:
+                errors.update(dict.fromkeys(sources, e))
+
+
+def parse_files(file_paths, cache=None, max_workers=None):
+    """
+    Разбор набора файлов логгеров
+
+    file_paths - пути или источники сводных книг (workbook_layout). Файлы,
+    найденные в cache (ParseCache), не разбираются. Остальные разбиваются на
+    задания batch_sources (лист - задание, группы столбцов широкого листа -
+    одно задание на лист) и разбираются в ProcessPoolExecutor из max_workers
+    процессов (None - по числу ядер); при max_workers=1, единственном задании
+    или невозможности запустить процессы разбор выполняется последовательно
+    в текущем процессе.
+
+    Возвращает (loggers, errors):
+    - loggers: {путь: ParsedLogger} в порядке file_paths
+    - errors: {путь: исключение} для файлов, которые не удалось прочитать
+    """
+    file_paths = [str(file_path) for file_path in file_paths]
+    columns = {}
+    errors = {}
+    keys = {}
+
+    pending = []
+    for file_path in file_paths:
+        if file_path in columns or file_path in pending:
+            continue
+        if cache is not None:
+            try:
+                keys[file_path] = cache.key_for(file_path)
+            except OSError as e:
+                errors[file_path] = e
+                continue
+            cached = cache.get(keys[file_path])
+            if cached is not None:
+                columns[file_path] = cached
+                continue
+        pending.append(file_path)
+
+    batches = batch_sources(pending)
+    if max_workers is None:
+        max_workers = default_workers(len(batches))
+
+    parsed = {}
+    if max_workers > 1 and len(batches) > 1:
+        try:
+            _parse_pool(batches, max_workers, parsed, errors)
+        except (OSError, NotImplementedError, BrokenProcessPool) as e:
+            # Процессы недоступны (ограничения окружения) - дочитываем последовательно
+            print(f"Параллельный разбор недоступен, файлы читаются последовательно: {e}")
+            _parse_serial([sources for sources in batches
+                           if not any(source in parsed or source in errors for source in sources)],
+                          parsed, errors)
+    else:
+        _parse_serial(batches, parsed, errors)
+
+    for file_path, (device_name, times, temperatures, humidities, quality) in parsed.items():
+        if not device_name:
+            device_name = ParsedLogger.default_name(file_path)
+        if cache is not None:
+            cache.put(keys[file_path], device_name, times, temperatures, humidities, quality)
+        columns[file_path] = (device_name, times, temperatures, humidities, quality)
+
+    loggers = {}
+    for file_path in file_paths:
+        if file_path in columns and file_path not in loggers:
+            loggers[file_path] = ParsedLogger(file_path, *columns[file_path])
+    return loggers, errors
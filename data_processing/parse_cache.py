@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Кэш разобранных файлов логгеров между сессиями
+"""
+
+import hashlib
+import json
+import struct
+from array import array
+from pathlib import Path
+
+from data_processing.excel_reader import PARSER_VERSION
+from data_processing.workbook_layout import split_source
+from utils.disk_cache import evict_lru, touch, write_atomic
+
+# Ограничение размера кэша по умолчанию
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+MAGIC = b'LGPC'
+# Заголовок: сигнатура, версия формата, длина имени, количество строк, длина отчета о качестве
+HEADER = struct.Struct('<4sHIQI')
+FORMAT_VERSION = 2
+
+
+class ParseCache:
+    """
+    Кэш рядов логгеров, ключ - SHA-256 содержимого книги и версии разборщика
+
+    Каждая запись - отдельный файл <ключ>.bin: заголовок, имя устройства,
+    три столбца (время int64, температура и влажность float64) в
+    двоичном виде и отчет о качестве записи (scan_quality) в JSON.
+    При превышении max_bytes удаляются записи, к которым дольше всего
+    не обращались (LRU по времени изменения файла).
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key_for(file_path):
+        """
+        Ключ записи: SHA-256 версии разборщика и байтов файла
+
+        Для источника сводной книги (workbook_layout) к ключу добавляются номера листа и группы столбцов.
+        """
+        file_path, sheet, group = split_source(file_path)
+        digest = hashlib.sha256(f"parser-{PARSER_VERSION}:".encode())
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        if sheet is not None:
+            digest.update(f":sheet-{sheet}:group-{group}".encode())
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.bin"
+
+    def get(self, key):
+        """Чтение записи: (name, times, temperatures, humidities, quality) или None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                magic, version, name_len, rows, quality_len = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or version != FORMAT_VERSION:
+                    return None
+                name = f.read(name_len).decode('utf-8')
+                times = array('q')
+                temperatures = array('d')
+                humidities = array('d')
+                times.fromfile(f, rows)
+                temperatures.fromfile(f, rows)
+                humidities.fromfile(f, rows)
+                quality = json.loads(f.read(quality_len).decode('utf-8')) if quality_len else None
+        except (OSError, EOFError, struct.error, UnicodeDecodeError, ValueError):
+            return None
+
+        # Отмечаем обращение для LRU
+        touch(path)
+        return name, times, temperatures, humidities, quality
+
+    def put(self, key, name, times, temperatures, humidities, quality=None):
+        """Запись рядов (и отчета о качестве) в кэш с последующим вытеснением старых записей"""
+        name_bytes = str(name).encode('utf-8')
+        quality_bytes = json.dumps(quality).encode('utf-8') if quality is not None else b''
+
+        def write(f):
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(name_bytes), len(times), len(quality_bytes)))
+            f.write(name_bytes)
+            array('q', times).tofile(f)
+            array('d', temperatures).tofile(f)
+            array('d', humidities).tofile(f)
+            f.write(quality_bytes)
+
+        path = self._entry_path(key)
+        try:
+            write_atomic(path, write)
+        except OSError as e:
+            print(f"Ошибка записи кэша {path.name}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Удаление самых давних записей, пока размер кэша превышает max_bytes"""
+        evict_lru(self.cache_dir, '*.bin', self.max_bytes)
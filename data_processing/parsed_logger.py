@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Разобранный файл логгера
+"""
+
+from pathlib import Path
+
+from data_processing.quality import scan_quality
+from data_processing.timestamps import from_epoch
+from data_processing.workbook_layout import probe_source_range, read_source_columns, split_source
+
+
+class ParsedLogger:
+    """
+    Файл логгера, прочитанный один раз: имя, временной диапазон и ряды значений
+
+    Логгер, открытый через probe(), хранит только имя и диапазон; ряды
+    значений читаются при первом обращении к times/temperatures/humidities
+    (или вызове load()), после чего start/end уточняются по данным.
+    quality - отчет scan_quality, считается при разборе и хранится в кэше вместе с рядами.
+    """
+
+    def __init__(self, file_path, name, times, temperatures, humidities, quality=None):
+        self.file_path = str(file_path)
+        self.name = name
+        self._set_columns(times, temperatures, humidities, quality)
+        self._cache = None
+        self._cache_key = None
+
+    def _set_columns(self, times, temperatures, humidities, quality=None):
+        self._times = times
+        self._temperatures = temperatures
+        self._humidities = humidities
+        self._quality = quality
+        self.start = min(times) if times else None
+        self.end = max(times) if times else None
+
+    @classmethod
+    def _read(cls, file_path, cache=None, key=None):
+        """Ряды файла из кэша или полным разбором: (name, times, temperatures, humidities, quality)"""
+        if cache is not None and key is None:
+            key = cache.key_for(file_path)
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            return cached
+
+        device_name, times, temperatures, humidities = read_source_columns(file_path)
+        if not device_name:
+            device_name = cls.default_name(file_path)
+        quality = scan_quality(times, temperatures, humidities)
+        if key is not None:
+            cache.put(key, device_name, times, temperatures, humidities, quality)
+        return device_name, times, temperatures, humidities, quality
+
+    @classmethod
+    def from_file(cls, file_path, cache=None):
+        """
+        Чтение файла логгера (имя устройства - A5, иначе имя файла)
+
+        cache - ParseCache: если файл с тем же содержимым уже разбирался, ряды берутся из кэша
+        """
+        return cls(file_path, *cls._read(file_path, cache))
+
+    @classmethod
+    def probe(cls, file_path, cache=None):
+        """
+        Быстрое открытие файла логгера для списка файлов
+
+        Если файл есть в кэше, ряды берутся оттуда. Иначе определяются только
+        имя и диапазон по первым и последним строкам листа, полный разбор
+        откладывается до обращения к рядам. Если быстро определить диапазон
+        нельзя, файл разбирается сразу.
+        """
+        key = cache.key_for(file_path) if cache is not None else None
+        cached = cache.get(key) if key is not None else None
+        if cached is not None:
+            return cls(file_path, *cached)
+
+        probed = probe_source_range(file_path)
+        if probed is None:
+            return cls(file_path, *cls._read(file_path, cache, key))
+
+        device_name, start, end = probed
+        logger = cls(file_path, device_name or cls.default_name(file_path), None, None, None)
+        logger.start = start
+        logger.end = end
+        logger._cache = cache
+        logger._cache_key = key
+        return logger
+
+    @property
+    def loaded(self):
+        """Прочитаны ли ряды значений"""
+        return self._times is not None
+
+    def load(self):
+        """Полный разбор отложенного файла (повторные вызовы ничего не делают)"""
+        if self._times is None:
+            self.name, *columns = self._read(self.file_path, self._cache, self._cache_key)
+            self._set_columns(*columns)
+        return self
+
+    @property
+    def quality(self):
+        """Отчет scan_quality или None, если ряды еще не прочитаны"""
+        if self._times is None:
+            return None
+        if self._quality is None:
+            self._quality = scan_quality(self._times, self._temperatures, self._humidities)
+        return self._quality
+
+    @property
+    def times(self):
+        return self.load()._times
+
+    @property
+    def temperatures(self):
+        return self.load()._temperatures
+
+    @property
+    def humidities(self):
+        return self.load()._humidities
+
+    @staticmethod
+    def default_name(file_path):
+        """Имя логгера, если в файле не указано имя устройства (для листа сводной книги - с номером листа)"""
+        file_path, sheet, _ = split_source(file_path)
+        if sheet is not None:
+            return f"{Path(file_path).stem} (лист {sheet + 1})"
+        return Path(file_path).stem
+
+    @property
+    def start_datetime(self):
+        """Начало записи (datetime или None)"""
+        return from_epoch(self.start) if self.start is not None else None
+
+    @property
+    def end_datetime(self):
+        """Конец записи (datetime или None)"""
+        return from_epoch(self.end) if self.end is not None else None
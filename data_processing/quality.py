@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Проверка качества записи логгера
+"""
+
+from collections import Counter
+
+from data_processing.stats_kernel import np, as_numpy
+
+# Разрыв - интервал между отметками больше GAP_FACTOR основных интервалов записи
+GAP_FACTOR = 3
+# Залипание - не меньше STUCK_MIN_RUN одинаковых показаний подряд
+STUCK_MIN_RUN = 60
+
+
+def scan_quality(times, temperatures, humidities):
+    """
+    Проверка регулярности записи за один проход по столбцам
+
+    Возвращает словарь:
+    - rows: число строк
+    - step: основной интервал записи в секундах (самый частый положительный), None если строк < 2
+    - gaps, max_gap: число разрывов длиннее GAP_FACTOR интервалов и самый длинный разрыв (с)
+    - duplicates: число повторяющихся подряд отметок времени
+    - backward: число переходов времени назад (сброс часов, склейка файлов)
+    - stuck: {'temperatures': n, 'humidities': n} - самая длинная серия одинаковых
+      показаний, если она не короче STUCK_MIN_RUN (иначе 0)
+    """
+    if np is not None:
+        return _scan_numpy(times, temperatures, humidities)
+    return _scan_python(times, temperatures, humidities)
+
+
+def _scan_numpy(times, temperatures, humidities):
+    times = as_numpy(times)
+    report = _empty_report(len(times))
+    if len(times) < 2:
+        return report
+
+    diffs = np.diff(times)
+    positive = diffs[diffs > 0]
+    if len(positive):
+        values, counts = np.unique(positive, return_counts=True)
+        step = int(values[counts.argmax()])
+        gaps = positive[positive > step * GAP_FACTOR]
+        report['step'] = step
+        report['gaps'] = int(len(gaps))
+        report['max_gap'] = int(gaps.max()) if len(gaps) else 0
+    report['duplicates'] = int((diffs == 0).sum())
+    report['backward'] = int((diffs < 0).sum())
+
+    for key, column in (('temperatures', temperatures), ('humidities', humidities)):
+        values = as_numpy(column)
+        # Границы серий: значение отличается от предыдущего (NaN всегда отличается)
+        starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+        runs = np.diff(np.append(starts, len(values)))
+        longest = int(runs.max())
+        if longest >= STUCK_MIN_RUN and not np.isnan(values[starts[runs.argmax()]]):
+            report['stuck'][key] = longest
+    return report
+
+
+def _scan_python(times, temperatures, humidities):
+    report = _empty_report(len(times))
+    if len(times) < 2:
+        return report
+
+    steps = Counter()
+    positive = []
+    for a, b in zip(times, times[1:]):
+        diff = b - a
+        if diff > 0:
+            steps[diff] += 1
+            positive.append(diff)
+        elif diff == 0:
+            report['duplicates'] += 1
+        else:
+            report['backward'] += 1
+    if steps:
+        # При равной частоте - меньший интервал, как в np.unique
+        step = min(steps, key=lambda d: (-steps[d], d))
+        gaps = [d for d in positive if d > step * GAP_FACTOR]
+        report['step'] = step
+        report['gaps'] = len(gaps)
+        report['max_gap'] = max(gaps) if gaps else 0
+
+    for key, column in (('temperatures', temperatures), ('humidities', humidities)):
+        longest = run = 0
+        previous = None
+        for value in column:
+            run = run + 1 if value == previous else 1
+            previous = value
+            if run > longest and value == value:
+                longest = run
+        if longest >= STUCK_MIN_RUN:
+            report['stuck'][key] = longest
+    return report
+
+
+def _empty_report(rows):
+    return {
+        'rows': rows,
+        'step': None,
+        'gaps': 0,
+        'max_gap': 0,
+        'duplicates': 0,
+        'backward': 0,
+        'stuck': {'temperatures': 0, 'humidities': 0},
+    }
+
+
+def _format_duration(seconds):
+    hours, rest = divmod(int(seconds), 3600)
+    if hours >= 24:
+        return f"{hours // 24} д {hours % 24} ч"
+    if hours:
+        return f"{hours} ч {rest // 60} мин"
+    return f"{rest // 60} мин"
+
+
+def describe_quality(report):
+    """Краткое описание результата scan_quality для списка файлов"""
+    if report is None:
+        return "не проверено"
+    if report['rows'] < 2:
+        return "мало данных"
+
+    problems = []
+    if report['gaps']:
+        problems.append(f"разрывов: {report['gaps']} (до {_format_duration(report['max_gap'])})")
+    if report['duplicates']:
+        problems.append(f"повторов времени: {report['duplicates']}")
+    if report['backward']:
+        problems.append(f"скачков назад: {report['backward']}")
+    stuck = report['stuck']
+    if stuck['temperatures']:
+        problems.append(f"залипание t: {stuck['temperatures']} точек")
+    if stuck['humidities']:
+        problems.append(f"залипание RH: {stuck['humidities']} точек")
+    return "; ".join(problems) if problems else "норма"
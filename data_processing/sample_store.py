@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Хранилище исходных показаний логгеров
+"""
+
+from array import array
+from itertools import repeat
+import sqlite3
+
+from data_processing.logger_series import LoggerSeries
+
+NAN = float('nan')
+
+
+class SampleStore:
+    """
+    Показания логгеров в SQLite (таблица samples, ключ (logger, ts, source))
+
+    Заполняется один раз при загрузке файлов, при генерации отчета
+    данные читаются отсюда, а не разбором Excel. Строки каждого файла
+    хранятся отдельно, поэтому удаление файла не затрагивает показания
+    других файлов того же логгера; совпадающие отметки времени разных
+    файлов разрешаются при чтении (load).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path)
+        # Данные сессии восстанавливаются из Excel, поэтому fsync на каждую запись не нужен
+        conn.execute("PRAGMA synchronous = OFF")
+        return conn
+
+    def add_logger(self, parsed):
+        """Сохранение показаний разобранного файла (ParsedLogger); прежние строки этого файла заменяются"""
+        rows = zip(repeat(str(parsed.name)), parsed.times, parsed.temperatures,
+                   parsed.humidities, repeat(parsed.file_path))
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM samples WHERE source = ?", (parsed.file_path,))
+                conn.executemany("""
+                    INSERT OR REPLACE INTO samples (logger, ts, temperature, humidity, source)
+                    VALUES (?, ?, ?, ?, ?)
+                """, rows)
+        finally:
+            conn.close()
+
+    def remove_source(self, file_path):
+        """Удаление показаний, загруженных из файла"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM samples WHERE source = ?", (str(file_path),))
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Удаление всех показаний"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM samples")
+        finally:
+            conn.close()
+
+    def sources(self):
+        """Множество файлов, показания которых есть в хранилище"""
+        conn = self._connect()
+        try:
+            return {row[0] for row in conn.execute("SELECT DISTINCT source FROM samples")}
+        finally:
+            conn.close()
+
+    def row_counts(self):
+        """Число строк каждого файла в хранилище: {источник: строк}"""
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT source, COUNT(*) FROM samples GROUP BY source"))
+        finally:
+            conn.close()
+
+    def load(self, start=None, end=None, sources=None):
+        """
+        Показания логгеров за диапазон [start, end] (секунды от эпохи, None - без ограничения)
+
+        sources - файлы (источники), показания которых нужны, в порядке загрузки
+        (None - все файлы хранилища по имени). При совпадении отметок времени
+        одного логгера в нескольких файлах берутся значения более позднего
+        файла списка - как при слиянии merge_series; точные повторы
+        отбрасываются, а отметки с разными значениями считаются конфликтами.
+
+        Возвращает (logger_data, conflicts): logger_data - {имя: LoggerSeries},
+        ряды по возрастанию времени без повторов; conflicts - {имя: отсортированный
+        список отметок времени с расходящимися значениями} (только логгеры с конфликтами).
+        """
+        start = start if start is not None else -2 ** 63
+        end = end if end is not None else 2 ** 63 - 1
+
+        logger_data = {}
+        conflicts = {}
+        conn = self._connect()
+        try:
+            if sources is None:
+                sources = sorted(row[0] for row in conn.execute("SELECT DISTINCT source FROM samples"))
+            conn.execute("CREATE TEMP TABLE wanted (source TEXT PRIMARY KEY, priority INTEGER)")
+            conn.executemany("INSERT OR REPLACE INTO wanted (source, priority) VALUES (?, ?)",
+                             ((str(source), priority) for priority, source in enumerate(sources)))
+
+            loggers = [row[0] for row in conn.execute("""
+                SELECT DISTINCT logger FROM samples JOIN wanted USING (source) ORDER BY logger
+            """)]
+            for logger in loggers:
+                # Для MAX() SQLite берет остальные столбцы из строки с максимумом - строки самого позднего файла.
+                # Конфликт - больше одного различного значения, пустое значение (NULL) считается отдельным
+                rows = conn.execute("""
+                    SELECT ts, temperature, humidity, MAX(wanted.priority),
+                           COUNT(DISTINCT temperature) + (SUM(temperature IS NULL) > 0) > 1
+                           OR COUNT(DISTINCT humidity) + (SUM(humidity IS NULL) > 0) > 1
+                    FROM samples
+                    JOIN wanted USING (source)
+                    WHERE logger = ? AND ts BETWEEN ? AND ?
+                    GROUP BY ts
+                    ORDER BY ts
+                """, (logger, start, end)).fetchall()
+                if not rows:
+                    continue
+                logger_data[logger] = LoggerSeries(
+                    logger,
+                    array('q', [row[0] for row in rows]),
+                    array('d', [NAN if row[1] is None else row[1] for row in rows]),
+                    array('d', [NAN if row[2] is None else row[2] for row in rows]),
+                )
+                logger_conflicts = [row[0] for row in rows if row[4]]
+                if logger_conflicts:
+                    conflicts[logger] = logger_conflicts
+        finally:
+            conn.close()
+        return logger_data, conflicts
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Расчет статистики ряда логгера за один вызов
+
+Если установлен NumPy, ряды (array('q') / array('d')) обрабатываются
+через np.frombuffer без копирования. Без NumPy используется чистый Python.
+
+Суммы для среднего и СКО: в NumPy - np.sum по float64 (попарное
+суммирование, ошибка порядка log2(n) ulp), в чистом Python - точная
+math.fsum. Поэтому avg и std двух реализаций могут расходиться в
+последних знаках - не больше 1e-12 от наибольшего по модулю значения
+ряда (допуск закреплен в tests/test_stats_kernel.py); остальные поля
+совпадают точно.
+"""
+
+import math
+from array import array
+
+try:
+    import numpy as np
+except ImportError:  # NumPy необязателен
+    np = None
+
+
+def as_numpy(column):
+    """Представление array('q') / array('d') как массива NumPy без копирования"""
+    if isinstance(column, array):
+        dtype = np.int64 if column.typecode == 'q' else np.float64
+        return np.frombuffer(column, dtype=dtype) if len(column) else np.empty(0, dtype=dtype)
+    return np.asarray(column)
+
+
+def series_stats(times, values, low=None, high=None, use_numpy=None):
+    """
+    Статистика ряда: min, max, среднее, СКО, время минимума/максимума и выходы за пределы
+
+    times, values - выровненные столбцы (значения NaN пропускаются)
+    low, high - границы допустимого диапазона (None - не проверяется)
+    use_numpy - принудительный выбор реализации (None - NumPy, если установлен)
+
+    Возвращает словарь {'count', 'min', 'max', 'avg', 'std', 'argmin', 'argmax',
+    'below', 'above'} или None, если значений нет. std - по генеральной совокупности.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return _series_stats_numpy(times, values, low, high)
+    return _series_stats_python(times, values, low, high)
+
+
+def _series_stats_numpy(times, values, low, high):
+    times = as_numpy(times)
+    values = as_numpy(values)
+    mask = ~np.isnan(values)
+    if not mask.all():
+        times = times[mask]
+        values = values[mask]
+    count = len(values)
+    if count == 0:
+        return None
+
+    imin = int(values.argmin())
+    imax = int(values.argmax())
+    avg = float(np.sum(values, dtype=np.float64)) / count
+    deviations = values - avg
+    std = math.sqrt(float(np.sum(deviations * deviations)) / count)
+    return {
+        'count': count,
+        'min': float(values[imin]),
+        'max': float(values[imax]),
+        'avg': avg,
+        'std': std,
+        'argmin': int(times[imin]),
+        'argmax': int(times[imax]),
+        'below': int((values < low).sum()) if low is not None else 0,
+        'above': int((values > high).sum()) if high is not None else 0,
+    }
+
+
+def _series_stats_python(times, values, low, high):
+    clean = [v for v in values if v == v]
+    count = len(clean)
+    if count == 0:
+        return None
+    if count < len(values):
+        times = [t for t, v in zip(times, values) if v == v]
+
+    min_value = min(clean)
+    max_value = max(clean)
+    avg = math.fsum(clean) / count
+    std = math.sqrt(math.fsum([(v - avg) * (v - avg) for v in clean]) / count)
+    return {
+        'count': count,
+        'min': min_value,
+        'max': max_value,
+        'avg': avg,
+        'std': std,
+        'argmin': times[clean.index(min_value)],
+        'argmax': times[clean.index(max_value)],
+        'below': sum(v < low for v in clean) if low is not None else 0,
+        'above': sum(v > high for v in clean) if high is not None else 0,
+    }
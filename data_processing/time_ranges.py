@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Поиск общих временных диапазонов логгеров
+"""
+
+
+def find_max_overlap(intervals):
+    """
+    Поиск наибольших групп интервалов с общим пересечением ненулевой длины
+
+    Сканирующая прямая по отсортированным границам интервалов, O(n log n)
+    (плюс размер групп при выдаче). Интервалы, которые только касаются
+    границами, пересекающимися не считаются.
+
+    intervals: список (начало, конец) - любые сравнимые значения (datetime, секунды)
+
+    Возвращает (размер группы, группы), где группы - список
+    (кортеж индексов, (начало, конец)) для всех групп максимального размера,
+    упорядоченный по индексам так же, как перебор itertools.combinations.
+    """
+    events = []
+    for i, (start, end) in enumerate(intervals):
+        if start < end:
+            # Концы обрабатываются раньше начал в ту же секунду (касание - не пересечение)
+            events.append((start, 1, i))
+            events.append((end, 0, i))
+    if not events:
+        return 0, []
+    events.sort()
+
+    # Первый проход: только глубина покрытия
+    best_size = 0
+    depth = 0
+    for pos, (_, kind, _) in enumerate(events):
+        depth += 1 if kind else -1
+        # Глубина учитывается на отрезке до следующей (большей) границы
+        if pos + 1 < len(events) and events[pos + 1][0] != events[pos][0]:
+            best_size = max(best_size, depth)
+
+    # Второй проход: состав групп на отрезках с максимальной глубиной
+    groups = set()
+    active = set()
+    for pos, (_, kind, i) in enumerate(events):
+        if kind:
+            active.add(i)
+        else:
+            active.discard(i)
+        if (len(active) == best_size and pos + 1 < len(events)
+                and events[pos + 1][0] != events[pos][0]):
+            groups.add(tuple(sorted(active)))
+
+    result = []
+    for indices in sorted(groups):
+        common_start = max(intervals[i][0] for i in indices)
+        common_end = min(intervals[i][1] for i in indices)
+        result.append((indices, (common_start, common_end)))
+    return best_size, result
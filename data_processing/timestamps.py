@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Приведение отметок времени к секундам от эпохи
+"""
+
+from array import array
+from datetime import date, datetime, timedelta
+
+from data_processing.xlsx_stream import ExcelDate, serial_to_epoch
+
+
+EPOCH = datetime(1970, 1, 1)
+EPOCH_DATE = EPOCH.date()
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# Форматы времени, встречающиеся в текстовых ячейках выгрузок
+TIME_FORMATS = (
+    "%d.%m.%Y %H:%M:%S",
+    "%d.%m.%Y %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+)
+
+# Сколько первых непустых значений столбца просматривается при определении формата
+SAMPLE_SIZE = 16
+
+
+def is_serial(value):
+    """Число без формата даты - серийная дата Excel (логическое значение не считается числом)"""
+    return type(value) is float or type(value) is int
+
+
+def to_epoch(value):
+    """Преобразование значения ячейки времени в секунды от эпохи (None, если не время)"""
+    if isinstance(value, ExcelDate):
+        return value.ts
+    if isinstance(value, datetime):
+        return round((value - EPOCH).total_seconds())
+    if is_serial(value):
+        # Серийная дата Excel в ячейке без формата даты: (value - 25569) * 86400;
+        # value - value != 0 только у NaN и бесконечностей
+        return serial_to_epoch(value) if value - value == 0 else None
+    if isinstance(value, str):
+        text = value.strip()
+        for fmt in TIME_FORMATS:
+            try:
+                return round((datetime.strptime(text, fmt) - EPOCH).total_seconds())
+            except ValueError:
+                continue
+    return None
+
+
+def from_epoch(ts):
+    """Преобразование секунд от эпохи обратно в datetime"""
+    return EPOCH + timedelta(seconds=int(ts))
+
+
+def parse_time(value):
+    """datetime из значения времени (как to_epoch); ValueError, если значение не распознано"""
+    ts = to_epoch(value)
+    if ts is None:
+        raise ValueError(f"Не удалось распознать время: {value!r}")
+    return from_epoch(ts)
+
+
+def _fixed_layout(day_slice, day_sep, month_slice, year_slice):
+    """
+    Разбор строк фиксированной ширины 'дата ЧЧ:ММ[:СС]' без strptime
+
+    Дата занимает первые 10 символов и переводится в число дней один раз
+    (в выгрузке тысячи строк приходятся на одни сутки), время разбирается
+    срезами. Строка другой ширины или с недопустимыми полями передается
+    в to_epoch, поэтому результат всегда совпадает с разбором по TIME_FORMATS.
+    """
+    days_cache = {}
+
+    def parse_day(text):
+        part = text[:10]
+        days = days_cache.get(part)
+        if days is None:
+            if part[day_sep[0]] != day_sep[1] or part[day_sep[2]] != day_sep[1]:
+                return None
+            digits = part[day_slice] + part[month_slice] + part[year_slice]
+            if not (digits.isascii() and digits.isdigit()):
+                return None
+            try:
+                day = date(int(part[year_slice]), int(part[month_slice]), int(part[day_slice]))
+            except ValueError:
+                return None
+            days = days_cache[part] = (day - EPOCH_DATE).days
+        return days
+
+    def convert(value):
+        if type(value) is not str:
+            return to_epoch(value)
+        length = len(value)
+        if (length != 16 and length != 19) or value[10] != ' ' or value[13] != ':':
+            return to_epoch(value)
+        days = parse_day(value)
+        if days is None:
+            return to_epoch(value)
+        clock = value[11:13] + value[14:16]
+        if length == 19:
+            if value[16] != ':':
+                return to_epoch(value)
+            clock += value[17:19]
+        if not (clock.isascii() and clock.isdigit()):
+            return to_epoch(value)
+        hours = int(clock[0:2])
+        minutes = int(clock[2:4])
+        seconds = int(clock[4:6]) if length == 19 else 0
+        if hours > 23 or minutes > 59 or seconds > 59:
+            return to_epoch(value)
+        return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+    return convert
+
+
+def _convert_excel_date(value):
+    if type(value) is ExcelDate:
+        return value.ts
+    return to_epoch(value)
+
+
+def _convert_serial(value):
+    if type(value) is int or (type(value) is float and value - value == 0):
+        return serial_to_epoch(value)
+    return to_epoch(value)
+
+
+def _convert_datetime(value):
+    if type(value) is datetime and not value.microsecond and value.tzinfo is None:
+        return (value.toordinal() - EPOCH_ORDINAL) * 86400 + value.hour * 3600 + value.minute * 60 + value.second
+    return to_epoch(value)
+
+
+# Строковые форматы с быстрым разбором: (срез дня, (позиция, разделитель, позиция), срез месяца, срез года)
+_FIXED_LAYOUTS = {
+    'dd.mm.yyyy': (slice(0, 2), (2, '.', 5), slice(3, 5), slice(6, 10)),
+    'yyyy-mm-dd': (slice(8, 10), (4, '-', 7), slice(5, 7), slice(0, 4)),
+}
+
+
+def detect_format(values):
+    """
+    Определение вида значений столбца времени по первым SAMPLE_SIZE непустым значениям
+
+    Возвращает 'excel' (даты, распознанные при чтении листа), 'datetime',
+    'serial' (серийные даты Excel - числа в ячейках без формата даты),
+    'dd.mm.yyyy' / 'yyyy-mm-dd' (строки фиксированной ширины) или None,
+    если вид не определен (значения разбираются общим to_epoch).
+    """
+    kinds = set()
+    for value in values:
+        if value is None or value == "":
+            continue
+        if type(value) is ExcelDate:
+            kinds.add('excel')
+        elif type(value) is datetime:
+            kinds.add('datetime')
+        elif is_serial(value):
+            kinds.add('serial')
+        elif type(value) is str and len(value) in (16, 19) and value[10] == ' ':
+            if value[2] == '.' and value[5] == '.':
+                kinds.add('dd.mm.yyyy')
+            elif value[4] == '-' and value[7] == '-':
+                kinds.add('yyyy-mm-dd')
+            else:
+                return None
+        else:
+            return None
+        if len(kinds) > 1:
+            return None
+    return kinds.pop() if kinds else None
+
+
+def make_converter(kind):
+    """Функция value -> секунды от эпохи (или None) для вида столбца из detect_format"""
+    if kind == 'excel':
+        return _convert_excel_date
+    if kind == 'datetime':
+        return _convert_datetime
+    if kind == 'serial':
+        return _convert_serial
+    if kind in _FIXED_LAYOUTS:
+        return _fixed_layout(*_FIXED_LAYOUTS[kind])
+    return to_epoch
+
+
+class TimestampNormalizer:
+    """
+    Преобразователь значений одного столбца времени
+
+    Формат определяется один раз по первым SAMPLE_SIZE непустым значениям,
+    дальше каждое значение переводится выбранной функцией. Значения другого
+    вида (смешанный столбец) разбираются общим to_epoch, так что результат
+    не отличается от to_epoch для каждого значения.
+    """
+
+    __slots__ = ('kind', '_convert', '_sample')
+
+    def __init__(self):
+        self.kind = None
+        self._convert = None
+        self._sample = []
+
+    def __call__(self, value):
+        if self._convert is not None:
+            return self._convert(value)
+        if value is not None and value != "":
+            self._sample.append(value)
+            if len(self._sample) >= SAMPLE_SIZE:
+                self._choose()
+                return self._convert(value)
+        return to_epoch(value)
+
+    def _choose(self):
+        self.kind = detect_format(self._sample)
+        self._convert = make_converter(self.kind)
+        self._sample = None
+
+
+def normalize_column(values):
+    """
+    Перевод всего столбца времени в секунды от эпохи
+
+    Возвращает array('q'); ValueError, если какое-либо значение не является временем.
+    """
+    values = list(values)
+    convert = make_converter(detect_format(values[:SAMPLE_SIZE]))
+    result = array('q')
+    for value in values:
+        ts = convert(value)
+        if ts is None:
+            raise ValueError(f"Не удалось распознать время: {value!r}")
+        result.append(ts)
+    return result
+
+
+def format_epoch(ts, fmt="%d.%m.%Y %H:%M"):
+    """Форматирование секунд от эпохи (или datetime) строкой; другие значения - str()"""
+    if isinstance(ts, int):
+        ts = from_epoch(ts)
+    if isinstance(ts, datetime):
+        return ts.strftime(fmt)
+    return str(ts)
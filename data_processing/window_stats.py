@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Статистика рядов логгеров по временным окнам (периодам)
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from data_processing.stats_kernel import np, as_numpy, series_stats
+
+
+def valid_sorted(times, values):
+    """
+    Подготовка ряда к оконным запросам за один проход:
+    пропуск пустых значений (NaN) и сортировка по времени, если она нарушена
+    """
+    if np is not None:
+        times = as_numpy(times)
+        values = as_numpy(values)
+        mask = ~np.isnan(values)
+        if not mask.all():
+            times = times[mask]
+            values = values[mask]
+        if len(times) > 1 and (np.diff(times) < 0).any():
+            order = np.argsort(times, kind='stable')
+            times = times[order]
+            values = values[order]
+        return times, values
+
+    clean_times = array('q')
+    clean_values = array('d')
+    is_sorted = True
+    last = None
+    for t, v in zip(times, values):
+        if v != v:
+            continue
+        if last is not None and t < last:
+            is_sorted = False
+        last = t
+        clean_times.append(t)
+        clean_values.append(v)
+
+    if not is_sorted:
+        order = sorted(range(len(clean_times)), key=clean_times.__getitem__)
+        clean_times = array('q', (clean_times[i] for i in order))
+        clean_values = array('d', (clean_values[i] for i in order))
+    return clean_times, clean_values
+
+
+def window_stats(times, values, windows, low=None, high=None):
+    """
+    Статистика ряда для нескольких окон
+
+    times, values - результат valid_sorted (отсортированное время без пустых значений)
+    windows - список (начало, конец) в секундах от эпохи, обе границы включительно
+    low, high - границы допустимого диапазона для подсчета выходов за пределы
+
+    Границы всех окон находятся бинарным поиском (с NumPy - одним вызовом
+    searchsorted), агрегаты по срезу считает series_stats.
+    Для каждого окна возвращает словарь series_stats или None, если в окне нет данных.
+    """
+    if np is not None and not isinstance(times, array):
+        starts = np.array([start for start, _ in windows], dtype=np.int64)
+        ends = np.array([end for _, end in windows], dtype=np.int64)
+        bounds = zip(np.searchsorted(times, starts, 'left').tolist(),
+                     np.searchsorted(times, ends, 'right').tolist())
+    else:
+        bounds = [(bisect_left(times, start), bisect_right(times, end)) for start, end in windows]
+
+    result = []
+    for lo, hi in bounds:
+        if lo >= hi:
+            result.append(None)
+            continue
+        result.append(series_stats(times[lo:hi], values[lo:hi], low, high))
+    return result
@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Сводные книги с несколькими логгерами
+
+Кроме обычной выгрузки (один логгер на активном листе: имя в A5, время,
+температура и влажность в столбцах B-D) встречаются сводные книги:
+- лист на каждый логгер в том же формате;
+- широкий лист: время в столбце A, в строке 1 заголовки столбцов логгеров
+  ("Логгер 1 T, °C", "Логгер 1 RH, %", "Логгер 2 T, °C", ...). Подряд идущие
+  столбцы с одним именем образуют группу: температура и (если есть) влажность.
+
+Каждый логгер такой книги - отдельный источник: строка "<путь>::<лист>" или
+"<путь>::<лист>/<группа>" (номера с нуля, лист - в порядке workbook.worksheets).
+Обычный файл - источник без суффикса. Источник читается с тем же результатом,
+что и отдельный файл логгера с теми же данными.
+"""
+
+from array import array
+from itertools import islice
+import os
+from pathlib import Path
+import re
+import threading
+
+import openpyxl
+
+from data_processing.excel_reader import (
+    FIRST_DATA_ROW, NAME_ROW, PROBE_HEAD_ROWS,
+    iter_sheet_rows_openpyxl, probe_time_range, read_logger_columns, to_float,
+)
+from data_processing.timestamps import TimestampNormalizer, from_epoch, is_serial, to_epoch
+from data_processing.xlsx_stream import ExcelDate, iter_sheet_rows, list_sheets
+
+SOURCE_RE = re.compile(r"^(?P<path>.+)::(?P<sheet>\d+)(?:/(?P<group>\d+))?$", re.S)
+
+# Сколько столбцов просматривается при поиске заголовков широкого листа
+MAX_COLUMNS = 256
+
+# Сколько раскрытых книг хранится в памяти (expand_sources)
+EXPANDED_CACHE_SIZE = 1024
+
+# Пометки величины в заголовке столбца широкого листа
+HUMIDITY_RE = re.compile(r"%|\brh\b|влажн\w*|humid\w*", re.I)
+TEMPERATURE_RE = re.compile(r"°\s*[cс]?|\bt\b|темп\w*|temp\w*", re.I)
+
+
+def make_source(file_path, sheet, group=None):
+    """Источник логгера сводной книги: лист sheet (и группа столбцов group широкого листа)"""
+    if group is None:
+        return f"{file_path}::{sheet}"
+    return f"{file_path}::{sheet}/{group}"
+
+
+def split_source(source):
+    """Разбор источника: (путь к файлу, номер листа или None, номер группы или None)"""
+    match = SOURCE_RE.match(str(source))
+    if match is None:
+        return str(source), None, None
+    group = match.group('group')
+    return match.group('path'), int(match.group('sheet')), int(group) if group is not None else None
+
+
+def source_path(source):
+    """Путь к файлу книги источника"""
+    return split_source(source)[0]
+
+
+def _header_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, ExcelDate):
+        value = from_epoch(value.ts)
+    return str(value).strip()
+
+
+def header_groups(header):
+    """
+    Группы столбцов широкого листа по строке заголовков
+
+    Возвращает список (имя логгера, столбец температуры, столбец влажности);
+    номера столбцов - индексы в строке (с нуля), отсутствующий столбец - None.
+    Величина определяется по пометкам в заголовке (RH, %, влажность - влажность,
+    иначе температура), имя - заголовок без пометок.
+    """
+    groups = []
+    for col in range(1, len(header)):
+        text = _header_text(header[col])
+        if not text:
+            continue
+        is_humidity = HUMIDITY_RE.search(text) is not None
+        name = TEMPERATURE_RE.sub(" ", HUMIDITY_RE.sub(" ", text))
+        name = " ".join(name.split()).strip(" ,;:()[]_-") or f"Столбец {col + 1}"
+
+        if groups and groups[-1][0] == name and groups[-1][2 if is_humidity else 1] is None:
+            last = groups[-1]
+            groups[-1] = (name, last[1], col) if is_humidity else (name, col, last[2])
+        else:
+            groups.append((name, None, col) if is_humidity else (name, col, None))
+    return groups
+
+
+def _sheet_titles(file_path):
+    """Названия листов с данными и номер активного (при неожиданностях - через openpyxl)"""
+    try:
+        return list_sheets(file_path)
+    except Exception:
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            titles = [worksheet.title for worksheet in workbook.worksheets]
+            active = workbook.active
+            active = titles.index(active.title) if active is not None and active.title in titles else None
+            return titles, active
+        finally:
+            workbook.close()
+
+
+def _sheet_head(file_path, sheet, rows=PROBE_HEAD_ROWS, max_col=MAX_COLUMNS):
+    try:
+        return list(islice(iter_sheet_rows(file_path, max_col=max_col, sheet=sheet), rows))
+    except Exception:
+        return list(islice(iter_sheet_rows_openpyxl(file_path, max_col=max_col, sheet=sheet), rows))
+
+
+def _classify_sheet(head):
+    """'standard' для листа одного логгера, список групп для широкого листа, None - не данные логгеров"""
+    data_rows = head[FIRST_DATA_ROW - 1:]
+    # Число в столбце B может быть и температурой широкого листа, поэтому серийные даты
+    # в B проверяются только после того, как лист не распознан как широкий
+    if any(len(row) > 1 and not is_serial(row[1]) and to_epoch(row[1]) is not None for row in data_rows):
+        return 'standard'
+    if head and any(row and to_epoch(row[0]) is not None for row in data_rows):
+        groups = header_groups(head[0])
+        if groups:
+            return groups
+    if any(len(row) > 1 and to_epoch(row[1]) is not None for row in data_rows):
+        return 'standard'
+    return None
+
+
+# Раскрытые книги: {путь: ((время изменения, размер), источники)}
+_expanded = {}
+_expanded_lock = threading.Lock()
+
+
+def expand_sources(file_path):
+    """
+    Источники логгеров книги: [(источник, подпись для списка файлов)]
+
+    Обычный файл (один лист логгера, активный) - один источник, равный пути.
+    В сводной книге - источник на каждый лист логгера и на каждую группу
+    столбцов широкого листа; листы без данных логгеров пропускаются.
+    Если книгу не удалось разобрать, возвращается сам путь (ошибка будет
+    выведена при чтении).
+
+    Результат запоминается по пути до изменения файла (время изменения и
+    размер), поэтому повторные вызовы (expand_paths при каждой обработке)
+    не открывают книгу.
+    """
+    file_path = str(file_path)
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return _expand_sources(file_path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _expanded_lock:
+        cached = _expanded.get(file_path)
+    if cached is not None and cached[0] == version:
+        return list(cached[1])
+
+    sources = _expand_sources(file_path)
+    with _expanded_lock:
+        if len(_expanded) >= EXPANDED_CACHE_SIZE:
+            _expanded.clear()
+        _expanded[file_path] = (version, sources)
+    return list(sources)
+
+
+def _expand_sources(file_path):
+    label = Path(file_path).name
+    try:
+        titles, active = _sheet_titles(file_path)
+        layouts = []
+        for sheet, title in enumerate(titles):
+            try:
+                layout = _classify_sheet(_sheet_head(file_path, sheet))
+            except Exception:
+                continue
+            if layout is not None:
+                layouts.append((sheet, title, layout))
+    except Exception:
+        return [(file_path, label)]
+
+    if not layouts or (len(layouts) == 1 and layouts[0][0] == active and layouts[0][2] == 'standard'):
+        return [(file_path, label)]
+
+    sources = []
+    for sheet, title, layout in layouts:
+        if layout == 'standard':
+            sources.append((make_source(file_path, sheet), f"{label} [{title}]"))
+            continue
+        for group, (name, _, _) in enumerate(layout):
+            sources.append((make_source(file_path, sheet, group), f"{label} [{title}: {name}]"))
+    return sources
+
+
+def expand_paths(file_paths):
+    """Источники всех логгеров файлов: пути раскрываются expand_sources, источники остаются как есть"""
+    sources = []
+    for file_path in file_paths:
+        if split_source(file_path)[1] is not None:
+            sources.append(str(file_path))
+        else:
+            sources.extend(source for source, _ in expand_sources(file_path))
+    return sources
+
+
+def _wide_layout(reader, file_path, sheet):
+    header = next(iter(reader(file_path, max_col=MAX_COLUMNS, sheet=sheet)), ())
+    groups = header_groups(header)
+    width = max([col for _, temp_col, hum_col in groups for col in (temp_col, hum_col) if col is not None],
+                default=0) + 1
+    return groups, width
+
+
+def _select_groups(groups, wanted):
+    if wanted is None:
+        return dict(enumerate(groups))
+    missing = [group for group in wanted if not 0 <= group < len(groups)]
+    if missing:
+        raise ValueError(f"На широком листе нет групп столбцов {missing}")
+    return {group: groups[group] for group in wanted}
+
+
+def iter_group_blocks(rows, groups, block_rows=None):
+    """
+    Показания групп столбцов широкого листа за один проход по строкам
+
+    rows - строки листа (кортежи, столбец A - время), groups - {номер: (имя,
+    столбец температуры, столбец влажности)}. Для каждой группы действуют
+    правила iter_samples, как если бы группа была отдельным файлом: строки
+    без распознаваемого времени пропускаются, данные группы заканчиваются на
+    первой строке, где пусты и время, и ее столбцы. Кроме того, пропускаются
+    строки, где пусты оба столбца группы: логгеры широкого листа пишут с
+    разным шагом и в разное время, общее время в столбце A не означает
+    показания каждого логгера.
+
+    Выдает (номер группы, times, temperatures, humidities) блоками не длиннее
+    block_rows строк (None - по одному блоку на группу в конце).
+    """
+    normalize = TimestampNormalizer()
+    state = {
+        group: [temp_col, hum_col, array('q'), array('d'), array('d'), False]
+        for group, (_, temp_col, hum_col) in groups.items()
+    }
+    active = list(state)
+
+    for row_idx, row in enumerate(rows, start=1):
+        if row_idx < FIRST_DATA_ROW:
+            continue
+        time_val = row[0] if row else None
+        ts = normalize(time_val) if time_val is not None else None
+        still_active = []
+        for group in active:
+            columns = state[group]
+            temp_col, hum_col, times, temperatures, humidities, ended = columns
+            if ended:
+                if row_idx < NAME_ROW:
+                    still_active.append(group)
+                continue
+            temp_val = row[temp_col] if temp_col is not None and temp_col < len(row) else None
+            humidity_val = row[hum_col] if hum_col is not None and hum_col < len(row) else None
+            if not time_val and not temp_val and not humidity_val:
+                columns[5] = True
+                if row_idx < NAME_ROW:
+                    still_active.append(group)
+                continue
+            still_active.append(group)
+            if ts is None or (temp_val is None and humidity_val is None):
+                # Пустые столбцы группы - у логгера нет показания на это время
+                continue
+            times.append(ts)
+            temperatures.append(to_float(temp_val))
+            humidities.append(to_float(humidity_val))
+            if block_rows is not None and len(times) >= block_rows:
+                yield group, times, temperatures, humidities
+                columns[2:5] = [array('q'), array('d'), array('d')]
+        active = still_active
+        if not active:
+            break
+
+    for group, (_, _, times, temperatures, humidities, _) in state.items():
+        if block_rows is None or len(times):
+            yield group, times, temperatures, humidities
+
+
+def wide_group_blocks(reader, file_path, sheet, groups=None, block_rows=None):
+    """
+    Чтение групп столбцов широкого листа блоками
+
+    reader - iter_sheet_rows или iter_sheet_rows_openpyxl, groups - номера
+    нужных групп (None - все). Возвращает ({номер группы: имя логгера}, блоки
+    iter_group_blocks).
+    """
+    layout, width = _wide_layout(reader, file_path, sheet)
+    selected = _select_groups(layout, groups)
+    names = {group: name for group, (name, _, _) in selected.items()}
+    return names, iter_group_blocks(reader(file_path, max_col=width, sheet=sheet), selected, block_rows)
+
+
+def _read_wide(reader, file_path, sheet, groups):
+    names, blocks = wide_group_blocks(reader, file_path, sheet, groups)
+    return {
+        group: (names[group], times, temperatures, humidities)
+        for group, times, temperatures, humidities in blocks
+    }
+
+
+def read_wide_groups(file_path, sheet, groups=None):
+    """
+    Чтение групп столбцов широкого листа за один проход
+
+    groups - номера нужных групп (None - все). Лист читается напрямую из
+    архива, при неожиданностях - через openpyxl. Возвращает
+    {номер группы: (device_name, times, temperatures, humidities)} в формате read_logger_columns.
+    """
+    try:
+        return _read_wide(iter_sheet_rows, file_path, sheet, groups)
+    except Exception:
+        return _read_wide(iter_sheet_rows_openpyxl, file_path, sheet, groups)
+
+
+def read_source_columns(source):
+    """Чтение источника логгера в формате read_logger_columns"""
+    file_path, sheet, group = split_source(source)
+    if group is None:
+        return read_logger_columns(file_path, sheet)
+    return read_wide_groups(file_path, sheet, [group])[group]
+
+
+def batch_sources(sources):
+    """
+    Разбиение источников на задания разбора
+
+    Группы одного широкого листа читаются одним заданием (лист разбирается
+    один раз), остальные источники - по одному. Порядок - как в sources.
+    """
+    batches = []
+    wide = {}
+    for source in sources:
+        file_path, sheet, group = split_source(source)
+        if group is None:
+            batches.append([source])
+            continue
+        key = (file_path, sheet)
+        if key not in wide:
+            wide[key] = []
+            batches.append(wide[key])
+        wide[key].append(source)
+    return batches
+
+
+def read_sources(sources):
+    """Чтение задания batch_sources: {источник: (device_name, times, temperatures, humidities)}"""
+    file_path, sheet, group = split_source(sources[0])
+    if group is None:
+        return {sources[0]: read_source_columns(sources[0])}
+    columns = read_wide_groups(file_path, sheet, [split_source(source)[2] for source in sources])
+    return {source: columns[split_source(source)[2]] for source in sources}
+
+
+def _group_rows(reader, file_path, sheet, group):
+    """Строки группы широкого листа в формате обычной выгрузки (имя в A5, столбцы B-D)"""
+    groups, width = _wide_layout(reader, file_path, sheet)
+    name, temp_col, hum_col = _select_groups(groups, [group])[group]
+    out_idx = 0
+    for row_idx, row in enumerate(reader(file_path, max_col=width, sheet=sheet), start=1):
+        time_val = row[0] if row else None
+        temp_val = row[temp_col] if temp_col is not None and temp_col < len(row) else None
+        humidity_val = row[hum_col] if hum_col is not None and hum_col < len(row) else None
+        if row_idx >= FIRST_DATA_ROW and time_val and temp_val is None and humidity_val is None:
+            # Как в iter_group_blocks: у логгера нет показания на это время
+            continue
+        out_idx += 1
+        yield (name if out_idx == NAME_ROW else None, time_val, temp_val, humidity_val)
+    # Короткий лист: строка имени все равно выдается
+    for out_idx in range(out_idx + 1, NAME_ROW + 1):
+        yield (name if out_idx == NAME_ROW else None, None, None, None)
+
+
+def iter_source_rows(source):
+    """Строки источника в формате обычной выгрузки (столбцы A-D), прямое чтение из архива"""
+    file_path, sheet, group = split_source(source)
+    if group is None:
+        return iter_sheet_rows(file_path, sheet=sheet)
+    return _group_rows(iter_sheet_rows, file_path, sheet, group)
+
+
+def iter_source_rows_openpyxl(source):
+    """То же, что iter_source_rows, через openpyxl"""
+    file_path, sheet, group = split_source(source)
+    if group is None:
+        return iter_sheet_rows_openpyxl(file_path, sheet=sheet)
+    return _group_rows(iter_sheet_rows_openpyxl, file_path, sheet, group)
+
+
+def probe_source_range(source):
+    """Быстрое определение имени и диапазона (как probe_time_range); для групп широкого листа - None"""
+    file_path, sheet, group = split_source(source)
+    if group is not None:
+        return None
+    return probe_time_range(file_path, sheet)
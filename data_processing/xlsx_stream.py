@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Прямое потоковое чтение листа XLSX без объектной модели openpyxl
+"""
+
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+
+from openpyxl.styles.numbers import builtin_format_code, is_date_format, is_timedelta_format
+
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+ROW_TAG = f"{{{MAIN_NS}}}row"
+CELL_TAG = f"{{{MAIN_NS}}}c"
+VALUE_TAG = f"{{{MAIN_NS}}}v"
+TEXT_TAG = f"{{{MAIN_NS}}}t"
+RUN_TAG = f"{{{MAIN_NS}}}r"
+SI_TAG = f"{{{MAIN_NS}}}si"
+PHONETIC_TAG = f"{{{MAIN_NS}}}rPh"
+
+# Размер блока при чтении XML листа из архива
+CHUNK_SIZE = 64 * 1024
+# Сколько последних байт XML листа разбирается при быстром определении диапазона
+TAIL_BYTES = 64 * 1024
+
+ROOT_TAG_RE = re.compile(rb"<worksheet\b[^>]*>")
+
+# Серийный номер Excel для 1970-01-01 (система дат 1900)
+EXCEL_EPOCH_DAYS = 25569
+MS_PER_DAY = 86400 * 1000
+
+COLUMN_RE = re.compile(r"[A-Z]+")
+
+
+class UnsupportedWorkbook(Exception):
+    """Книга не подходит для быстрого чтения (нужно читать через openpyxl)"""
+
+
+class ExcelDate:
+    """Ячейка с датой в формате даты Excel: секунды от эпохи, без создания datetime"""
+
+    __slots__ = ('ts',)
+
+    def __init__(self, ts):
+        self.ts = ts
+
+    def __repr__(self):
+        return f"ExcelDate({self.ts})"
+
+
+def serial_to_epoch(serial):
+    """
+    Серийная дата Excel -> секунды от эпохи
+
+    (serial - 25569) * 86400 с тем же округлением до миллисекунд, что и
+    openpyxl.utils.datetime.from_excel, поэтому результат совпадает
+    с разбором через datetime.
+    """
+    day, fraction = divmod(serial, 1)
+    total_ms = (int(day) - EXCEL_EPOCH_DAYS) * MS_PER_DAY + round(fraction * MS_PER_DAY)
+    return round(total_ms / 1000)
+
+
+def _cast_number(text):
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+_COLUMN_INDEX = {}
+
+
+def _column_index(coordinate):
+    """Номер столбца по адресу ячейки (B12 -> 2)"""
+    letters = coordinate.rstrip("0123456789")
+    index = _COLUMN_INDEX.get(letters)
+    if index is None:
+        if not COLUMN_RE.fullmatch(letters):
+            raise UnsupportedWorkbook(f"Неожиданный адрес ячейки: {coordinate}")
+        index = 0
+        for ch in letters:
+            index = index * 26 + ord(ch) - 64
+        _COLUMN_INDEX[letters] = index
+    return index
+
+
+def _text_content(node):
+    """Текст строки (простой и из фрагментов форматирования), как Text.content в openpyxl"""
+    snippets = []
+    plain = node.find(TEXT_TAG)
+    if plain is not None and plain.text:
+        snippets.append(plain.text)
+    for run in node.iterfind(RUN_TAG):
+        text = run.findtext(TEXT_TAG)
+        if text:
+            snippets.append(text)
+    return "".join(snippets)
+
+
+def _read_rels(archive, path):
+    """Связи части пакета: {Id: (Type, путь в архиве)}"""
+    rels_path = posixpath.join(posixpath.dirname(path), "_rels", posixpath.basename(path) + ".rels")
+    base = posixpath.dirname(path)
+    rels = {}
+    root = ET.fromstring(archive.read(rels_path))
+    for rel in root.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get("Id")] = (rel.get("Type", ""), target)
+    return rels
+
+
+def _workbook_path(archive):
+    for rel_type, target in _read_rels(archive, "").values():
+        if rel_type.endswith("/officeDocument"):
+            return target
+    raise UnsupportedWorkbook("Не найдена книга в пакете")
+
+
+def _list_sheets(archive, workbook_path, workbook_rels):
+    """
+    Листы книги: ([(название, путь к XML)] листов с данными в порядке книги, путь к активному листу)
+
+    Порядок и состав списка - как workbook.worksheets в openpyxl (листы
+    диаграмм пропускаются), активный лист - как workbook.active.
+    """
+    root = ET.fromstring(archive.read(workbook_path))
+    if root.tag != f"{{{MAIN_NS}}}workbook":
+        raise UnsupportedWorkbook("Неподдерживаемое пространство имен книги")
+
+    pr = root.find(f"{{{MAIN_NS}}}workbookPr")
+    if pr is not None and pr.get("date1904", "").lower() in ("1", "true"):
+        raise UnsupportedWorkbook("Система дат 1904")
+
+    active = 0
+    views = root.find(f"{{{MAIN_NS}}}bookViews")
+    if views is not None:
+        for view in views:
+            if view.get("activeTab") is not None:
+                active = int(view.get("activeTab"))
+                break
+
+    sheets = root.find(f"{{{MAIN_NS}}}sheets")
+    if sheets is None or active >= len(sheets):
+        raise UnsupportedWorkbook("Не найден активный лист")
+    for sheet in sheets:
+        if sheet.get(f"{{{REL_NS}}}id") not in workbook_rels:
+            raise UnsupportedWorkbook("Лист без связи в пакете")
+
+    worksheets = []
+    for sheet in sheets:
+        rel_type, target = workbook_rels[sheet.get(f"{{{REL_NS}}}id")]
+        if rel_type.endswith("/worksheet"):
+            worksheets.append((sheet.get("name", ""), target))
+
+    rel_type, active_target = workbook_rels[sheets[active].get(f"{{{REL_NS}}}id")]
+    if not rel_type.endswith("/worksheet"):
+        active_target = None
+    return worksheets, active_target
+
+
+def _sheet_path(archive, workbook_path, workbook_rels, sheet=None):
+    """Путь к XML листа: sheet - номер в workbook.worksheets, None - активный лист"""
+    worksheets, active_target = _list_sheets(archive, workbook_path, workbook_rels)
+    if sheet is None:
+        if active_target is None:
+            raise UnsupportedWorkbook("Активный лист не является листом с данными")
+        return active_target
+    if not 0 <= sheet < len(worksheets):
+        raise UnsupportedWorkbook(f"Нет листа с номером {sheet}")
+    return worksheets[sheet][1]
+
+
+def list_sheets(file_path):
+    """
+    Листы с данными книги: ([названия в порядке workbook.worksheets], номер активного или None)
+
+    Номер активного листа - индекс в этом списке (None, если активен лист диаграммы).
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        workbook_path = _workbook_path(archive)
+        worksheets, active_target = _list_sheets(archive, workbook_path, _read_rels(archive, workbook_path))
+    targets = [target for _, target in worksheets]
+    active = targets.index(active_target) if active_target in targets else None
+    return [title for title, _ in worksheets], active
+
+
+def _read_shared_strings(archive, path):
+    strings = []
+    if path is None:
+        return strings
+    with archive.open(path) as source:
+        for _, node in ET.iterparse(source):
+            if node.tag == SI_TAG:
+                strings.append(_text_content(node).replace('x005F_', ''))
+                node.clear()
+    return strings
+
+
+def _read_date_styles(archive, path):
+    """Индексы стилей ячеек с форматом даты и с форматом интервала времени"""
+    date_styles = set()
+    timedelta_styles = set()
+    if path is None:
+        return date_styles, timedelta_styles
+
+    root = ET.fromstring(archive.read(path))
+    custom = {}
+    num_fmts = root.find(f"{{{MAIN_NS}}}numFmts")
+    if num_fmts is not None:
+        for fmt in num_fmts:
+            custom[int(fmt.get("numFmtId"))] = fmt.get("formatCode")
+
+    cell_xfs = root.find(f"{{{MAIN_NS}}}cellXfs")
+    if cell_xfs is not None:
+        for idx, xf in enumerate(cell_xfs):
+            fmt_id = int(xf.get("numFmtId", 0))
+            fmt = custom[fmt_id] if fmt_id in custom else builtin_format_code(fmt_id)
+            if is_date_format(fmt):
+                date_styles.add(idx)
+            if is_timedelta_format(fmt):
+                timedelta_styles.add(idx)
+    return date_styles, timedelta_styles
+
+
+def _open_sheet(archive, max_col, sheet=None):
+    """Путь к XML листа (None - активного) и приемник строк с общими строками и стилями дат книги"""
+    workbook_path = _workbook_path(archive)
+    workbook_rels = _read_rels(archive, workbook_path)
+    sheet_path = _sheet_path(archive, workbook_path, workbook_rels, sheet)
+
+    strings_path = styles_path = None
+    for rel_type, target in workbook_rels.values():
+        if rel_type.endswith("/sharedStrings"):
+            strings_path = target
+        elif rel_type.endswith("/styles"):
+            styles_path = target
+    shared_strings = _read_shared_strings(archive, strings_path)
+    date_styles, timedelta_styles = _read_date_styles(archive, styles_path)
+    return sheet_path, _SheetRowsTarget(max_col, shared_strings, date_styles, timedelta_styles)
+
+
+def iter_sheet_rows(file_path, max_col=4, sheet=None):
+    """
+    Строки листа как кортежи из max_col значений (столбцы A..)
+
+    sheet - номер листа в workbook.worksheets, None - активный лист.
+
+    Повторяет iter_rows(min_row=1, max_col=max_col, values_only=True)
+    листа openpyxl в режиме read-only с data_only=True: пропущенные строки
+    и ячейки заполняются None, числа - int/float, строки - str. Ячейки с
+    форматом даты возвращаются как ExcelDate. Всё, что быстрое чтение не
+    воспроизводит точно (система дат 1904, время без даты, интервалы,
+    даты в ISO-формате), вызывает UnsupportedWorkbook.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_path, target = _open_sheet(archive, max_col, sheet)
+        parser = ET.XMLParser(target=target)
+        with archive.open(sheet_path) as source:
+            chunks = iter(lambda: source.read(CHUNK_SIZE), b'')
+            yield from _fill_gaps(_feed_rows(parser, target, chunks), max_col)
+
+
+def _feed_rows(parser, target, chunks):
+    """Подача блоков XML в парсер; выдает готовые строки (номер, значения)"""
+    for chunk in chunks:
+        parser.feed(chunk)
+        rows, target.rows = target.rows, []
+        yield from rows
+    parser.close()
+    yield from target.rows
+
+
+def _fill_gaps(numbered_rows, max_col):
+    """Строки подряд начиная с первой: пропущенные заполняются None, повторные номера отбрасываются"""
+    empty_row = (None,) * max_col
+    counter = 1
+    for row_counter, values in numbered_rows:
+        while counter < row_counter:
+            counter += 1
+            yield empty_row
+        if counter == row_counter:
+            counter += 1
+            yield values
+
+
+def probe_sheet(file_path, head_rows, max_col=4, tail_bytes=TAIL_BYTES, sheet=None):
+    """
+    Начало и конец листа (sheet - как в iter_sheet_rows) без разбора всех строк
+
+    Разбираются только первые head_rows строк. Остаток XML листа лишь
+    распаковывается потоком, из него сохраняются последние tail_bytes байт,
+    и разбираются только строки, целиком попавшие в этот хвост (запись
+    dimension в выгрузках бывает неверной, поэтому на нее не полагаемся).
+
+    Возвращает (head, tail, complete):
+    - head: список строк 1..head_rows (как в iter_sheet_rows)
+    - tail: строки из хвоста [(номер, значения)] в порядке листа
+    - complete: True, если лист целиком попал в head (tail тогда пуст)
+    Если найти строки в хвосте не удалось, вызывается UnsupportedWorkbook.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        sheet_path, target = _open_sheet(archive, max_col, sheet)
+        parser = ET.XMLParser(target=target)
+        with archive.open(sheet_path) as source:
+            first_chunk = source.read(CHUNK_SIZE)
+            root_tag = ROOT_TAG_RE.search(first_chunk)
+
+            chunks = iter(lambda: source.read(CHUNK_SIZE), b'')
+            head = []
+            read_tail = []
+            for values in _fill_gaps(_feed_rows(parser, target, _prepend(first_chunk, chunks, read_tail)), max_col):
+                head.append(values)
+                if len(head) >= head_rows:
+                    break
+            else:
+                return head, [], True
+
+            # Остаток листа только распаковывается, хранится последний блок нужного размера
+            tail = b''.join(read_tail)
+            for chunk in chunks:
+                tail = (tail + chunk)[-tail_bytes:]
+
+    if root_tag is None:
+        raise UnsupportedWorkbook("Не найден корневой элемент листа")
+    start = tail.find(b"<row ")
+    end = tail.rfind(b"</sheetData>")
+    if start < 0 or end < 0:
+        raise UnsupportedWorkbook("Не найдены строки в конце листа")
+
+    tail_target = _SheetRowsTarget(target.max_col, target.shared_strings,
+                                   target.date_styles, target.timedelta_styles)
+    tail_parser = ET.XMLParser(target=tail_target)
+    tail_parser.feed(root_tag.group())
+    tail_parser.feed(b"<sheetData>")
+    tail_parser.feed(tail[start:end])
+    tail_parser.feed(b"</sheetData></worksheet>")
+    tail_parser.close()
+    return head, tail_target.rows, False
+
+
+def _prepend(first_chunk, chunks, seen):
+    """Поток блоков с уже прочитанным первым; последний выданный блок запоминается в seen"""
+    seen[:] = [first_chunk]
+    yield first_chunk
+    for chunk in chunks:
+        seen[:] = [chunk]
+        yield chunk
+
+
+class _SheetRowsTarget:
+    """
+    Приемник событий XMLParser для листа: собирает строки без построения дерева
+
+    Готовые строки накапливаются в rows как (номер строки, кортеж значений).
+    """
+
+    def __init__(self, max_col, shared_strings, date_styles, timedelta_styles):
+        self.max_col = max_col
+        self.shared_strings = shared_strings
+        self.date_styles = date_styles
+        self.timedelta_styles = timedelta_styles
+        self.rows = []
+        self.row_counter = 0
+        self.values = None
+        self.col_counter = 0
+        self.cell_type = None
+        self.cell_style = 0
+        self.cell_value = None
+        self.inline_parts = None
+        self.text = None
+        self.phonetic = False
+
+    def start(self, tag, attrib):
+        if tag == CELL_TAG:
+            coordinate = attrib.get("r")
+            self.col_counter = _column_index(coordinate) if coordinate else self.col_counter + 1
+            self.cell_type = attrib.get("t", "n")
+            self.cell_style = attrib.get("s")
+            self.cell_value = None
+            if self.cell_type == "inlineStr":
+                self.inline_parts = []
+        elif tag == VALUE_TAG:
+            self.text = []
+        elif tag == ROW_TAG:
+            r = attrib.get("r")
+            self.row_counter = int(r) if r is not None else self.row_counter + 1
+            self.values = [None] * self.max_col
+            self.col_counter = 0
+        elif tag == TEXT_TAG:
+            if self.inline_parts is not None and not self.phonetic:
+                self.text = []
+        elif tag == PHONETIC_TAG:
+            self.phonetic = True
+
+    def data(self, text):
+        if self.text is not None:
+            self.text.append(text)
+
+    def end(self, tag):
+        if tag == CELL_TAG:
+            if self.col_counter <= self.max_col:
+                self.values[self.col_counter - 1] = self._value()
+            self.inline_parts = None
+        elif tag == VALUE_TAG:
+            self.cell_value = "".join(self.text) or None
+            self.text = None
+        elif tag == ROW_TAG:
+            self.rows.append((self.row_counter, tuple(self.values)))
+        elif tag == TEXT_TAG:
+            if self.text is not None:
+                self.inline_parts.append("".join(self.text))
+                self.text = None
+        elif tag == PHONETIC_TAG:
+            self.phonetic = False
+
+    def close(self):
+        return None
+
+    def _value(self):
+        data_type = self.cell_type
+
+        if data_type == "inlineStr":
+            return "".join(self.inline_parts)
+
+        value = self.cell_value
+        if value is None:
+            return None
+
+        if data_type == "n":
+            number = _cast_number(value)
+            style = int(self.cell_style or 0)
+            if style in self.date_styles:
+                if style in self.timedelta_styles or number < 60:
+                    raise UnsupportedWorkbook("Время без даты или интервал в ячейке с форматом даты")
+                return ExcelDate(serial_to_epoch(number))
+            return number
+        if data_type == "s":
+            return self.shared_strings[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type in ("str", "e"):
+            return value
+        raise UnsupportedWorkbook(f"Неподдерживаемый тип ячейки: {data_type}")
@@ -8,9 +8,16 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
 import shutil
-import pandas as pd
-from datetime import datetime
-from itertools import combinations
+
+from data_processing.parallel_parse import parse_files
+from data_processing.parse_cache import ParseCache
+from data_processing.parsed_logger import ParsedLogger
+from data_processing.quality import describe_quality
+from data_processing.sample_store import SampleStore
+from data_processing.time_ranges import find_max_overlap
+from data_processing.timestamps import parse_time
+from data_processing.workbook_layout import expand_sources, source_path, split_source
+from utils.job_runner import BackgroundJob
 
 
 class ProjectManagementFrame:
@@ -20,9 +27,15 @@ class ProjectManagementFrame:
         self.parent = parent
         self.session_manager = session_manager
         self.selected_files = []
+        self.parsed_loggers = {}  # {путь в inform: ParsedLogger} — ряды читаются один раз, при первой необходимости
+        self.sample_store = SampleStore(session_manager.get_samples_db_path())
+        self.parse_cache = ParseCache(session_manager.get_parse_cache_dir())
         self.report_type = tk.StringVar(value="Объект хранения")
         self.use_humidity = tk.BooleanVar(value=False)
         self.logger_screenshots = []  # [(номер_логгера, путь), ...] — скриншоты для Приложения 5
+        self.quality_job = None  # фоновый разбор и проверка качества (BackgroundJob)
+        self.selection_generation = 0  # номер состава файлов: результаты проверки прежнего состава отбрасываются
+        self.selection_resets = 0  # номер сброса списка файлов: результаты загрузки до сброса отбрасываются
         self.create_widgets()
     
     def create_widgets(self):
@@ -131,18 +144,20 @@ class ProjectManagementFrame:
         tree_container.pack(fill=tk.BOTH, expand=True)
 
         # Создаем Treeview для отображения файлов с временными диапазонами и временем исследования
-        columns = ("Файл", "Путь", "Начало записи", "Конец записи", "Время исследования")
+        columns = ("Файл", "Путь", "Начало записи", "Конец записи", "Время исследования", "Качество")
         self.files_tree = ttk.Treeview(tree_container, columns=columns, show="headings", height=8)
         self.files_tree.heading("Файл", text="Имя файла")
         self.files_tree.heading("Путь", text="Путь")
         self.files_tree.heading("Начало записи", text="Начало записи")
         self.files_tree.heading("Конец записи", text="Конец записи")
         self.files_tree.heading("Время исследования", text="Время исследования")
+        self.files_tree.heading("Качество", text="Качество данных")
         self.files_tree.column("Файл", width=150)
         self.files_tree.column("Путь", width=250)
         self.files_tree.column("Начало записи", width=130)
         self.files_tree.column("Конец записи", width=130)
         self.files_tree.column("Время исследования", width=150)
+        self.files_tree.column("Качество", width=250)
 
         # Вертикальная полоса прокрутки
         v_scrollbar = ttk.Scrollbar(tree_container, orient=tk.VERTICAL, command=self.files_tree.yview)
@@ -511,7 +526,11 @@ class ProjectManagementFrame:
         )
         
         if files:
+            self.selection_generation += 1
+            self.selection_resets += 1
             self.selected_files = []
+            self.parsed_loggers = {}
+            self.sample_store.clear()
             self.files_tree.delete(*self.files_tree.get_children())
             self.copy_files_to_inform(files)
     
@@ -530,28 +549,189 @@ class ProjectManagementFrame:
         inform_dir = self.session_manager.inform_dir
         inform_dir.mkdir(exist_ok=True)
 
+        copied = []
         for file_path in files:
             src = Path(file_path)
             dst = inform_dir / src.name
 
             try:
                 shutil.copy2(src, dst)
-                self.selected_files.append(str(dst))
+                copied.append((src, dst))
+            except Exception as e:
+                messagebox.showerror("Ошибка", f"Не удалось скопировать файл {src.name}:\n{e}")
+
+        if not copied:
+            return
+
+        # Раскрытие сводных книг, разбор широких листов и определение диапазонов - в фоне:
+        # большая книга читается долго, интерфейс при этом не блокируется
+        parse_cache = self.parse_cache
+        resets = self.selection_resets
+
+        def expand(job):
+            expanded = []
+            for _, dst in copied:
+                job.check_cancelled()
+                # Сводная книга раскрывается в источники: лист или группа столбцов на каждый логгер
+                sources = expand_sources(dst)
+
+                # Группы широкого листа разбираются сразу, за один проход по листу
+                wide = [source for source, _ in sources if split_source(source)[2] is not None]
+                loggers, errors = parse_files(wide, cache=parse_cache) if wide else ({}, {})
+                for source, error in errors.items():
+                    print(f"Ошибка обработки файла {source}: {error}")
+
+                # Для списка нужен только диапазон: ряды значений читаются при генерации отчета
+                for source, _ in sources:
+                    if source not in loggers and source not in errors:
+                        try:
+                            loggers[source] = ParsedLogger.probe(source, cache=parse_cache)
+                        except Exception:
+                            # Ошибка будет показана в списке файлов (extract_time_range)
+                            pass
+                expanded.append((sources, loggers))
+            return expanded
+
+        def on_done(expanded):
+            if resets != self.selection_resets:
+                # Список файлов сброшен, пока книги раскрывались
+                return
+            for sources, loggers in expanded:
+                self._add_sources(sources, loggers)
+
+            # Обновляем отображение общих временных диапазонов
+            self.update_common_ranges_display()
 
-                # Извлекаем временной диапазон из Excel файла
-                start_time, end_time = self.extract_time_range(str(dst))
+            self.start_quality_check()
+
+        def on_error(error):
+            messagebox.showerror("Ошибка", f"Не удалось загрузить файлы:\n{error}")
+
+        BackgroundJob(self.parent.winfo_toplevel(), expand, on_done=on_done, on_error=on_error).start()
+
+    def _add_sources(self, sources, loggers):
+        """Добавление источников одной книги в список файлов (loggers - разобранные и открытые в фоне)"""
+        for source, _ in sources:
+            if source in self.selected_files or source in self.parsed_loggers:
+                # Файл с тем же именем выбран заново - идущая проверка читала прежнее содержимое
+                self.selection_generation += 1
+            self.parsed_loggers.pop(source, None)
+        self.parsed_loggers.update(loggers)
+
+        for source, label in sources:
+            try:
+                self.selected_files.append(source)
+
+                start_time, end_time = self.extract_time_range(source)
+
+                # Показания уже разобранного файла (из кэша) сразу сохраняем в хранилище,
+                # остальные попадут туда при генерации отчета
+                parsed = self.parsed_loggers.get(source)
+                if parsed is not None and parsed.loaded:
+                    self.sample_store.add_logger(parsed)
+                else:
+                    self.sample_store.remove_source(source)
 
                 # Вычисляем время исследования
                 research_time = self.calculate_research_time(start_time, end_time)
 
+                # Качество записи известно для уже разобранных файлов, остальные проверяются в фоне
+                if parsed is None:
+                    quality_text = "—"
+                elif parsed.loaded:
+                    quality_text = describe_quality(parsed.quality)
+                else:
+                    quality_text = "проверяется..."
+
                 # Добавляем в список с временными диапазонами и временем исследования
-                self.files_tree.insert("", tk.END, values=(src.name, str(dst), start_time, end_time, research_time))
+                self.files_tree.insert("", tk.END, values=(label, source, start_time, end_time, research_time, quality_text))
 
             except Exception as e:
-                messagebox.showerror("Ошибка", f"Не удалось скопировать файл {src.name}:\n{e}")
+                messagebox.showerror("Ошибка", f"Не удалось загрузить файл {label}:\n{e}")
+
+    def start_quality_check(self):
+        """
+        Фоновый полный разбор файлов, открытых по диапазону (ParsedLogger.probe)
+
+        Файлы разбираются параллельно, проверяются на разрывы, повторы и
+        залипание показаний (scan_quality) и сохраняются в хранилище показаний.
+        Список файлов заполняется сразу, столбец качества - по завершении.
+        """
+        if self.quality_job is not None and self.quality_job.running:
+            # Новые файлы будут проверены после завершения текущей проверки
+            return
 
-        # Обновляем отображение общих временных диапазонов
-        self.update_common_ranges_display()
+        pending = [path for path, parsed in self.parsed_loggers.items() if not parsed.loaded]
+        if not pending:
+            return
+
+        sample_store = self.sample_store
+        parse_cache = self.parse_cache
+        generation = self.selection_generation
+
+        def check(job):
+            loggers, errors = parse_files(pending, cache=parse_cache)
+            for parsed in loggers.values():
+                job.check_cancelled()
+                sample_store.add_logger(parsed)
+            return loggers, errors
+
+        def on_done(result):
+            self.quality_job = None
+            loggers, errors = result
+            if generation != self.selection_generation:
+                # Состав файлов изменился во время проверки: результаты относятся к прежним файлам.
+                # Показания, записанные проверкой, заменяются актуальными (или удаляются)
+                for file_path in loggers:
+                    current = self.parsed_loggers.get(file_path)
+                    if file_path in self.selected_files and current is not None and current.loaded:
+                        self.sample_store.add_logger(current)
+                    else:
+                        self.sample_store.remove_source(file_path)
+                self.start_quality_check()
+                return
+            for file_path, parsed in loggers.items():
+                current = self.parsed_loggers.get(file_path)
+                if file_path not in self.selected_files or current is None:
+                    # Файл удален, пока шла проверка
+                    self.sample_store.remove_source(file_path)
+                    continue
+                if not current.loaded:
+                    self.parsed_loggers[file_path] = parsed
+                self._update_file_row(file_path, self.parsed_loggers[file_path])
+            for file_path in errors:
+                # Файл не читается: при генерации отчета он будет разобран заново и ошибка выведена в консоль
+                self.parsed_loggers.pop(file_path, None)
+                self._update_file_row(file_path, None)
+            self.update_common_ranges_display()
+            self.start_quality_check()
+
+        def on_error(error):
+            self.quality_job = None
+            print(f"Ошибка проверки качества данных: {error}")
+
+        self.quality_job = BackgroundJob(self.parent.winfo_toplevel(), check, on_done=on_done, on_error=on_error)
+        self.quality_job.start()
+
+    def _update_file_row(self, file_path, parsed):
+        """Обновление строки списка файлов после полного разбора (диапазон по данным и качество)"""
+        for item_id in self.files_tree.get_children():
+            if self.files_tree.item(item_id, "values")[1] != file_path:
+                continue
+            if parsed is None:
+                self.files_tree.set(item_id, "Качество", "ошибка чтения")
+            elif parsed.start is None:
+                self.files_tree.set(item_id, "Начало записи", "Нет данных")
+                self.files_tree.set(item_id, "Конец записи", "Нет данных")
+                self.files_tree.set(item_id, "Время исследования", "Недоступно")
+                self.files_tree.set(item_id, "Качество", describe_quality(parsed.quality))
+            else:
+                start_time = parsed.start_datetime.strftime("%d.%m.%Y %H:%M")
+                end_time = parsed.end_datetime.strftime("%d.%m.%Y %H:%M")
+                self.files_tree.set(item_id, "Начало записи", start_time)
+                self.files_tree.set(item_id, "Конец записи", end_time)
+                self.files_tree.set(item_id, "Время исследования", self.calculate_research_time(start_time, end_time))
+                self.files_tree.set(item_id, "Качество", describe_quality(parsed.quality))
 
     def calculate_research_time(self, start_time_str, end_time_str):
         """Вычисление времени исследования в формате 'X дней Y часов Z минут'"""
@@ -560,8 +740,8 @@ class ProjectManagementFrame:
                end_time_str in ["Не найдено", "Нет данных", "Ошибка"]:
                 return "Недоступно"
 
-            start_time = datetime.strptime(start_time_str, "%d.%m.%Y %H:%M")
-            end_time = datetime.strptime(end_time_str, "%d.%m.%Y %H:%M")
+            start_time = parse_time(start_time_str)
+            end_time = parse_time(end_time_str)
 
             # Вычисляем разницу
             delta = end_time - start_time
@@ -586,34 +766,23 @@ class ProjectManagementFrame:
             return "Ошибка расчета"
 
     def extract_time_range(self, file_path):
-        """Извлечение временного диапазона из Excel файла"""
+        """Извлечение временного диапазона по началу и концу листа (полный разбор откладывается)"""
         try:
-            # Читаем Excel файл
-            df = pd.read_excel(file_path)
-
-            # Ищем колонку с датой/временем (обычно называется 'Date' или 'Time' или 'Дата')
-            time_column = None
-            for col in df.columns:
-                if any(keyword in str(col).lower() for keyword in ['date', 'time', 'дата', 'время']):
-                    time_column = col
-                    break
-
-            if time_column is None:
-                return "Не найдено", "Не найдено"
+            parsed = self.parsed_loggers.get(str(file_path))
+            if parsed is None:
+                parsed = ParsedLogger.probe(file_path, cache=self.parse_cache)
+                self.parsed_loggers[str(file_path)] = parsed
 
-            # Преобразуем в datetime
-            time_values = pd.to_datetime(df[time_column], errors='coerce').dropna()
-
-            if len(time_values) == 0:
+            if parsed.start is None:
                 return "Нет данных", "Нет данных"
 
-            # Находим минимальное и максимальное время
-            start_time = time_values.min().strftime("%d.%m.%Y %H:%M")
-            end_time = time_values.max().strftime("%d.%m.%Y %H:%M")
+            start_time = parsed.start_datetime.strftime("%d.%m.%Y %H:%M")
+            end_time = parsed.end_datetime.strftime("%d.%m.%Y %H:%M")
 
             return start_time, end_time
 
         except Exception as e:
+            self.parsed_loggers.pop(str(file_path), None)
             return f"Ошибка: {str(e)[:20]}", f"Ошибка: {str(e)[:20]}"
     
     def remove_selected_file(self):
@@ -627,10 +796,15 @@ class ProjectManagementFrame:
             values = self.files_tree.item(item, "values")
             file_path = values[1]
 
-            # Удаляем файл
+            # Удаляем файл (книгу - вместе с последним выбранным из нее логгером)
             try:
-                Path(file_path).unlink()
+                if not any(source_path(other) == source_path(file_path)
+                           for other in self.selected_files if other != file_path):
+                    Path(source_path(file_path)).unlink()
+                self.selection_generation += 1
                 self.selected_files.remove(file_path)
+                self.parsed_loggers.pop(file_path, None)
+                self.sample_store.remove_source(file_path)
                 self.files_tree.delete(item)
             except Exception as e:
                 messagebox.showerror("Ошибка", f"Не удалось удалить файл:\n{e}")
@@ -644,13 +818,17 @@ class ProjectManagementFrame:
             return
 
         if messagebox.askyesno("Подтверждение", "Удалить все загруженные файлы?"):
-            for file_path in self.selected_files[:]:
+            for file_path in dict.fromkeys(map(source_path, self.selected_files)):
                 try:
                     Path(file_path).unlink()
                 except Exception as e:
                     print(f"Ошибка удаления файла {file_path}: {e}")
 
+            self.selection_generation += 1
+            self.selection_resets += 1
             self.selected_files = []
+            self.parsed_loggers = {}
+            self.sample_store.clear()
             self.files_tree.delete(*self.files_tree.get_children())
 
             # Очищаем отображение диапазонов
@@ -690,8 +868,8 @@ class ProjectManagementFrame:
                     invalid_files.append((file_name, invalid_reason))
                     continue
                 try:
-                    start_dt = datetime.strptime(start_str, "%d.%m.%Y %H:%M")
-                    end_dt = datetime.strptime(end_str, "%d.%m.%Y %H:%M")
+                    start_dt = parse_time(start_str)
+                    end_dt = parse_time(end_str)
                     valid_files.append((file_name, start_dt, end_dt))
                 except ValueError:
                     invalid_files.append((file_name, "Неверный формат"))
@@ -705,8 +883,6 @@ class ProjectManagementFrame:
                 self.ranges_text.config(state=tk.DISABLED)
                 return
 
-            valid_count = len(valid_files)
-            
             # Находим общий диапазон для всех логгеров (пересечение всех диапазонов)
             all_starts = [f[1] for f in valid_files]
             all_ends = [f[2] for f in valid_files]
@@ -714,38 +890,29 @@ class ProjectManagementFrame:
             common_end_all = min(all_ends)
             
             # Находим максимальный общий диапазон (наибольшая группа логгеров с пересечением)
-            best_group = []
-            best_range = None
-            best_group_size = 0
-            
-            # Перебираем все возможные группы логгеров, начиная с наибольших
-            for group_size in range(valid_count, 0, -1):
-                # Генерируем все комбинации размера group_size
-                for group_indices in combinations(range(valid_count), group_size):
-                    group = [valid_files[i] for i in group_indices]
-                    cstart = max(f[1] for f in group)
-                    cend = min(f[2] for f in group)
-                    if cstart < cend:  # Есть пересечение
-                        if len(group) > best_group_size:
-                            best_group = group
-                            best_range = (cstart, cend)
-                            best_group_size = len(group)
-                            break  # Нашли максимальную группу для этого размера
-                if best_group:
-                    break  # Нашли максимальную группу
+            best_group_size, best_groups = find_max_overlap([(f[1], f[2]) for f in valid_files])
             
             common_range_text = ""
             
             # Выводим максимальный общий диапазон
-            if best_group and best_range:
-                cstart, cend = best_range
-                common_range_text = f"Максимальный общий временной диапазон (на основе {len(best_group)} из {total_loggers} логгеров):\n"
+            if best_groups:
+                best_indices, (cstart, cend) = best_groups[0]
+                common_range_text = f"Максимальный общий временной диапазон (на основе {best_group_size} из {total_loggers} логгеров):\n"
                 common_range_text += f"{cstart.strftime('%d.%m.%Y %H:%M')} - {cend.strftime('%d.%m.%Y %H:%M')}\n\n"
                 
                 # Находим логгеры, не вошедшие в максимальный общий диапазон
-                excluded = [f[0] for f in valid_files if f not in best_group]
+                excluded = [f[0] for i, f in enumerate(valid_files) if i not in best_indices]
                 if excluded:
                     common_range_text += f"Логгеры, не вошедшие в максимальный общий диапазон: {', '.join(excluded)}\n\n"
+                
+                # Другие группы того же размера
+                if len(best_groups) > 1:
+                    common_range_text += f"Другие группы из {best_group_size} логгеров с общим диапазоном:\n"
+                    for indices, (gstart, gend) in best_groups[1:]:
+                        excluded = [f[0] for i, f in enumerate(valid_files) if i not in indices]
+                        common_range_text += f"{gstart.strftime('%d.%m.%Y %H:%M')} - {gend.strftime('%d.%m.%Y %H:%M')}"
+                        common_range_text += f" (без логгеров: {', '.join(excluded)})\n"
+                    common_range_text += "\n"
             else:
                 common_range_text = f"Максимальный общий временной диапазон отсутствует\n\n"
             
@@ -833,7 +1000,11 @@ class ProjectManagementFrame:
 
     def clear_data(self):
         """Очистка данных фрейма"""
+        self.selection_generation += 1
+        self.selection_resets += 1
         self.selected_files = []
+        self.parsed_loggers = {}
+        self.sample_store.clear()
         self.files_tree.delete(*self.files_tree.get_children())
         self.report_type.set("Объект хранения")
         self.use_humidity.set(False)
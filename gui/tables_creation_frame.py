@@ -8,12 +8,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 import sqlite3
-from collections import defaultdict
 from pathlib import Path
 
 from report_generation.report_generator import ReportGenerator
 from data_processing.excel_processor import ExcelProcessor
+from data_processing.timestamps import format_epoch, normalize_column, parse_time
+from data_processing.homogeneity import compute_homogeneity
 from gui.clipboard_manager import setup_clipboard_manager
+from utils.job_runner import BackgroundJob
 
 
 class TablesCreationFrame:
@@ -32,6 +34,9 @@ class TablesCreationFrame:
         
         # Периоды
         self.periods = []
+
+        # Фоновая генерация отчета (BackgroundJob)
+        self.report_job = None
         
         self.create_widgets()
     
@@ -341,7 +346,7 @@ class TablesCreationFrame:
         tk.Label(start_frame, text="Дата и время начала:", font=("Arial", 11), bg="#ecf0f1", width=25, anchor=tk.W).pack(side=tk.LEFT)
         start_entry = tk.Entry(start_frame, width=40, font=("Arial", 10))
         if edit_data:
-            start_dt = datetime.strptime(edit_data['start'], "%Y-%m-%d %H:%M:%S")
+            start_dt = parse_time(edit_data['start'])
             start_entry.insert(0, start_dt.strftime("%d.%m.%Y %H:%M"))
         start_entry.pack(side=tk.LEFT, padx=5)
         
@@ -384,7 +389,7 @@ class TablesCreationFrame:
         tk.Label(end_frame, text="Дата и время окончания:", font=("Arial", 11), bg="#ecf0f1", width=25, anchor=tk.W).pack(side=tk.LEFT)
         end_entry = tk.Entry(end_frame, width=40, font=("Arial", 10))
         if edit_data:
-            end_dt = datetime.strptime(edit_data['end'], "%Y-%m-%d %H:%M:%S")
+            end_dt = parse_time(edit_data['end'])
             end_entry.insert(0, end_dt.strftime("%d.%m.%Y %H:%M"))
         end_entry.pack(side=tk.LEFT, padx=5)
         
@@ -551,6 +556,10 @@ class TablesCreationFrame:
 
     def generate_report(self):
         """Генерация отчета"""
+        if self.report_job is not None and self.report_job.running:
+            messagebox.showwarning("Предупреждение", "Отчет уже формируется")
+            return
+
         # Проверяем наличие периодов
         if not self.periods:
             messagebox.showwarning("Предупреждение", "Добавьте хотя бы один период")
@@ -675,53 +684,75 @@ class TablesCreationFrame:
                 return
             
             dialog.destroy()
-            
-            # Обрабатываем Excel файлы и сохраняем статистику
-            try:
+
+            # Все значения из интерфейса снимаются здесь, в главном потоке:
+            # фоновая операция работает только со своими копиями
+            selected_files = list(project_mgmt.selected_files)
+            parsed_loggers = dict(project_mgmt.parsed_loggers)
+            for key in ('risk_areas', 'selected_recommendations', 'logger_screenshots'):
+                if isinstance(other_info.get(key), list):
+                    other_info[key] = list(other_info[key])
+            if isinstance(other_info.get('image_orientations'), dict):
+                other_info['image_orientations'] = dict(other_info['image_orientations'])
+            limits = {
+                'temperature': (temp_min_val, temp_max_val),
+                'humidity': (humidity_min_val, humidity_max_val)
+            }
+
+            def pipeline(job):
+                """Обработка данных и генерация отчета (выполняется в фоновом потоке)"""
+                # Периоды исследования (границы в секундах от эпохи)
+                periods_db_path = self.session_manager.get_periods_db_path()
+                conn = sqlite3.connect(periods_db_path)
+                cursor = conn.cursor()
+                cursor.execute("SELECT id, start_time, end_time FROM periods")
+                rows = cursor.fetchall()
+                conn.close()
+                period_ids = [row[0] for row in rows]
+                starts = normalize_column(row[1] for row in rows)
+                ends = normalize_column(row[2] for row in rows)
+                periods = list(zip(period_ids, starts, ends))
+
                 excel_processor = ExcelProcessor(self.session_manager)
-                logger_data = excel_processor.process_excel_files(project_mgmt.selected_files)
-
-                # Расчёт однородности температуры и влажности во времени
-                def compute_homogeneity(data_dict, value_key):
-                    time_values = defaultdict(list)
-                    for data in data_dict.values():
-                        times = data.get('times') or []
-                        values = data.get(value_key) or []
-                        n = min(len(times), len(values))
-                        for t, v in zip(times[:n], values[:n]):
-                            time_values[t].append(v)
-
-                    max_diff = None
-                    max_times = []
-                    for t, values in time_values.items():
-                        if len(values) < 2:
-                            continue
-                        diff = max(values) - min(values)
-                        if max_diff is None or diff > max_diff + 1e-9:
-                            max_diff = diff
-                            max_times = [t]
-                        elif abs(diff - max_diff) <= 1e-9:
-                            max_times.append(t)
-                    return max_diff, max_times
-
-                def format_time_value(t):
-                    if isinstance(t, datetime):
-                        return t.strftime("%d.%m.%Y %H:%M")
-                    return str(t)
-
-                temp_hom_value, temp_hom_times_raw = compute_homogeneity(logger_data, 'temperatures')
-                hum_hom_value, hum_hom_times_raw = compute_homogeneity(logger_data, 'humidities')
+                if excel_processor.needs_chunked(selected_files, parsed_loggers):
+                    # Длинное исследование: файлы читаются блоками через временное хранилище на диске
+                    job.report(0.0, "Обработка показаний по блокам...")
+                    period_stats, homogeneity, conflicts = excel_processor.process_chunked(
+                        selected_files, periods, limits=limits, check_cancelled=job.check_cancelled
+                    )
+                    temp_hom_value, temp_hom_times_raw = homogeneity['temperatures']
+                    hum_hom_value, hum_hom_times_raw = homogeneity['humidities']
+                else:
+                    job.report(0.0, "Загрузка показаний логгеров...")
+                    # Показания берутся из хранилища, заполненного при загрузке файлов
+                    logger_data, conflicts = excel_processor.load_logger_data(
+                        selected_files,
+                        parsed_loggers=parsed_loggers
+                    )
+                    job.check_cancelled()
+
+                    # Расчёт однородности температуры и влажности во времени (на общей сетке времени)
+                    job.report(0.25, "Расчет однородности...")
+                    temp_hom_value, temp_hom_times_raw = compute_homogeneity(logger_data, 'temperatures')
+                    job.check_cancelled()
+                    hum_hom_value, hum_hom_times_raw = compute_homogeneity(logger_data, 'humidities')
+                    job.check_cancelled()
+
+                    # Статистика считается по данным внутри каждого периода
+                    job.report(0.45, "Расчет статистики по периодам...")
+                    period_stats = excel_processor.compute_period_stats(logger_data, periods, limits=limits)
+                    job.check_cancelled()
 
                 if temp_hom_value is not None:
                     temp_hom_text = f"{temp_hom_value:.2f} (" + ", ".join(
-                        format_time_value(t) for t in temp_hom_times_raw
+                        format_epoch(t) for t in temp_hom_times_raw
                     ) + ")"
                 else:
                     temp_hom_text = "—"
 
                 if hum_hom_value is not None:
                     hum_hom_text = f"{hum_hom_value:.2f} (" + ", ".join(
-                        format_time_value(t) for t in hum_hom_times_raw
+                        format_epoch(t) for t in hum_hom_times_raw
                     ) + ")"
                 else:
                     hum_hom_text = "—"
@@ -731,36 +762,24 @@ class TablesCreationFrame:
                 other_info['hum_homogeneity_text'] = hum_hom_text
 
                 # Сохраняем статистику логгеров для каждого периода
-                periods_db_path = self.session_manager.get_periods_db_path()
-                conn = sqlite3.connect(periods_db_path)
-                cursor = conn.cursor()
-                cursor.execute("SELECT id FROM periods")
-                period_ids = [row[0] for row in cursor.fetchall()]
-                conn.close()
-                
-                for period_id in period_ids:
-                    excel_processor.save_logger_stats(logger_data, period_id)
-            except Exception as e:
-                messagebox.showerror("Ошибка", f"Ошибка обработки Excel файлов:\n{e}")
-                import traceback
-                traceback.print_exc()
-                return
-            
-            # Генерируем отчет
-            generator = ReportGenerator(self.session_manager)
-            success = generator.generate_report(
-                report_type=report_type,
-                template_path=str(template_path),
-                output_path=output_path,
-                use_humidity=use_humidity,
-                other_info=other_info,
-                periods=None
-            )
-            
-            if success:
-                messagebox.showinfo("Успех", f"Отчет успешно создан:\n{output_path}")
-            else:
-                messagebox.showerror("Ошибка", "Не удалось создать отчет. Проверьте консоль для подробностей.")
+                excel_processor.save_period_stats(period_stats)
+                job.check_cancelled()
+
+                # Генерируем отчет
+                job.report(0.6, "Формирование документа...")
+                generator = ReportGenerator(self.session_manager)
+                success = generator.generate_report(
+                    report_type=report_type,
+                    template_path=str(template_path),
+                    output_path=output_path,
+                    use_humidity=use_humidity,
+                    other_info=other_info,
+                    periods=None
+                )
+                job.report(1.0, "Готово")
+                return success, conflicts
+
+            self.run_report_job(pipeline, output_path)
         
         tk.Button(
             dialog,
@@ -774,6 +793,83 @@ class TablesCreationFrame:
             cursor="hand2"
         ).pack(pady=10)
     
+    def run_report_job(self, pipeline, output_path):
+        """Запуск генерации отчета в фоне с окном прогресса и кнопкой отмены"""
+        progress_window = tk.Toplevel(self.parent)
+        progress_window.title("Генерация отчета")
+        progress_window.geometry("420x150")
+        progress_window.resizable(False, False)
+        progress_window.transient(self.parent)
+
+        status_label = tk.Label(progress_window, text="Подготовка...", font=("Arial", 10))
+        status_label.pack(pady=(20, 10))
+
+        progress_bar = ttk.Progressbar(progress_window, length=360, mode='determinate', maximum=100)
+        progress_bar.pack(pady=5)
+
+        def on_progress(fraction, text):
+            progress_bar['value'] = fraction * 100
+            if text:
+                status_label.config(text=text)
+
+        def finish():
+            self.report_job = None
+            if progress_window.winfo_exists():
+                progress_window.destroy()
+
+        def on_done(result):
+            finish()
+            success, conflicts = result
+            if success and conflicts:
+                # Файлы одного логгера перекрываются с разными значениями - взяты значения последнего файла
+                messagebox.showwarning(
+                    "Успех",
+                    f"Отчет успешно создан:\n{output_path}\n\n"
+                    f"Файлы логгеров {', '.join(sorted(conflicts))} содержат одинаковые отметки времени "
+                    f"с разными значениями; взяты значения последнего выбранного файла "
+                    f"(подробности в консоли)."
+                )
+            elif success:
+                messagebox.showinfo("Успех", f"Отчет успешно создан:\n{output_path}")
+            else:
+                messagebox.showerror("Ошибка", "Не удалось создать отчет. Проверьте консоль для подробностей.")
+
+        def on_error(error):
+            finish()
+            messagebox.showerror("Ошибка", f"Ошибка генерации отчета:\n{error}")
+
+        def on_cancelled():
+            finish()
+            messagebox.showinfo("Отмена", "Генерация отчета отменена")
+
+        job = BackgroundJob(
+            self.parent.winfo_toplevel(), pipeline,
+            on_progress=on_progress, on_done=on_done,
+            on_error=on_error, on_cancelled=on_cancelled
+        )
+
+        def cancel():
+            job.cancel()
+            cancel_button.config(state=tk.DISABLED)
+            status_label.config(text="Отмена после завершения текущего этапа...")
+
+        cancel_button = tk.Button(
+            progress_window,
+            text="Отмена",
+            command=cancel,
+            bg="#e74c3c",
+            fg="white",
+            font=("Arial", 10, "bold"),
+            padx=15,
+            cursor="hand2"
+        )
+        cancel_button.pack(pady=10)
+        # Закрытие окна крестиком равносильно отмене
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+
+        self.report_job = job
+        job.start()
+
     def get_project_management_frame(self):
         """Получить ссылку на фрейм управления проектом"""
         if self.main_window and hasattr(self.main_window, 'frames'):
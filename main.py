@@ -6,6 +6,7 @@
 
 import tkinter as tk
 from tkinter import messagebox
+import multiprocessing
 import os
 import sys
 
@@ -46,4 +47,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Нужно для процессов разбора Excel в собранном (PyInstaller) приложении
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Индекс положения элементов документа
+"""
+
+from docx.oxml.ns import qn
+
+W_P = qn('w:p')
+W_TBL = qn('w:tbl')
+W_TC = qn('w:tc')
+W_BR = qn('w:br')
+W_TYPE = qn('w:type')
+W_VAL = qn('w:val')
+W_SECT_PR = qn('w:sectPr')
+W_PAGE_BREAK_BEFORE = qn('w:pageBreakBefore')
+
+# Если в документе нет ни одной границы страницы - столько первых параграфов тела считаются первой страницей
+FIRST_PAGE_PARAGRAPHS = 15
+
+
+class Position:
+    """Положение элемента тела документа"""
+
+    __slots__ = ('ordinal', 'paragraph', 'section', 'page', 'table', 'cell')
+
+    def __init__(self, ordinal, paragraph, section, page, table=None, cell=None):
+        self.ordinal = ordinal      # номер элемента верхнего уровня тела (параграф или таблица)
+        self.paragraph = paragraph  # номер параграфа верхнего уровня (как в doc.paragraphs), None для таблиц
+        self.section = section      # номер раздела
+        self.page = page            # номер страницы по явным границам (разрывы страниц и разделов)
+        self.table = table          # номер таблицы верхнего уровня (как в doc.tables), None вне таблиц
+        self.cell = cell            # элемент w:tc ближайшей ячейки, None вне таблиц
+
+
+def _page_break_before(p):
+    pPr = p.pPr
+    if pPr is None:
+        return False
+    flag = pPr.find(W_PAGE_BREAK_BEFORE)
+    return flag is not None and flag.get(W_VAL) not in ('0', 'false', 'off')
+
+
+def _page_breaks(p):
+    return sum(1 for br in p.iter(W_BR) if br.get(W_TYPE) == 'page')
+
+
+def _section_break(p):
+    """Тип разрыва раздела, которым заканчивается параграф (None - раздел не заканчивается)"""
+    pPr = p.pPr
+    sectPr = pPr.find(W_SECT_PR) if pPr is not None else None
+    if sectPr is None:
+        return None
+    section_type = sectPr.find(qn('w:type'))
+    return section_type.get(W_VAL) if section_type is not None else 'nextPage'
+
+
+def story_key(owner):
+    """Ключ части документа (тело или колонтитул) владельца параграфов: имя части в пакете"""
+    return str(owner.part.partname)
+
+
+def element_path(element, root):
+    """Номера дочерних элементов от root до element"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    path.reverse()
+    return path
+
+
+def resolve_path(root, path):
+    """Элемент по пути element_path; IndexError, если путь не соответствует документу"""
+    element = root
+    for child in path:
+        element = element[child]
+    return element
+
+
+class DocumentIndex:
+    """
+    Положение каждого параграфа и таблицы тела документа за один проход
+
+    Строится один раз на отчет: порядковый номер, раздел, страница и
+    принадлежность таблице (с ячейкой) для элементов верхнего уровня и всех
+    параграфов внутри таблиц, включая вложенные. Страницы считаются по явным
+    границам: разрыв страницы, "с новой страницы" у параграфа, разрыв
+    раздела не "на текущей странице". После изменения документа индекс
+    перестраивается.
+    """
+
+    def __init__(self, doc):
+        self.positions = {}
+        self.has_page_breaks = False
+        self._build(doc.element.body)
+
+    def _build(self, body):
+        section = 0
+        page = 0
+        paragraph_number = 0
+        table_number = 0
+        for ordinal, element in enumerate(body):
+            if element.tag == W_P:
+                if _page_break_before(element) and ordinal > 0:
+                    page += 1
+                    self.has_page_breaks = True
+                self.positions[element] = Position(ordinal, paragraph_number, section, page)
+                paragraph_number += 1
+
+                breaks = _page_breaks(element)
+                if breaks:
+                    page += breaks
+                    self.has_page_breaks = True
+                section_type = _section_break(element)
+                if section_type is not None:
+                    section += 1
+                    if section_type != 'continuous':
+                        page += 1
+                        self.has_page_breaks = True
+            elif element.tag == W_TBL:
+                self.positions[element] = Position(ordinal, None, section, page, table_number)
+                for p in element.iter(W_P):
+                    self.positions[p] = Position(ordinal, None, section, page, table_number, self._cell_of(p))
+                table_number += 1
+
+    @staticmethod
+    def _cell_of(p):
+        element = p.getparent()
+        while element is not None and element.tag != W_TC:
+            element = element.getparent()
+        return element
+
+    def position(self, element):
+        """Position элемента (w:p, w:tbl или прокси python-docx) или None, если он не в теле документа"""
+        return self.positions.get(getattr(element, '_element', element))
+
+    def is_first_page(self, element):
+        """Находится ли элемент на первой странице"""
+        position = self.position(element)
+        if position is None:
+            return False
+        if self.has_page_breaks:
+            return position.page == 0
+        # Без явных границ - эвристика титульного листа по числу параграфов
+        return position.paragraph is not None and position.paragraph < FIRST_PAGE_PARAGRAPHS
+
+    def is_in_table(self, element):
+        """Находится ли элемент в таблице"""
+        position = self.position(element)
+        return position is not None and position.table is not None
+
+    def table_cell(self, element):
+        """Элемент w:tc ячейки, в которой находится параграф (None - вне таблицы или вне тела)"""
+        position = self.position(element)
+        return position.cell if position is not None else None
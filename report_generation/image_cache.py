@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Кэш уменьшенных изображений для вставки в отчеты
+"""
+
+import hashlib
+import io
+import struct
+from pathlib import Path
+
+from PIL import Image
+
+from utils.disk_cache import evict_lru, touch, write_atomic
+
+# Ограничение размера кэша по умолчанию
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Разрешение, по которому размер в сантиметрах переводится в пиксели
+DEFAULT_DPI = 96
+
+MAGIC = b'LGIC'
+# Заголовок: сигнатура, версия формата, ширина и высота вставки в см
+HEADER = struct.Struct('<4sHdd')
+FORMAT_VERSION = 1
+
+
+def fit_image(image_path, landscape_cm, portrait_cm, dpi=DEFAULT_DPI):
+    """
+    Уменьшение изображения под рамку вставки
+
+    Рамка выбирается по ориентации изображения: landscape_cm для
+    горизонтальных, portrait_cm для остальных. Изображение уменьшается с
+    сохранением пропорций до размера рамки при разрешении dpi и
+    сохраняется в исходном формате. Возвращает (байты, (ширина, высота) в см).
+    """
+    with Image.open(image_path) as img:
+        image_format = img.format or 'PNG'
+        width_cm, height_cm = landscape_cm if img.width > img.height else portrait_cm
+        img.thumbnail((int(width_cm / 2.54 * dpi), int(height_cm / 2.54 * dpi)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format=image_format)
+    return buffer.getvalue(), (width_cm, height_cm)
+
+
+class ImageCache:
+    """
+    Уменьшенные изображения, ключ - SHA-256 содержимого исходного файла и параметров рамки
+
+    Каждая запись - файл <ключ>.img: заголовок с размером вставки и
+    готовые к вставке байты изображения (run.add_picture(BytesIO)).
+    Повторная вставка того же изображения не декодирует его заново;
+    одинаковые имена разных файлов не пересекаются. При превышении
+    max_bytes удаляются записи, к которым дольше всего не обращались
+    (LRU по времени изменения файла).
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key_for(image_path, landscape_cm, portrait_cm, dpi=DEFAULT_DPI):
+        """Ключ записи: SHA-256 параметров рамки и байтов файла"""
+        digest = hashlib.sha256(
+            f"image-{FORMAT_VERSION}:{tuple(landscape_cm)}:{tuple(portrait_cm)}:{dpi}:".encode()
+        )
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.img"
+
+    def get(self, key):
+        """Чтение записи: (байты, (ширина, высота) в см) или None"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                magic, version, width_cm, height_cm = HEADER.unpack(f.read(HEADER.size))
+                if magic != MAGIC or version != FORMAT_VERSION:
+                    return None
+                data = f.read()
+        except (OSError, struct.error):
+            return None
+
+        # Отмечаем обращение для LRU
+        touch(path)
+        return data, (width_cm, height_cm)
+
+    def put(self, key, data, size_cm):
+        """Запись изображения в кэш с последующим вытеснением старых записей"""
+        def write(f):
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, *size_cm))
+            f.write(data)
+
+        path = self._entry_path(key)
+        try:
+            write_atomic(path, write)
+        except OSError as e:
+            print(f"Ошибка записи кэша {path.name}: {e}")
+            return
+        self.evict()
+
+    def fit(self, image_path, landscape_cm, portrait_cm, dpi=DEFAULT_DPI):
+        """fit_image с кэшированием: (байты, (ширина, высота) в см)"""
+        key = self.key_for(image_path, landscape_cm, portrait_cm, dpi)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        data, size_cm = fit_image(image_path, landscape_cm, portrait_cm, dpi)
+        self.put(key, data, size_cm)
+        return data, size_cm
+
+    def evict(self):
+        """Удаление самых давних записей, пока размер кэша превышает max_bytes"""
+        evict_lru(self.cache_dir, '*.img', self.max_bytes)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Подстановка ключевых элементов в плейсхолдеры шаблона отчета
+"""
+
+from pathlib import Path
+import io
+import re
+
+from docx.enum.table import WD_ALIGN_VERTICAL
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Inches, Pt
+from docx.table import _Cell
+from docx.text.paragraph import Paragraph
+
+from report_generation.document_index import DocumentIndex, resolve_path, story_key
+from report_generation.image_cache import fit_image
+
+# Плейсхолдер: (ключ в таблице settings, правила оформления значения)
+# bold - значение отдельным жирным фрагментом шрифтом VALUE_FONT;
+# center - ячейка таблицы с плейсхолдером выравнивается по центру.
+# Варианты с пробелами и с подчеркиваниями (и опечатки из старых шаблонов) - одна запись на каждый.
+PLACEHOLDERS = {
+    # С пробелами
+    '{{ НАИМЕНОВАНИЕ ОБЪЕКТА КАРТИРОВАНИЯ }}': ('object_name', ()),
+    '{{ НАИМЕНОВАНИЕ ОРГАНИЗАЦИИ ЗАЯВИТЕЛЯ }}': ('organization_name', ()),
+    '{{ ТЕМПЕРАТУРНЫЙ РЕЖИМ }}': ('temp_mode', ()),
+    '{{ ВЛАЖНОСТНЫЙ РЕЖИМ }}': ('humidity_mode', ()),
+    '{{ ДАТА ПРОВЕДЕНИЯ КАРТИРОВАНИЯ }}': ('mapping_date', ('center',)),
+    '{{ ДАТА ВРЕМЯ ПРОВЕДЕНИЯ КАРТИРОВАНИЯ }}': ('mapping_datetime', ()),
+    '{{ ВИД КАРТИРОВАНИЯ }}': ('mapping_type', ()),
+    '{{ ДАТА ПОДПИСАНИЯ }}': ('signature_date', ('center',)),
+    '{{ ДОЛЖНОСТЬ СОТРУДНИКА ФИРМЫ }}': ('employee_position', ('bold',)),
+    '{{ ФИО СОТРУДНИКА }}': ('employee_name', ()),
+    '{{ ПЛОЩАДЬ ПОМЕЩЕНИЯ }}': ('area', ()),
+    '{{ ВРЕМЯ ПРОВЕДЕНИЯ ИССЛЕДОВАНИЯ }}': ('research_time', ('center',)),
+    '{{ НОМЕР ПРИЛОЖЕНИЯ СВИДЕТЕЛЬСТВА О ПОВЕРКЕ }}': ('certificate_continuation_copy', ()),
+    '{{ ОТЧЕТ ПО КАРТИРОВАНИЮ НАПИСАТЬ ПРОДОЛЖЕНИЕ }}': ('certificate_continuation', ('bold',)),
+    '{{ КОПИИ СВИДЕТЕЛЬСТВ О ПОВЕРКЕ СРЕДСТВ ИЗМЕРЕНИЙ И ПОВЫШЕНИЯ КВАЛИФИКАЦИИ СОТРУДНИКОВ ПРОДОЛЖИТЬ }}':
+        ('certificate_continuation_copy', ()),
+    '{{ ДАТА ПРОВЕДЕНИЯ ПОВТОРОГО КАРТИРОВАНИЯ }}': ('repeated_mapping_date', ()),
+    '{{ ДАТА ПРОВЕДЕНИЯ ПОВТОРОНОГО КАРТИРОВАНИЯ }}': ('repeated_mapping_date', ()),
+    '{{ ИНТЕРВАЛ }}': ('interval', ()),
+    # С подчеркиваниями (альтернативный формат)
+    '{{ НАИМЕНОВАНИЕ_ОБЪЕКТА_КАРТИРОВАНИЯ }}': ('object_name', ()),
+    '{{ НАИМЕНОВАНИЕ_ОРГАНИЗАЦИИ_ЗАЯВИТЕЛЯ }}': ('organization_name', ()),
+    '{{ ТЕМПЕРАТУРНЫЙ_РЕЖИМ }}': ('temp_mode', ()),
+    '{{ ВЛАЖНОСТНЫЙ_РЕЖИМ }}': ('humidity_mode', ()),
+    '{{ ДАТА_ПРОВЕДЕНИЯ_КАРТИРОВАНИЯ }}': ('mapping_date', ('center',)),
+    '{{ ДАТА_ВРЕМЯ_ПРОВЕДЕНИЯ_КАРТИРОВАНИЯ }}': ('mapping_datetime', ()),
+    '{{ ВИД_КАРТИРОВАНИЯ }}': ('mapping_type', ()),
+    '{{ ДАТА_ПОДПИСАНИЯ }}': ('signature_date', ('center',)),
+    '{{ ДОЛЖНОСТЬ_СОТРУДНИКА_ФИРМЫ }}': ('employee_position', ('bold',)),
+    '{{ ФИО_СОТРУДНИКА }}': ('employee_name', ()),
+    '{{ ПЛОЩАДЬ_ПОМЕЩЕНИЯ }}': ('area', ()),
+    '{{ ВРЕМЯ_ПРОВЕДЕНИЯ_ИССЛЕДОВАНИЯ }}': ('research_time', ('center',)),
+    '{{ ВРЕ-МЯ_ПРОВЕДЕНИЯ_ИССЛЕДОВАНИЯ }}': ('research_time', ('center',)),
+    '{{ НОМЕР_ПРИЛОЖЕНИЯ_СВИДЕТЕЛЬСТВА_О_ПОВЕРКЕ }}': ('certificate_continuation_copy', ()),
+    '{{ ОТЧЕТ_ПО_КАРТИРОВАНИЮ_НАПИСАТЬ_ПРОДОЛЖЕНИЕ }}': ('certificate_continuation', ('bold',)),
+    '{{ ОТЧЕТ_ПО_КАРТИРОВАНИЯ_НАПИСАТЬ_ПРОДОЛЖЕНИЕ }}': ('certificate_continuation', ()),
+    '{{ КОПИИ_СВИДЕТЕЛЬСТВ_О_ПОВЕРКЕ_СРЕДСТВ_ИЗМЕРЕНИЯ_И_ПОВЫШЕНИЯ_КВАЛИФИКАЦИИ_СОТРУДНИКОВ_ПРОДОЛЖИТЬ }}':
+        ('certificate_continuation_copy', ()),
+    '{{ ДАТА_ПРОВЕДЕНИЯ_ПОВТОРОГО_КАРТИРОВАНИЯ }}': ('repeated_mapping_date', ()),
+    '{{ ДАТА_ПРОВЕДЕНИЯ_ПОВТОРОНОГО_КАРТИРОВАНИЯ }}': ('repeated_mapping_date', ()),
+}
+
+# Шрифт значений с правилом bold
+VALUE_FONT = ('Times New Roman', Pt(12))
+
+# Отступ слева параграфа, в который подставлено непустое значение
+VALUE_INDENT = Inches(0.1)
+
+# Все плейсхолдеры и цикл фото - одно регулярное выражение (длинные варианты раньше коротких)
+PHOTO_LOOP = r'\{% for img in ФОТО %\}.*?\{% endfor %\}'
+PLACEHOLDER_RE = re.compile(
+    f"(?P<loop>(?is:{PHOTO_LOOP}))|(?P<field>"
+    + "|".join(re.escape(placeholder) for placeholder in sorted(PLACEHOLDERS, key=len, reverse=True))
+    + ")"
+)
+
+# Размер фото в цикле {% for img in ФОТО %} (ширина, высота в см) и число фото в ряду
+PHOTO_LANDSCAPE_CM = (3.5, 2.8)
+PHOTO_PORTRAIT_CM = (2.8, 3.5)
+PHOTOS_PER_ROW = 3
+
+W_P = qn('w:p')
+W_T = qn('w:t')
+W_TC = qn('w:tc')
+
+
+def iter_stories(doc):
+    """
+    Корневые элементы текста документа: тело и каждый колонтитул по одному разу
+
+    Возвращает пары (элемент, владелец); владелец нужен параграфам для доступа
+    к своей части документа (вставка изображений). Колонтитулы, унаследованные
+    от предыдущего раздела, пропускаются - это тот же колонтитул.
+    """
+    yield doc.element.body, doc._body
+    seen = set()
+    for section in doc.sections:
+        for story in (section.header, section.first_page_header, section.even_page_header,
+                      section.footer, section.first_page_footer, section.even_page_footer):
+            if story.is_linked_to_previous:
+                continue
+            element = story._element
+            if id(element) not in seen:
+                seen.add(id(element))
+                yield element, story
+
+
+def has_brace(p):
+    """Есть ли в тексте параграфа "{" (быстрая проверка до сборки текста)"""
+    return any(t.text and '{' in t.text for t in p.iter(W_T))
+
+
+def table_cell(p, root):
+    """Ячейка таблицы, в которой находится параграф (подъем от p до root; None - вне таблицы)"""
+    element = p.getparent()
+    while element is not None and element is not root:
+        if element.tag == W_TC:
+            return element
+        element = element.getparent()
+    return None
+
+
+def _apply_font(run, placeholder, context):
+    """Шрифт значения с правилом bold: VALUE_FONT независимо от положения в документе"""
+    run.font.name, run.font.size = VALUE_FONT
+
+
+def _add_photos(paragraph, photo_paths, image_cache=None):
+    """
+    Фото цикла {% for img in ФОТО %} в конец параграфа рядами по PHOTOS_PER_ROW
+
+    image_cache - ImageCache для уменьшенных фото (без него фото уменьшаются при каждой вставке)
+    """
+    paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    for i in range(0, len(photo_paths), PHOTOS_PER_ROW):
+        row_photos = photo_paths[i:i + PHOTOS_PER_ROW]
+
+        for j, photo_path in enumerate(row_photos):
+            try:
+                run = paragraph.add_run()
+                # Фиксированный размер в зависимости от ориентации, изображение уменьшается до него с сохранением пропорций
+                if image_cache is not None:
+                    data, (width_cm, height_cm) = image_cache.fit(photo_path, PHOTO_LANDSCAPE_CM, PHOTO_PORTRAIT_CM)
+                else:
+                    data, (width_cm, height_cm) = fit_image(photo_path, PHOTO_LANDSCAPE_CM, PHOTO_PORTRAIT_CM)
+
+                run.add_picture(io.BytesIO(data), width=Inches(width_cm / 2.54), height=Inches(height_cm / 2.54))
+
+                # Один пробел между фото ряда
+                if j < len(row_photos) - 1:
+                    paragraph.add_run().add_text(' ')
+            except Exception:
+                import traceback
+                traceback.print_exc()
+
+        # Перевод строки между рядами
+        if i + PHOTOS_PER_ROW < len(photo_paths):
+            paragraph.add_run().add_break()
+
+
+class PlaceholderEngine:
+    """
+    Замена плейсхолдеров документа значениями ключевых элементов
+
+    Все плейсхолдеры PLACEHOLDERS и цикл фото ищутся одним регулярным
+    выражением PLACEHOLDER_RE. Каждый параграф документа (включая вложенные
+    таблицы и колонтитулы) просматривается один раз; параграф с
+    плейсхолдерами пересобирается из фрагментов: обычный текст, значения,
+    оформленные по правилам PLACEHOLDERS, фото цикла в конце.
+    """
+
+    def __init__(self, key_elements, image_cache=None):
+        """
+        key_elements - {ключ settings: значение}
+        image_cache - ImageCache для фото цикла (None - фото уменьшаются при каждой вставке)
+        """
+        self.values = {
+            placeholder: key_elements.get(key, '') or ''
+            for placeholder, (key, _) in PLACEHOLDERS.items()
+        }
+        photo_paths = key_elements.get('photo_paths', '') or ''
+        self.photo_paths = [Path(p.strip()) for p in photo_paths.split(',') if p.strip()]
+        self.image_cache = image_cache
+
+    def render(self, doc, index=None, plan=None):
+        """
+        Подстановка значений во весь документ
+
+        plan - план шаблона (template_plan), по которому загружен doc: параграфы
+        берутся по записанным путям без поиска. Без плана (или если план не
+        подходит к документу) параграфы ищутся проходом по документу, контекст
+        правил оформления (первая страница, ячейка таблицы) берется из index -
+        DocumentIndex документа (по умолчанию строится здесь, один раз на вызов).
+        Возвращает число замененных плейсхолдеров.
+        """
+        if plan is not None:
+            try:
+                targets = self._plan_targets(doc, plan)
+            except (IndexError, KeyError, ValueError) as e:
+                print(f"План шаблона не подходит к документу ({e}), плейсхолдеры ищутся заново")
+            else:
+                return sum(self._render_paragraph(*target) for target in targets)
+
+        if index is None:
+            index = DocumentIndex(doc)
+        replaced = 0
+        for root, owner in iter_stories(doc):
+            # Параграфы собираются до изменений: пересборка меняет дерево под итератором
+            candidates = [p for p in root.iter(W_P) if has_brace(p)]
+            for p in candidates:
+                position = index.position(p)
+                if position is not None:
+                    tc = position.cell
+                    first_page = index.is_first_page(p)
+                else:
+                    # Колонтитулы в индекс тела не входят
+                    tc = table_cell(p, root)
+                    first_page = False
+                replaced += self._render_paragraph(Paragraph(p, owner), tc, first_page)
+        return replaced
+
+    @staticmethod
+    def _plan_targets(doc, plan):
+        """Параграфы плана: [(Paragraph, w:tc или None, первая страница)] до любых изменений документа"""
+        stories = {story_key(owner): (root, owner) for root, owner in iter_stories(doc)}
+        targets = []
+        for entry in plan['paragraphs']:
+            root, owner = stories[entry['story']]
+            p = resolve_path(root, entry['path'])
+            tc = resolve_path(root, entry['cell']) if entry['cell'] is not None else None
+            if p.tag != W_P or (tc is not None and tc.tag != W_TC):
+                raise ValueError(f"по пути {entry['path']} нет параграфа")
+            targets.append((Paragraph(p, owner), tc, entry['first_page']))
+        return targets
+
+    def _render_paragraph(self, paragraph, tc, first_page):
+        text = paragraph.text
+        matches = list(PLACEHOLDER_RE.finditer(text))
+        if not matches:
+            return 0
+
+        context = {'is_first_page': first_page, 'is_table': tc is not None}
+        paragraph.clear()
+
+        pending = []
+        pos = 0
+        indent = False
+        center = False
+        has_loop = False
+        for match in matches:
+            pending.append(text[pos:match.start()])
+            pos = match.end()
+            if match.group('loop') is not None:
+                has_loop = True
+                continue
+
+            placeholder = match.group('field')
+            value = self.values[placeholder]
+            rules = PLACEHOLDERS[placeholder][1]
+            if 'bold' in rules and value:
+                # Пустое значение не получает ни жирного фрагмента, ни отступа
+                if any(pending):
+                    paragraph.add_run(''.join(pending))
+                pending = []
+                run = paragraph.add_run(value)
+                run.bold = True
+                _apply_font(run, placeholder, context)
+                indent = True
+            else:
+                pending.append(value)
+                indent = indent or bool(value.strip())
+            center = center or 'center' in rules
+        pending.append(text[pos:])
+        if any(pending):
+            paragraph.add_run(''.join(pending))
+
+        if indent:
+            paragraph.paragraph_format.left_indent = VALUE_INDENT
+        if center and tc is not None:
+            cell = _Cell(tc, None)
+            cell.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
+            for cell_paragraph in cell.paragraphs:
+                cell_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        if has_loop and self.photo_paths:
+            _add_photos(paragraph, self.photo_paths, self.image_cache)
+        return len(matches)
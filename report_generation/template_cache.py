@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Кэш разобранных шаблонов отчетов в памяти процесса
+"""
+
+import copy
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from docx import Document
+
+# Сколько шаблонов держать в памяти (по умолчанию шаблонов три - по одному на тип отчета)
+DEFAULT_MAX_ENTRIES = 8
+
+# Сколько раз измеряется каждый способ получения документа, прежде чем выбирается лучший
+TRIALS = 3
+
+
+class _Entry:
+    """Шаблон в кэше: байты файла, разобранный документ и замеры способов получить новый документ"""
+
+    __slots__ = ('mtime_ns', 'size', 'sha', 'data', 'document', 'best', 'trials')
+
+    def __init__(self, mtime_ns, size, sha, data, document, parse_seconds):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.sha = sha
+        self.data = data
+        self.document = document
+        # Лучшее время и число замеров: 'copy' - глубокая копия, 'parse' - разбор байтов
+        self.best = {'copy': None, 'parse': parse_seconds}
+        self.trials = {'copy': 0, 'parse': 1}
+
+    def method(self):
+        """Способ для следующего документа: пока замеров мало - менее измеренный, затем - более быстрый"""
+        if min(self.trials.values()) < TRIALS:
+            return min(('copy', 'parse'), key=self.trials.get)
+        return min(('copy', 'parse'), key=self.best.get)
+
+    def record(self, method, seconds):
+        best = self.best[method]
+        self.best[method] = seconds if best is None else min(best, seconds)
+        self.trials[method] += 1
+
+
+class TemplateCache:
+    """
+    Разобранные шаблоны .docx, ключ - абсолютный путь файла
+
+    Файл читается один раз; каждый вызов load отдает новый документ,
+    который можно изменять и сохранять, не затрагивая кэш. Новый документ
+    получается одним из двух способов: глубокой копией разобранного
+    документа или разбором байтов файла из памяти. Что быстрее, зависит
+    от шаблона и окружения (копирование дерева lxml не всегда дешевле
+    разбора), поэтому каждый способ сначала измеряется TRIALS раз, затем
+    для шаблона используется способ с лучшим временем. Запись считается
+    устаревшей, если у файла изменились время изменения или размер.
+    Кроме документа хранится SHA-256 файла - ключ плана шаблона
+    (template_plan), чтобы не читать файл повторно.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.copies = 0
+        self.reparses = 0
+        self._entries = OrderedDict()  # путь -> _Entry
+        self._lock = threading.Lock()
+
+    def load(self, template_path):
+        """Новый документ шаблона и SHA-256 файла: (Document, sha)"""
+        path = os.path.abspath(template_path)
+        stat = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(path)
+                self.hits += 1
+            else:
+                entry = None
+                self.misses += 1
+        if entry is None:
+            entry = self._read(path, stat)
+            with self._lock:
+                self._entries[path] = entry
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return self._new_document(entry), entry.sha
+
+    def _new_document(self, entry):
+        # Исходный документ не изменяется, копирование и разбор из нескольких потоков безопасны
+        method = entry.method()
+        started = time.perf_counter()
+        if method == 'copy':
+            document = copy.deepcopy(entry.document)
+        else:
+            document = Document(io.BytesIO(entry.data))
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            entry.record(method, elapsed)
+            if method == 'copy':
+                self.copies += 1
+            else:
+                self.reparses += 1
+        return document
+
+    @staticmethod
+    def _read(path, stat):
+        with open(path, 'rb') as f:
+            data = f.read()
+        started = time.perf_counter()
+        document = Document(io.BytesIO(data))
+        parse_seconds = time.perf_counter() - started
+        return _Entry(stat.st_mtime_ns, stat.st_size, hashlib.sha256(data).hexdigest(), data, document, parse_seconds)
+
+    def stats(self):
+        """Счетчики обращений: {'hits', 'misses', 'copies', 'reparses', 'entries'}"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'copies': self.copies,
+                    'reparses': self.reparses, 'entries': len(self._entries)}
+
+    def clear(self):
+        """Удаление всех шаблонов из кэша (счетчики сохраняются)"""
+        with self._lock:
+            self._entries.clear()
+
+
+# Общий кэш процесса: генератор отчетов создается заново для каждого отчета
+TEMPLATE_CACHE = TemplateCache()
@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Скомпилированные планы шаблонов отчетов
+
+План шаблона - заранее найденные места подстановки: для каждого параграфа
+с плейсхолдерами - путь к нему в XML (element_path от корня тела или
+колонтитула), плейсхолдеры, правила оформления, якорь цикла фото,
+признаки первой страницы и ячейки таблицы. План хранится на диске под
+SHA-256 шаблона, поэтому шаблон разбирается только после его изменения.
+"""
+
+import hashlib
+import json
+import re
+from pathlib import Path
+
+from docx.text.paragraph import Paragraph
+
+from report_generation.document_index import DocumentIndex, element_path, story_key
+from report_generation.placeholders import (
+    PHOTO_LOOP, PLACEHOLDER_RE, PLACEHOLDERS, W_P, has_brace, iter_stories, table_cell,
+)
+from utils.disk_cache import write_atomic
+
+# Версия формата плана: при изменении старые планы компилируются заново
+PLAN_VERSION = 1
+
+# Раздел template_fields.txt для каждого шаблона
+TEMPLATE_SECTIONS = {
+    'template3.docx': 'ОБЪЕКТ ХРАНЕНИЯ ЛЕКАРСТВЕННЫХ СРЕДСТВ',
+    'template4.docx': 'ЗОНА ХРАНЕНИЯ ЛЕКАРСТВЕННЫХ СРЕДСТВ',
+    'template5.docx': 'ХОЛОДИЛЬНИК(БЕЗ ОТКРЫТИЯ)',
+}
+
+# Любой плейсхолдер {{ ... }} (для проверки по template_fields.txt)
+ANY_FIELD_RE = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+
+# Поле цикла фото в template_fields.txt
+PHOTO_FIELD = 'ФОТО'
+
+
+def template_sha(template_path):
+    """SHA-256 содержимого файла шаблона"""
+    digest = hashlib.sha256()
+    with open(template_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def rules_digest():
+    """Отпечаток таблицы PLACEHOLDERS и версии плана: план, собранный по другим правилам, не используется"""
+    rules = json.dumps([PLAN_VERSION, PHOTO_LOOP, sorted(PLACEHOLDERS.items())], ensure_ascii=False)
+    return hashlib.sha256(rules.encode('utf-8')).hexdigest()[:16]
+
+
+def field_name(placeholder):
+    """Имя поля плейсхолдера в записи template_fields.txt: '{{ ДАТА_ПОДПИСАНИЯ }}' -> 'ДАТА ПОДПИСАНИЯ'"""
+    match = ANY_FIELD_RE.fullmatch(placeholder.strip())
+    name = match.group(1) if match else placeholder
+    return " ".join(name.replace('_', ' ').split()).upper()
+
+
+def read_template_fields(fields_path):
+    """
+    Разбор template_fields.txt: {раздел: {поле: тип}}
+
+    Раздел начинается строкой "НАЗВАНИЕ:", поля - строками "ПОЛЕ:тип".
+    """
+    sections = {}
+    current = None
+    with open(fields_path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            name, _, field_type = line.rpartition(':')
+            if not field_type:
+                current = sections.setdefault(" ".join(name.split()).upper(), {})
+            elif current is not None:
+                current[field_name(name)] = field_type.strip()
+    return sections
+
+
+def compile_plan(doc, sha, template_name=None):
+    """
+    Сборка плана по неизмененному шаблону
+
+    Один проход по параграфам тела (с вложенными таблицами) и колонтитулов.
+    Кроме мест подстановки в план попадают все имена полей шаблона (fields)
+    и поля, для которых нет значения в PLACEHOLDERS (unmapped).
+    """
+    index = DocumentIndex(doc)
+    paragraphs = []
+    fields = set()
+    unmapped = set()
+    has_loop = False
+    for root, owner in iter_stories(doc):
+        for p in root.iter(W_P):
+            if not has_brace(p):
+                continue
+            text = Paragraph(p, owner).text
+            for match in ANY_FIELD_RE.finditer(text):
+                if match.group(0) not in PLACEHOLDERS and match.group(1) != 'img':
+                    unmapped.add(match.group(0))
+                    fields.add(field_name(match.group(0)))
+
+            placeholders = []
+            rules = set()
+            loop = False
+            for match in PLACEHOLDER_RE.finditer(text):
+                if match.group('loop') is not None:
+                    loop = True
+                    continue
+                placeholders.append(match.group('field'))
+                rules.update(PLACEHOLDERS[match.group('field')][1])
+                fields.add(field_name(match.group('field')))
+            if not placeholders and not loop:
+                continue
+            has_loop = has_loop or loop
+
+            position = index.position(p)
+            tc = position.cell if position is not None else table_cell(p, root)
+            paragraphs.append({
+                'story': story_key(owner),
+                'path': element_path(p, root),
+                'placeholders': placeholders,
+                'rules': sorted(rules),
+                'loop': loop,
+                'first_page': index.is_first_page(p),
+                'cell': element_path(tc, root) if tc is not None else None,
+            })
+
+    if has_loop:
+        fields.add(PHOTO_FIELD)
+    return {
+        'version': PLAN_VERSION,
+        'rules_digest': rules_digest(),
+        'sha': sha,
+        'template': template_name,
+        'paragraphs': paragraphs,
+        'fields': sorted(fields),
+        'unmapped': sorted(unmapped),
+    }
+
+
+def validate_plan(plan, template_fields):
+    """
+    Сверка плана с template_fields.txt ({раздел: {поле: тип}} из read_template_fields)
+
+    Возвращает список замечаний (пустой - расхождений нет или раздел для шаблона не задан).
+    """
+    section = TEMPLATE_SECTIONS.get(plan.get('template'))
+    if section is None or section not in template_fields:
+        return []
+    expected = template_fields[section]
+    found = set(plan['fields'])
+
+    warnings = []
+    for name in sorted(set(expected) - found):
+        warnings.append(f"поле {name} из template_fields.txt не найдено в шаблоне")
+    for name in sorted(found - set(expected)):
+        warnings.append(f"поле {name} шаблона не описано в template_fields.txt")
+    for placeholder in plan['unmapped']:
+        warnings.append(f"для плейсхолдера {placeholder} нет значения, он останется в отчете")
+    for name, field_type in sorted(expected.items()):
+        if name in found and (field_type == 'image') != (name == PHOTO_FIELD):
+            warnings.append(f"поле {name}: тип {field_type} не соответствует шаблону")
+    return warnings
+
+
+class PlanCache:
+    """
+    Планы шаблонов на диске, ключ - SHA-256 файла шаблона
+
+    Каждая запись - файл <sha>.json. План, собранный другой версией или по
+    другой таблице PLACEHOLDERS, считается отсутствующим и компилируется
+    заново; при компиляции выводятся расхождения с template_fields.txt.
+    """
+
+    def __init__(self, cache_dir, fields_path=None):
+        self.cache_dir = Path(cache_dir)
+        self.fields_path = Path(fields_path) if fields_path else None
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _entry_path(self, sha):
+        return self.cache_dir / f"{sha}.json"
+
+    def get(self, sha):
+        """План из кэша или None"""
+        try:
+            with open(self._entry_path(sha), encoding='utf-8') as f:
+                plan = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if plan.get('version') != PLAN_VERSION or plan.get('rules_digest') != rules_digest():
+            return None
+        return plan
+
+    def put(self, plan):
+        """Запись плана в кэш"""
+        path = self._entry_path(plan['sha'])
+        try:
+            write_atomic(path, lambda f: json.dump(plan, f, ensure_ascii=False, indent=1), mode='w', encoding='utf-8')
+        except OSError as e:
+            print(f"Ошибка записи плана шаблона {path.name}: {e}")
+
+    def template_fields(self):
+        """Содержимое template_fields.txt ({} - файла нет или он не читается)"""
+        if self.fields_path is None:
+            return {}
+        try:
+            return read_template_fields(self.fields_path)
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Ошибка чтения {self.fields_path.name}: {e}")
+            return {}
+
+    def compile(self, template_path, doc, sha=None):
+        """Компиляция плана по загруженному неизмененному шаблону doc, проверка и запись в кэш"""
+        sha = sha or template_sha(template_path)
+        plan = compile_plan(doc, sha, Path(template_path).name)
+        plan['warnings'] = validate_plan(plan, self.template_fields())
+        for warning in plan['warnings']:
+            print(f"Шаблон {Path(template_path).name}: {warning}")
+        self.put(plan)
+        return plan
+
+    def plan_for(self, template_path, doc, sha=None):
+        """
+        План шаблона: из кэша по SHA файла или компиляция по doc (загруженному из этого файла)
+
+        sha - уже известный SHA-256 файла (например, из TemplateCache), иначе файл читается заново
+        """
+        sha = sha or template_sha(template_path)
+        return self.get(sha) or self.compile(template_path, doc, sha)
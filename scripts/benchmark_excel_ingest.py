@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Сравнение скорости чтения Excel файлов логгеров: прежний цикл по ячейкам, openpyxl read-only и прямое чтение XML."""
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+import openpyxl
+
+from data_processing.excel_reader import read_logger_columns, read_logger_columns_openpyxl
+
+
+def create_sample_workbook(path, rows):
+    """Создание файла в формате выгрузки логгера: время/температура/влажность с 1-минутным шагом."""
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    start = datetime(2025, 1, 1)
+    worksheet.append(["Информация", "Время", "Температура", "Влажность"])
+    for i in range(rows):
+        info = "Логгер 17" if i == 3 else None
+        worksheet.append([info, start + timedelta(minutes=i), 4.0 + (i % 50) / 10, 40.0 + (i % 30)])
+    workbook.save(path)
+
+
+def legacy_read(file_path):
+    """Прежний цикл: полная загрузка книги и worksheet.cell() для каждой ячейки."""
+    workbook = openpyxl.load_workbook(file_path, data_only=True)
+    worksheet = workbook.active
+    device_name = worksheet.cell(row=5, column=1).value
+    times, temperatures, humidities = [], [], []
+    row = 2
+    while True:
+        time_val = worksheet.cell(row=row, column=2).value
+        temp_val = worksheet.cell(row=row, column=3).value
+        humidity_val = worksheet.cell(row=row, column=4).value
+        if not time_val and not temp_val and not humidity_val:
+            break
+        if time_val:
+            times.append(time_val)
+        if temp_val is not None:
+            try:
+                temperatures.append(float(temp_val))
+            except (ValueError, TypeError):
+                pass
+        if humidity_val is not None:
+            try:
+                humidities.append(float(humidity_val))
+            except (ValueError, TypeError):
+                pass
+        row += 1
+    workbook.close()
+    return device_name, times, temperatures, humidities
+
+
+def measure(func, file_path, repeat):
+    """Лучшее время из repeat запусков и пик выделенной памяти."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(file_path)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    func(file_path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=43200, help='Количество строк (по умолчанию 30 дней по 1 минуте)')
+    parser.add_argument('--repeat', type=int, default=3, help='Количество повторов')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'logger.xlsx'
+        create_sample_workbook(path, args.rows)
+
+        legacy = legacy_read(path)
+        streamed = read_logger_columns_openpyxl(path)
+        direct = read_logger_columns(path)
+        if len(legacy[1]) != len(streamed[1]) or legacy[2] != list(streamed[2]):
+            print('Результаты чтения не совпадают')
+            return 1
+        if streamed != direct:
+            print('Результаты прямого чтения и openpyxl не совпадают')
+            return 1
+
+        legacy_time, legacy_peak = measure(legacy_read, path, args.repeat)
+        streamed_time, streamed_peak = measure(read_logger_columns_openpyxl, path, args.repeat)
+        direct_time, direct_peak = measure(read_logger_columns, path, args.repeat)
+
+    mb = 1024 * 1024
+    print(f'Строк: {args.rows}')
+    print(f'Прежний цикл:       {legacy_time:.3f} с, пик памяти {legacy_peak / mb:.1f} МБ')
+    print(f'openpyxl read-only: {streamed_time:.3f} с, пик памяти {streamed_peak / mb:.1f} МБ')
+    print(f'Прямое чтение XML:  {direct_time:.3f} с, пик памяти {direct_peak / mb:.1f} МБ')
+    print(f'Ускорение:          x{legacy_time / streamed_time:.1f} (openpyxl), x{legacy_time / direct_time:.1f} (прямое)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
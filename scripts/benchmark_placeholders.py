@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Сравнение замены плейсхолдеров в шаблонах отчетов: прежние проходы по параграфам и таблицам и PlaceholderEngine."""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from docx import Document
+from docx.oxml.ns import qn
+from docx.shared import Inches, Pt
+
+from report_generation.placeholders import PLACEHOLDER_RE, PLACEHOLDERS, PlaceholderEngine, iter_stories
+
+TEMPLATES = ('template3.docx', 'template4.docx', 'template5.docx')
+
+SAMPLE_KEY_ELEMENTS = {
+    'object_name': 'Склад готовой продукции №1',
+    'organization_name': 'ООО «Фармсклад»',
+    'temp_mode': 'от +15 до +25 °C',
+    'humidity_mode': 'не более 60 %',
+    'mapping_date': '01.07.2025 - 04.07.2025',
+    'mapping_datetime': '01.07.2025 10:00',
+    'mapping_type': 'Летнее',
+    'signature_date': '10.07.2025',
+    'employee_position': 'Инженер-метролог',
+    'employee_name': 'Иванов И. И.',
+    'area': '250',
+    'research_time': '3 дня 2 часа',
+    'certificate_continuation': 'СКЛАДА ГОТОВОЙ ПРОДУКЦИИ',
+    'certificate_continuation_copy': '4',
+    'repeated_mapping_date': '01.07.2026',
+    'interval': '5 минут',
+    'photo_paths': '',
+}
+
+LEGACY_BOLD = [
+    '{{ ОТЧЕТ ПО КАРТИРОВАНИЮ НАПИСАТЬ ПРОДОЛЖЕНИЕ }}',
+    '{{ ДОЛЖНОСТЬ СОТРУДНИКА ФИРМЫ }}',
+    '{{ ОТЧЕТ_ПО_КАРТИРОВАНИЮ_НАПИСАТЬ_ПРОДОЛЖЕНИЕ }}',
+    '{{ ДОЛЖНОСТЬ_СОТРУДНИКА_ФИРМЫ }}',
+]
+LEGACY_PHOTO_LOOP = r'\{\% for img in ФОТО \%\}([\s\S]*?)\{\% endfor \%\}'
+
+
+def _legacy_bold_paragraph(paragraph, mapping):
+    """Прежняя пересборка параграфа с жирными плейсхолдерами: поиск каждого варианта на каждом шаге."""
+    text = paragraph.text
+    paragraph.clear()
+    pos = 0
+    while True:
+        min_pos = len(text)
+        found = None
+        for placeholder in LEGACY_BOLD:
+            p_pos = text.find(placeholder, pos)
+            if p_pos != -1 and p_pos < min_pos:
+                min_pos = p_pos
+                found = placeholder
+        if not found:
+            if pos < len(text):
+                paragraph.add_run(text[pos:])
+            break
+        if pos < min_pos:
+            paragraph.add_run(text[pos:min_pos])
+        run = paragraph.add_run(mapping[found])
+        run.bold = True
+        run.font.size = Pt(12)
+        run.font.name = 'Times New Roman'
+        paragraph.paragraph_format.left_indent = Inches(0.1)
+        pos = min_pos + len(found)
+
+
+def _legacy_plain_paragraph(paragraph, mapping):
+    for placeholder, value in mapping.items():
+        if placeholder in paragraph.text:
+            paragraph.text = paragraph.text.replace(placeholder, value)
+            if value and value.strip():
+                paragraph.paragraph_format.left_indent = Inches(0.1)
+
+
+def _legacy_has_bold(text, mapping):
+    return any(placeholder in text and mapping.get(placeholder, '') for placeholder in LEGACY_BOLD)
+
+
+def legacy_replace(doc, key_elements):
+    """
+    Прежний алгоритм _replace_placeholders (без вставки фото)
+
+    Параграфы тела: для каждого - поиск позиции в doc.paragraphs, проверка
+    вариантов жирных плейсхолдеров и всех вариантов PLACEHOLDERS по тексту
+    параграфа; затем таблицы: проход по ячейкам с заменой cell.text и второй
+    проход по параграфам ячеек с вложенными таблицами.
+    """
+    mapping = {placeholder: key_elements.get(key, '') for placeholder, (key, _) in PLACEHOLDERS.items()}
+
+    def is_first_page(paragraph):
+        try:
+            index = doc.paragraphs.index(paragraph) if paragraph in doc.paragraphs else -1
+            return 0 <= index < 15
+        except Exception:
+            return False
+
+    for paragraph in doc.paragraphs:
+        is_first_page(paragraph)
+        if _legacy_has_bold(paragraph.text, mapping):
+            _legacy_bold_paragraph(paragraph, mapping)
+        else:
+            _legacy_plain_paragraph(paragraph, mapping)
+        if re.search(LEGACY_PHOTO_LOOP, paragraph.text, re.IGNORECASE | re.DOTALL):
+            paragraph.text = re.sub(LEGACY_PHOTO_LOOP, '', paragraph.text, flags=re.IGNORECASE | re.DOTALL)
+
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                if _legacy_has_bold(cell.text, mapping):
+                    for paragraph in cell.paragraphs:
+                        is_first_page(paragraph)
+                        _legacy_bold_paragraph(paragraph, mapping)
+                else:
+                    for placeholder, value in mapping.items():
+                        if placeholder in cell.text:
+                            cell.text = cell.text.replace(placeholder, value)
+                            for paragraph in cell.paragraphs:
+                                if value and value.strip():
+                                    paragraph.paragraph_format.left_indent = Inches(0.1)
+                if re.search(LEGACY_PHOTO_LOOP, cell.text, re.IGNORECASE | re.DOTALL):
+                    cell.text = re.sub(LEGACY_PHOTO_LOOP, '', cell.text, flags=re.IGNORECASE | re.DOTALL)
+
+    def process_cell(cell):
+        for paragraph in cell.paragraphs:
+            if _legacy_has_bold(paragraph.text, mapping):
+                is_first_page(paragraph)
+                _legacy_bold_paragraph(paragraph, mapping)
+            else:
+                _legacy_plain_paragraph(paragraph, mapping)
+            if re.search(LEGACY_PHOTO_LOOP, paragraph.text, re.IGNORECASE | re.DOTALL):
+                paragraph.text = re.sub(LEGACY_PHOTO_LOOP, '', paragraph.text, flags=re.IGNORECASE | re.DOTALL)
+        for nested_table in cell.tables:
+            for row in nested_table.rows:
+                for nested_cell in row.cells:
+                    process_cell(nested_cell)
+
+    for table in doc.tables:
+        for row in table.rows:
+            for cell in row.cells:
+                process_cell(cell)
+
+
+def engine_replace(doc, key_elements):
+    PlaceholderEngine(key_elements).render(doc)
+
+
+def remaining_placeholders(doc):
+    """Число плейсхолдеров, оставшихся в документе после замены."""
+    count = 0
+    for root, _ in iter_stories(doc):
+        for p in root.iter(qn('w:p')):
+            text = ''.join(t.text or '' for t in p.iter(qn('w:t')))
+            count += sum(1 for _ in PLACEHOLDER_RE.finditer(text))
+    return count
+
+
+def measure(func, template_path, repeat):
+    """Лучшее время замены из repeat запусков (загрузка шаблона не учитывается)."""
+    best = None
+    for _ in range(repeat):
+        doc = Document(template_path)
+        started = time.perf_counter()
+        func(doc, SAMPLE_KEY_ELEMENTS)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--templates-dir', type=Path, default=project_root / 'temp', help='Папка с шаблонами')
+    parser.add_argument('--repeat', type=int, default=5, help='Количество повторов')
+    args = parser.parse_args()
+
+    print(f"{'Шаблон':<16} {'Прежний':>10} {'Движок':>10} {'Ускорение':>10}")
+    for name in TEMPLATES:
+        template_path = args.templates_dir / name
+        if not template_path.exists():
+            print(f'{name:<16} не найден')
+            continue
+
+        doc = Document(template_path)
+        engine_replace(doc, SAMPLE_KEY_ELEMENTS)
+        left = remaining_placeholders(doc)
+        if left:
+            print(f'{name}: после замены осталось плейсхолдеров: {left}')
+            return 1
+
+        legacy_time = measure(legacy_replace, template_path, args.repeat)
+        engine_time = measure(engine_replace, template_path, args.repeat)
+        print(f'{name:<16} {legacy_time * 1000:>8.1f}мс {engine_time * 1000:>8.1f}мс {legacy_time / engine_time:>9.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Сравнение расчета статистики ряда: min()/max()/sum() по списку, чистый Python и NumPy."""
+import argparse
+import math
+import random
+import sys
+import time
+from array import array
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from data_processing.stats_kernel import np, series_stats
+
+
+def legacy_stats(values):
+    """Прежний расчет: отдельные проходы min(), max() и sum()/len() по списку."""
+    return min(values), max(values), sum(values) / len(values)
+
+
+def same_stats(a, b):
+    """Совпадение статистики двух реализаций: avg и std - с точностью суммирования NumPy, остальное - точно."""
+    if a is None or b is None:
+        return a is b
+    return (all(a[key] == b[key] for key in a if key not in ('avg', 'std'))
+            and all(math.isclose(a[key], b[key], rel_tol=1e-12, abs_tol=1e-12) for key in ('avg', 'std')))
+
+
+def measure(func, repeat):
+    """Лучшее время из repeat запусков."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000], help='Размеры рядов')
+    parser.add_argument('--repeat', type=int, default=3, help='Количество повторов')
+    args = parser.parse_args()
+
+    print(f"{'Размер':>10} {'min/max/sum':>12} {'Python':>12} {'NumPy':>12}")
+    for size in args.sizes:
+        times = array('q', range(0, size * 60, 60))
+        values = array('d', (random.gauss(5.0, 2.0) for _ in range(size)))
+        values_list = list(values)
+
+        legacy_time = measure(lambda: legacy_stats(values_list), args.repeat)
+        python_time = measure(lambda: series_stats(times, values, 2.0, 8.0, use_numpy=False), args.repeat)
+        if np is not None:
+            if not same_stats(series_stats(times, values, 2.0, 8.0, use_numpy=True), series_stats(times, values, 2.0, 8.0, use_numpy=False)):
+                print('Результаты NumPy и чистого Python не совпадают')
+                return 1
+            numpy_time = f"{measure(lambda: series_stats(times, values, 2.0, 8.0, use_numpy=True), args.repeat) * 1000:10.1f}мс"
+        else:
+            numpy_time = f"{'нет NumPy':>12}"
+
+        print(f"{size:>10} {legacy_time * 1000:10.1f}мс {python_time * 1000:10.1f}мс {numpy_time}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
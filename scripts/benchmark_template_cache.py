@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Сравнение загрузки шаблонов отчетов: разбор файла, разбор байтов, глубокая копия и TemplateCache."""
+import argparse
+import copy
+import io
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from docx import Document
+
+from report_generation.template_cache import TRIALS, TemplateCache
+
+TEMPLATES = ('template3.docx', 'template4.docx', 'template5.docx')
+
+
+def measure(func, repeat):
+    """Лучшее время из repeat запусков."""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--templates-dir', type=Path, default=project_root / 'temp', help='Папка с шаблонами')
+    parser.add_argument('--repeat', type=int, default=10, help='Количество повторов')
+    args = parser.parse_args()
+
+    print(f"{'Шаблон':<16} {'Файл':>9} {'Байты':>9} {'Копия':>9} {'Кэш':>9} {'Способ':>7} {'Ускорение':>10}")
+    for name in TEMPLATES:
+        template_path = args.templates_dir / name
+        if not template_path.exists():
+            print(f'{name:<16} не найден')
+            continue
+
+        data = template_path.read_bytes()
+        parsed = Document(io.BytesIO(data))
+        file_time = measure(lambda: Document(template_path), args.repeat)
+        bytes_time = measure(lambda: Document(io.BytesIO(data)), args.repeat)
+        copy_time = measure(lambda: copy.deepcopy(parsed), args.repeat)
+
+        # Кэш сначала измеряет оба способа (TRIALS раз каждый), замеряется уже установившийся выбор
+        cache = TemplateCache()
+        for _ in range(2 * TRIALS + 1):
+            cache.load(template_path)
+        cache_time = measure(lambda: cache.load(template_path), args.repeat)
+        entry = next(iter(cache._entries.values()))
+
+        print(f'{name:<16} {file_time * 1000:>7.1f}мс {bytes_time * 1000:>7.1f}мс {copy_time * 1000:>7.1f}мс '
+              f'{cache_time * 1000:>7.1f}мс {entry.method():>7} {file_time / cache_time:>9.1f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Компиляция планов шаблонов отчетов и их сверка с template_fields.txt."""
+import argparse
+import sys
+from pathlib import Path
+
+# Добавляем корень проекта в путь
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from docx import Document
+
+from report_generation.template_plan import PlanCache, TEMPLATE_SECTIONS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--templates-dir', type=Path, default=project_root / 'temp', help='Папка с шаблонами')
+    parser.add_argument('--cache-dir', type=Path, default=project_root / 'cache' / 'plans', help='Папка кэша планов')
+    parser.add_argument('--strict', action='store_true', help='Код возврата 1, если есть замечания')
+    args = parser.parse_args()
+
+    cache = PlanCache(args.cache_dir, project_root / 'template_fields.txt')
+    warnings = 0
+    for name in TEMPLATE_SECTIONS:
+        template_path = args.templates_dir / name
+        if not template_path.exists():
+            print(f'{name}: не найден')
+            continue
+
+        plan = cache.compile(template_path, Document(template_path))
+        print(f"{name}: {plan['sha'][:12]} параграфов {len(plan['paragraphs'])}, "
+              f"полей {len(plan['fields'])}, замечаний {len(plan['warnings'])}")
+        warnings += len(plan['warnings'])
+
+    return 1 if args.strict and warnings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,7 +5,7 @@ from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.enum.section import WD_ORIENT, WD_SECTION
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from datetime import datetime
+from data_processing.timestamps import parse_time
 from docx.shared import Pt, Cm, Inches
 from docx.shared import Mm
 
@@ -156,8 +156,8 @@ def create_dynamic_tables4(doc, selected_periods, periods_db_path, logger_stats_
         start_time, end_time = period_data
 
         # Преобразование формата даты и времени
-        start_time = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y %H:%M")
-        end_time = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y %H:%M")
+        start_time = parse_time(start_time).strftime("%d.%m.%Y %H:%M")
+        end_time = parse_time(end_time).strftime("%d.%m.%Y %H:%M")
 
         # Создание таблиц для температуры и влажности (только если влажность учитывается)
         data_types = ['temperature']
@@ -630,8 +630,8 @@ def create_periods_summary(doc, periods_db_path, selected_periods, temp_mode=Non
         row = table.add_row().cells
         
         # Форматирование даты и времени (новый формат)
-        start = datetime.strptime(period_data[0], "%Y-%m-%d %H:%M:%S")
-        end = datetime.strptime(period_data[1], "%Y-%m-%d %H:%M:%S")
+        start = parse_time(period_data[0])
+        end = parse_time(period_data[1])
         row[0].text = f"{start.strftime('%d.%m.%Y %H:%M')} – {end.strftime('%d.%m.%Y %H:%M')}"
         
         # Название исследования (из поля name)
@@ -1,5 +1,5 @@
 import sqlite3
-from datetime import datetime
+from data_processing.timestamps import parse_time
 from docx.enum.section import WD_SECTION
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.table import WD_ALIGN_VERTICAL
@@ -133,8 +133,8 @@ def create_dynamic_tables5(doc, selected_periods, periods_db_path, logger_stats_
         start_time, end_time = period_data
 
         # Преобразование формата даты и времени
-        start_time = datetime.strptime(start_time, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y %H:%M")
-        end_time = datetime.strptime(end_time, "%Y-%m-%d %H:%M:%S").strftime("%d.%m.%Y %H:%M")
+        start_time = parse_time(start_time).strftime("%d.%m.%Y %H:%M")
+        end_time = parse_time(end_time).strftime("%d.%m.%Y %H:%M")
 
         # Создание таблиц для температуры и влажности
         for data_type in ['temperature']:
@@ -546,8 +546,8 @@ def create_periods_summary(doc, periods_db_path, selected_periods, temp_mode=Non
         row = table.add_row().cells
         
         # Форматирование даты и времени (новый формат)
-        start = datetime.strptime(period_data[0], "%Y-%m-%d %H:%M:%S")
-        end = datetime.strptime(period_data[1], "%Y-%m-%d %H:%M:%S")
+        start = parse_time(period_data[0])
+        end = parse_time(period_data[1])
         row[0].text = f"{start.strftime('%d.%m.%Y %H:%M')} – {end.strftime('%d.%m.%Y %H:%M')}"
         
         # Название исследования (из поля name)
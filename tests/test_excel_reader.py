@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Прямое чтение XLSX (xlsx_stream) против openpyxl: одинаковые столбцы и диапазоны времени."""
+import math
+import re
+import zipfile
+from datetime import datetime, timedelta
+
+import openpyxl
+import pytest
+
+from data_processing import excel_reader
+from data_processing.excel_reader import probe_time_range, read_logger_columns, read_logger_columns_openpyxl
+from data_processing.timestamps import EPOCH
+from data_processing.workbook_layout import expand_sources
+
+START = datetime(2025, 7, 1, 10, 0, 0)
+
+
+def _datetime_time(i):
+    return START + timedelta(minutes=5 * i)
+
+
+def _dotted_time(i):
+    return (START + timedelta(minutes=5 * i)).strftime("%d.%m.%Y %H:%M:%S")
+
+
+def _iso_time(i):
+    return (START + timedelta(minutes=5 * i)).strftime("%Y-%m-%d %H:%M")
+
+
+def _serial_time(i):
+    # Серийная дата Excel без формата даты: число дней от 30.12.1899
+    return (START + timedelta(minutes=5 * i) - datetime(1899, 12, 30)).total_seconds() / 86400
+
+
+def create_workbook(path, rows, time_value, humidity=True, name='Логгер 1', sheets=1):
+    """Книга в формате выгрузки логгера: A5 - имя устройства, B/C/D со строки 2 - время, температура, влажность."""
+    workbook = openpyxl.Workbook()
+    for sheet_index in range(sheets):
+        worksheet = workbook.active if sheet_index == 0 else workbook.create_sheet()
+        worksheet.title = f"Лист{sheet_index + 1}"
+        worksheet['A1'] = 'Информация'
+        worksheet['B1'] = 'Время'
+        worksheet['C1'] = 'Температура'
+        worksheet['D1'] = 'Влажность'
+        for i in range(rows):
+            row = i + 2
+            cell = worksheet.cell(row=row, column=2, value=time_value(i + sheet_index * rows))
+            if isinstance(cell.value, datetime):
+                cell.number_format = 'DD.MM.YYYY HH:MM:SS'
+            worksheet.cell(row=row, column=3, value=round(20 + math.sin(i) * 3, 2))
+            if humidity is True or (humidity == 'partial' and i % 3):
+                worksheet.cell(row=row, column=4, value=round(50 + math.cos(i) * 5, 1))
+        # Имя повторяется в общих строках (sharedStrings) вместе с текстом времени
+        worksheet['A5'] = f"{name} {sheet_index + 1}" if sheets > 1 else name
+    workbook.save(path)
+    return path
+
+
+INLINE_CELL_RE = re.compile(r'<c ([^>]*?)\s*t="inlineStr"([^>]*)><is><t[^>]*>(.*?)</t></is></c>')
+
+
+def share_strings(path):
+    """
+    Перевод текстовых ячеек книги openpyxl (inlineStr) в общие строки (sharedStrings.xml)
+
+    Выгрузки логгеров хранят текст в общих строках; имя устройства записывается
+    форматированным текстом из двух фрагментов (<r>), как в книгах Excel.
+    """
+    with zipfile.ZipFile(path) as archive:
+        parts = {name: archive.read(name) for name in archive.namelist()}
+
+    strings = []
+    index = {}
+
+    def to_shared(match):
+        text = match.group(3)
+        if text not in index:
+            index[text] = len(strings)
+            strings.append(text)
+        return f'<c {match.group(1)}{match.group(2)} t="s"><v>{index[text]}</v></c>'
+
+    for name in parts:
+        if name.startswith('xl/worksheets/sheet'):
+            parts[name] = INLINE_CELL_RE.sub(to_shared, parts[name].decode('utf-8')).encode('utf-8')
+
+    items = []
+    for text in strings:
+        if text.startswith('&#1051;'):  # 'Л' - имя устройства
+            items.append(f'<si><r><t>{text[:14]}</t></r><r><rPr><b/></rPr><t>{text[14:]}</t></r></si>')
+        else:
+            items.append(f'<si><t>{text}</t></si>')
+    parts['xl/sharedStrings.xml'] = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        f'count="{len(strings)}" uniqueCount="{len(strings)}">{"".join(items)}</sst>'
+    ).encode('utf-8')
+    parts['[Content_Types].xml'] = parts['[Content_Types].xml'].replace(
+        b'</Types>',
+        b'<Override PartName="/xl/sharedStrings.xml" '
+        b'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>')
+    parts['xl/_rels/workbook.xml.rels'] = parts['xl/_rels/workbook.xml.rels'].replace(
+        b'</Relationships>',
+        b'<Relationship Id="rIdShared" Target="sharedStrings.xml" '
+        b'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings"/></Relationships>')
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in parts.items():
+            archive.writestr(name, data)
+    return path
+
+
+def normalized(columns):
+    """Столбцы в сравнимом виде: NaN заменяется на None."""
+    name, times, temperatures, humidities = columns
+    return (name, list(times),
+            [None if value != value else value for value in temperatures],
+            [None if value != value else value for value in humidities])
+
+
+CASES = {
+    'datetime': dict(rows=300, time_value=_datetime_time),
+    'dotted_strings': dict(rows=300, time_value=_dotted_time),
+    'iso_strings': dict(rows=120, time_value=_iso_time),
+    'serial_numbers': dict(rows=300, time_value=_serial_time),
+    'serial_short': dict(rows=3, time_value=_serial_time),
+    'missing_humidity': dict(rows=200, time_value=_datetime_time, humidity=False),
+    'partial_humidity': dict(rows=200, time_value=_dotted_time, humidity='partial'),
+    'short': dict(rows=3, time_value=_datetime_time),
+    'shorter_than_name_row': dict(rows=2, time_value=_dotted_time),
+    'one_row': dict(rows=1, time_value=_iso_time),
+}
+
+
+@pytest.fixture
+def no_fallback(monkeypatch):
+    """Запрет перехода на openpyxl внутри read_logger_columns: проверяется именно прямое чтение."""
+    def fail(*args, **kwargs):
+        raise AssertionError('прямое чтение перешло на openpyxl')
+    monkeypatch.setattr(excel_reader, 'read_logger_columns_openpyxl', fail)
+
+
+@pytest.mark.parametrize('shared', [False, True], ids=['inline', 'shared'])
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_stream_matches_openpyxl(tmp_path, case, shared, no_fallback):
+    path = create_workbook(tmp_path / f"{case}.xlsx", **CASES[case])
+    if shared:
+        share_strings(path)
+    streamed = normalized(read_logger_columns(path))
+    expected = normalized(read_logger_columns_openpyxl(path))
+    assert streamed == expected
+    assert len(streamed[1]) == CASES[case]['rows']
+
+
+@pytest.mark.parametrize('shared', [False, True], ids=['inline', 'shared'])
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_probe_matches_full_parse(tmp_path, case, shared):
+    path = create_workbook(tmp_path / f"{case}.xlsx", **CASES[case])
+    if shared:
+        share_strings(path)
+    name, times, _, _ = read_logger_columns_openpyxl(path)
+    assert probe_time_range(path) == (name, min(times), max(times))
+
+
+@pytest.mark.parametrize('sheet', [0, 1])
+def test_sheet_selection(tmp_path, sheet, no_fallback):
+    path = share_strings(create_workbook(tmp_path / 'sheets.xlsx', rows=150, time_value=_datetime_time, sheets=2))
+    streamed = normalized(read_logger_columns(path, sheet=sheet))
+    assert streamed == normalized(read_logger_columns_openpyxl(path, sheet=sheet))
+    assert streamed[0] == f"Логгер 1 {sheet + 1}"
+    name, times, _, _ = streamed
+    assert probe_time_range(path, sheet=sheet) == (name, min(times), max(times))
+
+
+@pytest.mark.parametrize('reader', [read_logger_columns, read_logger_columns_openpyxl], ids=['stream', 'openpyxl'])
+def test_serial_number_times(tmp_path, reader):
+    path = create_workbook(tmp_path / 'serial.xlsx', rows=50, time_value=_serial_time)
+    name, times, temperatures, _ = reader(path)
+    expected = [int((_datetime_time(i) - EPOCH).total_seconds()) for i in range(50)]
+    assert name == 'Логгер 1'
+    assert list(times) == expected
+    assert len(temperatures) == 50
+    assert expand_sources(path) == [(str(path), 'serial.xlsx')]
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Хранилище показаний против merge_series: одинаковые ряды и конфликты при перекрытии файлов."""
+import random
+import sqlite3
+from array import array
+from types import SimpleNamespace
+
+import pytest
+
+from data_processing.logger_series import merge_series
+from data_processing.sample_store import SampleStore
+
+NAN = float('nan')
+
+
+@pytest.fixture
+def store(tmp_path):
+    db_path = tmp_path / 'samples.db'
+    conn = sqlite3.connect(db_path)
+    # Схема - как в SessionManager.init_databases
+    conn.execute("""
+        CREATE TABLE samples (
+            logger TEXT NOT NULL,
+            ts INTEGER NOT NULL,
+            temperature REAL,
+            humidity REAL,
+            source TEXT NOT NULL,
+            PRIMARY KEY (logger, ts, source)
+        ) WITHOUT ROWID
+    """)
+    conn.commit()
+    conn.close()
+    return SampleStore(db_path)
+
+
+def parsed_file(name, source, rows):
+    """Разобранный файл в виде ParsedLogger: rows - [(ts, temperature, humidity)]"""
+    return SimpleNamespace(
+        name=name, file_path=source,
+        times=array('q', [row[0] for row in rows]),
+        temperatures=array('d', [row[1] for row in rows]),
+        humidities=array('d', [row[2] for row in rows]),
+    )
+
+
+def columns(series):
+    return (list(series.times),
+            [None if value != value else value for value in series.temperatures],
+            [None if value != value else value for value in series.humidities])
+
+
+def test_load_matches_merge_series(store):
+    rng = random.Random(20250701)
+    for _ in range(40):
+        store.clear()
+        files = []
+        for index in range(rng.randint(1, 4)):
+            # Выгрузки одного логгера перекрываются; часть совпадающих строк - точные повторы
+            times = sorted(rng.sample(range(0, 600, 10), rng.randint(0, 30)))
+            rows = [(ts, rng.choice([20.0, 20.5, NAN]), rng.choice([50.0, NAN])) for ts in times]
+            files.append(parsed_file('Логгер 1', f"file{index}.xlsx", rows))
+        for parsed in files:
+            store.add_logger(parsed)
+
+        logger_data, conflicts = store.load(sources=[parsed.file_path for parsed in files])
+        expected, expected_conflicts = merge_series('Логгер 1', files)
+        if not len(expected.times):
+            assert logger_data == {} and conflicts == {}
+            continue
+        assert columns(logger_data['Логгер 1']) == columns(expected)
+        assert conflicts.get('Логгер 1', []) == expected_conflicts
+
+
+def test_conflicts_follow_requested_sources(store):
+    store.add_logger(parsed_file('Логгер 1', 'a.xlsx', [(0, 20.0, 50.0), (10, 21.0, 50.0)]))
+    store.add_logger(parsed_file('Логгер 1', 'b.xlsx', [(10, 22.0, 50.0), (20, 23.0, NAN)]))
+    store.add_logger(parsed_file('Логгер 2', 'c.xlsx', [(10, 19.0, NAN)]))
+
+    logger_data, conflicts = store.load(sources=['a.xlsx', 'b.xlsx', 'c.xlsx'])
+    assert list(logger_data['Логгер 1'].temperatures) == [20.0, 22.0, 23.0]
+    assert conflicts == {'Логгер 1': [10]}
+
+    # Более поздний файл списка побеждает; без второго файла конфликта нет
+    logger_data, conflicts = store.load(sources=['b.xlsx', 'a.xlsx'])
+    assert list(logger_data['Логгер 1'].temperatures) == [20.0, 21.0, 23.0]
+    assert conflicts == {'Логгер 1': [10]}
+    logger_data, conflicts = store.load(sources=['a.xlsx'])
+    assert conflicts == {} and set(logger_data) == {'Логгер 1'}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Сверка реализаций series_stats: NumPy против чистого Python."""
+import math
+import random
+from array import array
+
+import pytest
+
+from data_processing.stats_kernel import np, series_stats
+
+# Допуск avg и std относительно наибольшего по модулю значения ряда: NumPy суммирует
+# попарно (np.sum), чистый Python - точно (math.fsum); остальные поля совпадают точно
+TOLERANCE = 1e-12
+
+NAN = float('nan')
+
+
+def random_series(rng, size, mean, spread, nan_share):
+    times = array('q', range(0, size * 60, 60))
+    values = array('d', (NAN if rng.random() < nan_share else rng.gauss(mean, spread) for _ in range(size)))
+    return times, values
+
+
+def assert_same(times, values, low=None, high=None):
+    expected = series_stats(times, values, low, high, use_numpy=False)
+    actual = series_stats(times, values, low, high, use_numpy=True)
+    if expected is None:
+        assert actual is None
+        return
+    scale = max(abs(value) for value in values if value == value)
+    for key in expected:
+        if key in ('avg', 'std'):
+            assert math.isclose(actual[key], expected[key], rel_tol=0, abs_tol=TOLERANCE * scale), key
+        else:
+            assert actual[key] == expected[key], key
+            assert type(actual[key]) is type(expected[key]), key
+
+
+@pytest.mark.skipif(np is None, reason='NumPy не установлен')
+@pytest.mark.parametrize('size', [1, 2, 7, 1000, 100000])
+@pytest.mark.parametrize('mean, spread', [(5.0, 2.0), (-18.0, 0.3), (1e6, 1e-3)])
+def test_numpy_matches_python(size, mean, spread):
+    rng = random.Random(size)
+    times, values = random_series(rng, size, mean, spread, nan_share=0.05)
+    assert_same(times, values, mean - spread, mean + spread)
+
+
+@pytest.mark.skipif(np is None, reason='NumPy не установлен')
+def test_edge_series():
+    times = array('q', [0, 60, 120, 180])
+    assert_same(times, array('d', [NAN] * 4))
+    assert_same(array('q'), array('d'))
+    # Повторяющиеся минимум и максимум - время первого вхождения
+    assert_same(times, array('d', [3.0, 1.0, 1.0, 3.0]), 2.0, 2.5)
+    assert_same(times, array('d', [20.0, 20.0, NAN, 20.0]))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Сверка find_max_overlap с полным перебором itertools.combinations."""
+import random
+from itertools import combinations
+
+from data_processing.time_ranges import find_max_overlap
+
+
+def brute_force_overlap(intervals):
+    """Перебор групп от наибольших: все группы максимального размера с общим пересечением ненулевой длины."""
+    for size in range(len(intervals), 0, -1):
+        groups = []
+        for indices in combinations(range(len(intervals)), size):
+            start = max(intervals[i][0] for i in indices)
+            end = min(intervals[i][1] for i in indices)
+            if start < end:
+                groups.append((indices, (start, end)))
+        if groups:
+            return size, groups
+    return 0, []
+
+
+def test_matches_brute_force_on_random_intervals():
+    rng = random.Random(20250701)
+    for _ in range(3000):
+        intervals = []
+        for _ in range(rng.randint(0, 8)):
+            # Узкий диапазон значений - много совпадающих границ, касаний и пустых интервалов
+            start = rng.randint(0, 12)
+            intervals.append((start, start + rng.randint(-2, 8)))
+        assert find_max_overlap(intervals) == brute_force_overlap(intervals), intervals
+
+
+def test_touching_intervals_do_not_overlap():
+    assert find_max_overlap([(0, 5), (5, 10)]) == (1, [((0,), (0, 5)), ((1,), (5, 10))])
+
+
+def test_empty_and_degenerate_intervals():
+    assert find_max_overlap([]) == (0, [])
+    assert find_max_overlap([(3, 3), (5, 1)]) == (0, [])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Общие операции файловых кэшей: атомарная запись и вытеснение по LRU
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+
+def write_atomic(path, write, mode='wb', encoding=None):
+    """
+    Запись файла целиком или никак
+
+    write(f) записывает содержимое в уникальный временный файл той же папки,
+    затем файл заменяет path (os.replace). Одновременные записи одного
+    ключа не смешиваются, читатель не увидит недописанный файл. При ошибке
+    временный файл удаляется, исключение передается вызывающему.
+    """
+    path = Path(path)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(mode, encoding=encoding, dir=path.parent, prefix=f"{path.stem}.",
+                                         suffix='.tmp', delete=False) as f:
+            tmp_path = f.name
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        raise
+
+
+def touch(path):
+    """Отметка обращения к записи (время изменения файла) для LRU"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(cache_dir, pattern, max_bytes):
+    """Удаление записей pattern, к которым дольше всего не обращались, пока их размер превышает max_bytes"""
+    entries = []
+    total = 0
+    for path in Path(cache_dir).glob(pattern):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    entries.sort()
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
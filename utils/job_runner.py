@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Выполнение длительных операций в фоновом потоке
+"""
+
+import queue
+import threading
+import traceback
+
+
+class JobCancelled(Exception):
+    """Операция отменена пользователем"""
+
+
+class BackgroundJob:
+    """
+    Фоновая операция с передачей событий в главный цикл Tk
+
+    target(job) выполняется в рабочем потоке и не должна обращаться к виджетам:
+    все данные из интерфейса собираются заранее в главном потоке. Прогресс
+    передается через job.report(), точки отмены - job.check_cancelled().
+    Обработчики on_progress/on_done/on_error/on_cancelled вызываются в главном
+    потоке: очередь событий опрашивается через root.after.
+    """
+
+    def __init__(self, root, target, on_progress=None, on_done=None, on_error=None,
+                 on_cancelled=None, poll_ms=100):
+        self.root = root
+        self.target = target
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancelled = on_cancelled
+        self.poll_ms = poll_ms
+        self._events = queue.Queue()
+        self._cancel_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запуск операции"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def cancel(self):
+        """Запрос отмены (срабатывает в ближайшей точке check_cancelled)"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Методы для рабочего потока
+
+    def report(self, fraction, text=""):
+        """Передача прогресса (0..1) и текста текущего этапа"""
+        self._events.put(('progress', (fraction, text)))
+
+    def check_cancelled(self):
+        """Точка отмены: прерывает операцию, если пользователь нажал «Отмена»"""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def _run(self):
+        try:
+            result = self.target(self)
+        except JobCancelled:
+            self._events.put(('cancelled', None))
+        except Exception as e:
+            traceback.print_exc()
+            self._events.put(('error', e))
+        else:
+            self._events.put(('done', result))
+
+    # Главный поток
+
+    def _poll(self):
+        finished = False
+        try:
+            while True:
+                kind, payload = self._events.get_nowait()
+                if kind == 'progress':
+                    if self.on_progress:
+                        self.on_progress(*payload)
+                    continue
+                finished = True
+                handler = {'done': self.on_done, 'error': self.on_error, 'cancelled': self.on_cancelled}[kind]
+                if handler:
+                    if kind == 'cancelled':
+                        handler()
+                    else:
+                        handler(payload)
+                break
+        except queue.Empty:
+            pass
+
+        if not finished:
+            self.root.after(self.poll_ms, self._poll)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Пиковое потребление памяти процессом
+"""
+
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss():
+    """
+    Пиковый объем резидентной памяти процесса в байтах (None, если узнать нельзя)
+
+    На Linux/macOS - resource.getrusage (ru_maxrss: килобайты на Linux,
+    байты на macOS), на Windows - PeakWorkingSetSize из GetProcessMemoryInfo.
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    if sys.platform == 'win32':
+        return _peak_working_set()
+    return None
+
+
+def _peak_working_set():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t),
+            ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t),
+            ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+        process = kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize
+
+
+def format_bytes(size):
+    """Размер в байтах для сообщений: '12.3 МБ'"""
+    if size is None:
+        return "неизвестно"
+    return f"{size / 2 ** 20:.1f} МБ"
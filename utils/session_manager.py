@@ -17,10 +17,13 @@ class SessionManager:
         self.project_root = Path(__file__).parent.parent
         self.inform_dir = self.project_root / "inform"
         self.db_dir = self.project_root / "database"
+        # Кэш разобранных файлов сохраняется между сессиями (не очищается в cleanup)
+        self.cache_dir = self.project_root / "cache"
         
         # Создаем необходимые директории
         self.inform_dir.mkdir(exist_ok=True)
         self.db_dir.mkdir(exist_ok=True)
+        self.cache_dir.mkdir(exist_ok=True)
         
         # Инициализация баз данных
         self.init_databases()
@@ -62,6 +65,34 @@ class SessionManager:
                 FOREIGN KEY (period_id) REFERENCES periods(id)
             )
         """)
+        # Индекс для выборок экстремумов по периоду и типу данных в таблицах отчета
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_logger_stats_period
+            ON logger_stats (period_id, data_type, logger_type, logger_number)
+        """)
+        conn.commit()
+        conn.close()
+        
+        # База данных исходных показаний логгеров
+        self.samples_db = self.db_dir / "samples.db"
+        conn = sqlite3.connect(str(self.samples_db))
+        cursor = conn.cursor()
+        # Прежняя схема с ключом (logger, ts) хранила только последний файл каждой отметки времени;
+        # ее показания удаляются и при следующей загрузке восстанавливаются из файлов
+        columns = {row[1]: row[5] for row in cursor.execute("PRAGMA table_info(samples)")}
+        if columns and not columns.get('source'):
+            cursor.execute("DROP TABLE samples")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS samples (
+                logger TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                temperature REAL,
+                humidity REAL,
+                source TEXT NOT NULL,
+                PRIMARY KEY (logger, ts, source)
+            ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_samples_source ON samples (source)")
         conn.commit()
         conn.close()
         
@@ -100,7 +131,7 @@ class SessionManager:
                     file.unlink()
         
         # Удаление баз данных
-        for db_file in [self.periods_db, self.logger_stats_db, self.settings_db]:
+        for db_file in [self.periods_db, self.logger_stats_db, self.samples_db, self.settings_db]:
             if db_file.exists():
                 db_file.unlink()
         
@@ -115,6 +146,26 @@ class SessionManager:
         """Получить путь к базе данных статистики логгеров"""
         return str(self.logger_stats_db)
     
+    def get_samples_db_path(self):
+        """Получить путь к базе данных исходных показаний логгеров"""
+        return str(self.samples_db)
+    
+    def get_parse_cache_dir(self):
+        """Получить путь к кэшу разобранных Excel файлов"""
+        return str(self.cache_dir / "parsed")
+    
+    def get_spill_dir(self):
+        """Получить путь к временным файлам обработки по блокам"""
+        return str(self.cache_dir / "spill")
+    
+    def get_plan_cache_dir(self):
+        """Получить путь к кэшу скомпилированных планов шаблонов отчетов"""
+        return str(self.cache_dir / "plans")
+    
+    def get_image_cache_dir(self):
+        """Получить путь к кэшу уменьшенных изображений для отчетов"""
+        return str(self.cache_dir / "images")
+    
     def get_settings_db_path(self):
         """Получить путь к базе данных настроек"""
         return str(self.settings_db)